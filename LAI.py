@@ -1,116 +1,94 @@
-!pip install rasterio -q
-!pip install geopandas -q
-!pip install matplotlib -q
-!pip install geemap -q
-
-
-import os
-from google.colab import drive
-
-# Solução completa para o problema de montagem
-if os.path.exists('/content/drive'):
-    # Remove todos os arquivos e o diretório se existir
-    !rm -rf /content/drive
-    !mkdir /content/drive
-
-# Monta o Google Drive
-drive.mount('/content/drive')
-
-import os
-import re
-import numpy as np
-import rasterio
-import matplotlib.pyplot as plt
-from rasterio.plot import show
-
-import os
-import numpy as np
-import matplotlib.pyplot as plt
-import rasterio
-from rasterio.plot import show
-from matplotlib_scalebar.scalebar import ScaleBar
-
-# 1. Configuração da paleta de cores para LAI
-lai_cmap = plt.cm.YlGn  # Paleta verde-amarela para LAI
-plt.style.use('seaborn-v0_8-whitegrid')  # Estilo moderno para os gráficos
-
-# 2. Função para gerar mapas LAI (versão robusta)
-def gerar_mapa_lai(caminho_imagem, pasta_saida, cmap=lai_cmap, pmin=2, pmax=98):
-    """Gera mapa LAI a partir de arquivos .tif com tratamento de erros completo"""
-    try:
-        # Verifica se o arquivo existe
-        if not os.path.exists(caminho_imagem):
-            print(f"✖ Arquivo não encontrado: {os.path.basename(caminho_imagem)}")
-            return
-
-        with rasterio.open(caminho_imagem) as src:
-            lai = src.read(1)
-
-            # Cria máscara para valores nodata
-            lai = np.ma.masked_where(
-                (lai == src.nodata) | (lai < 0) | (lai > 10),  # Filtra valores inválidos (LAI típico 0-10)
-                lai
-            )
-
-            # Verifica se há dados válidos
-            if lai.compressed().size == 0:
-                print(f"⚠ Arquivo sem dados válidos: {os.path.basename(caminho_imagem)}")
-                return
-
-            # Cálculo automático da escala (com limites para LAI)
-            vmin = max(0, np.percentile(lai.compressed(), pmin))
-            vmax = min(10, np.percentile(lai.compressed(), pmax))
-
-            # Configuração do plot
-            fig, ax = plt.subplots(figsize=(10, 10), dpi=120)
-            img = ax.imshow(lai, cmap=cmap, vmin=vmin, vmax=vmax)
-
-            # Título baseado no nome do arquivo
-            nome_arquivo = os.path.basename(caminho_imagem)
-            titulo = nome_arquivo.replace('LAI_', '').replace('_', ' ').replace('.tif', '')
-            ax.set_title(f"LAI {titulo}", fontsize=14, pad=20)
-            ax.axis('off')
-
-            # Barra de cores
-            cbar = plt.colorbar(img, fraction=0.046, pad=0.04)
-            cbar.set_label('Leaf Area Index (m²/m²)', rotation=270, labelpad=20)
-
-            # Adiciona escala (opcional)
-            try:
-                dx = src.res[0]
-                ax.add_artist(ScaleBar(dx, units="m", location='lower left'))
-            except:
-                pass
-
-            # Salvar figura
-            nome_saida = f"LAI_{titulo.replace(' ', '_')}.png"
-            caminho_completo = os.path.join(pasta_saida, nome_saida)
-            plt.savefig(caminho_completo, bbox_inches='tight', dpi=300)
-            plt.close()
-
-            print(f"✔ Mapa gerado: {nome_saida}")
-
-    except Exception as e:
-        print(f"✖ Erro ao processar {os.path.basename(caminho_imagem)}: {str(e)}")
-
-# 3. Configuração de diretórios (ajuste seus caminhos)
-pasta_imagens = '/content/drive/MyDrive/MODIS_LAI'  # Pasta onde estão os arquivos LAI
-pasta_saida = '/content/drive/MyDrive/MAPS_LAI'    # Pasta para salvar os mapas
-os.makedirs(pasta_saida, exist_ok=True)
-
-# 4. Processamento de todos os arquivos .tif
-print("Iniciando processamento de arquivos LAI...")
-arquivos_processados = 0
-
-for arquivo in sorted(os.listdir(pasta_imagens)):
-    if arquivo.lower().endswith('.tif'):
-        caminho_completo = os.path.join(pasta_imagens, arquivo)
-        gerar_mapa_lai(caminho_completo, pasta_saida)
-        arquivos_processados += 1
-
-# 5. Relatório final
-print("\n" + "="*50)
-print(f"Processamento concluído!")
-print(f"Total de arquivos processados: {arquivos_processados}")
-print(f"Mapas salvos em: {pasta_saida}")
-print("="*50)
+!pip install rasterio -q
+!pip install geopandas -q
+!pip install matplotlib -q
+!pip install matplotlib-scalebar -q
+!pip install geemap -q
+
+
+import os
+from google.colab import drive
+
+# Solução completa para o problema de montagem
+if os.path.exists('/content/drive'):
+    # Remove todos os arquivos e o diretório se existir
+    !rm -rf /content/drive
+    !mkdir /content/drive
+
+# Monta o Google Drive
+drive.mount('/content/drive')
+
+import os
+import sys
+
+# Pasta com uma cópia deste repositório (contém o pacote tese_g)
+pasta_repositorio = '/content/drive/MyDrive/tese_g'
+sys.path.append(pasta_repositorio)
+
+from tese_g.atlas import gerar_animacao, gerar_atlas
+from tese_g.catalogo import atualizar_catalogo
+from tese_g.cog import converter_pasta
+from tese_g.lote import processar_lote, imprimir_relatorio
+from tese_g.manifesto import listar_orfaos
+from tese_g.mapas import gerar_mapa_lai, lai_cmap
+
+# 1. As funções de mapa e a paleta de LAI ficam em tese_g/mapas.py
+
+# 2. Número de processos em paralelo (padrão: todos os núcleos)
+n_processos = os.cpu_count()
+
+# Leitura reduzida ao tamanho da figura (None = resolução total)
+reamostragem = 'average'
+
+# Só refaz os mapas cujo GeoTIFF ou parâmetros mudaram (manifesto na pasta de saída)
+incremental = True
+
+# Motor de renderização: 'matplotlib' (figura completa) ou 'rapido' (quicklook sem matplotlib)
+motor = 'matplotlib'
+
+# Mesma escala de cores (p2/p98 da série inteira) para todos os anos de cada
+# índice/período/área, a partir de histogramas guardados por arquivo
+escala_comum = False
+
+# Pipeline em um processo: lê os próximos GeoTIFFs do Drive e grava os PNGs enquanto
+# desenha o atual (útil quando a leitura do Drive é o gargalo; ignora n_processos)
+pipeline = False
+
+# Catálogo SQLite com metadados e estatísticas das exportações (evita reler os pixels)
+caminho_catalogo = '/content/drive/MyDrive/catalogo_exportacoes.db'
+
+# 3. Configuração de diretórios (ajuste seus caminhos)
+pasta_imagens = '/content/drive/MyDrive/MODIS_LAI'
+pasta_saida = '/content/drive/MyDrive/MAPS_LAI'
+os.makedirs(pasta_saida, exist_ok=True)
+
+# Regrava as exportações como Cloud-Optimized GeoTIFF (blocos, compressão e overviews);
+# arquivos já otimizados são pulados. Os originais são substituídos no lugar: só ligue
+# com uma cópia das exportações guardada
+otimizar_cog = False
+if otimizar_cog:
+    print("Otimizando GeoTIFFs (COG)...", converter_pasta(pasta_imagens))
+
+# Atualiza o catálogo (só relê os arquivos novos ou alterados)
+atualizar_catalogo(caminho_catalogo, pasta_imagens, n_processos=n_processos)
+
+# 4. Processamento de todos os arquivos .tif
+print("Iniciando processamento de arquivos LAI...")
+resultados = processar_lote(pasta_imagens, pasta_saida, 'lai', n_processos=n_processos,
+                            reamostragem=reamostragem, incremental=incremental,
+                            catalogo=caminho_catalogo, motor=motor,
+                            escala_comum=escala_comum, pipeline=pipeline)
+arquivos_processados = len(resultados)
+
+# 5. Relatório final
+# Sem o modo incremental não há manifesto: todo PNG pareceria órfão
+orfaos = listar_orfaos(pasta_imagens, pasta_saida) if incremental else ()
+imprimir_relatorio(resultados, pasta_saida, orfaos=orfaos)
+
+# Atlas (anos nas linhas, Seco/Umido nas colunas, uma barra de cores) e animações
+# ano a ano de cada série, com a escala de cores da série inteira
+gerar_comparacoes = False
+if gerar_comparacoes:
+    # Numa subpasta: fora dos mapas por arquivo do modo incremental
+    pasta_atlas = os.path.join(pasta_saida, 'atlas')
+    print("Atlas:", gerar_atlas(pasta_imagens, pasta_atlas, 'lai', colunas='periodo'))
+    print("Animações:", gerar_animacao(pasta_imagens, pasta_atlas, 'lai', formato='gif'))
@@ -1,203 +1,144 @@
-!pip install rasterio -q
-!pip install geopandas -q
-!pip install matplotlib -q
-!pip install geemap -q
-
-
-import os
-from google.colab import drive
-
-# Solução completa para o problema de montagem
-if os.path.exists('/content/drive'):
-    # Remove todos os arquivos e o diretório se existir
-    !rm -rf /content/drive
-    !mkdir /content/drive
-
-# Monta o Google Drive
-drive.mount('/content/drive')
-
-import os
-import re
-import numpy as np
-import rasterio
-import matplotlib.pyplot as plt
-from rasterio.plot import show
-
-def gerar_mapa_ndvi(
-    caminho_imagem,       # caminho completo do GeoTIFF
-    titulo_mapa,          # título do mapa: NDVI + período + ano
-    pasta_saida,          # pasta onde salvar a figura
-    cmap='viridis'        # colormap do matplotlib ou paleta personalizada
-):
-    """
-    Lê a imagem NDVI, calcula estatísticas, desenha e salva uma figura
-    com barra de cores (legenda), título e valores aproximados.
-    """
-
-    # Abre o arquivo raster
-    with rasterio.open(caminho_imagem) as src:
-        ndvi_array = src.read(1).astype(float)  # Lê a primeira banda
-
-        # Substitui valores de NoData por np.nan (opcional, dependendo da exportação)
-        ndvi_array[ndvi_array == src.nodata] = np.nan
-
-        # Calcula estatísticas
-        ndvi_min = np.nanmin(ndvi_array)
-        ndvi_max = np.nanmax(ndvi_array)
-        ndvi_mean = np.nanmean(ndvi_array)
-
-        # Arredondar para 2 casas decimais
-        ndvi_min_2dec = round(ndvi_min, 2)
-        ndvi_max_2dec = round(ndvi_max, 2)
-        ndvi_mean_2dec = round(ndvi_mean, 2)
-
-        # Cria a figura e o eixo
-        fig, ax = plt.subplots(figsize=(8, 6))
-
-        # Plota o raster
-        # Nota: `show()` do rasterio pode definir autoescala. Se quiser fixar min e max,
-        # basta passar parâmetros como `vmin=..., vmax=...`.
-        img_plot = ax.imshow(ndvi_array, cmap=cmap)
-
-        # Adiciona a colorbar
-        cbar = fig.colorbar(img_plot, ax=ax, shrink=0.7)
-        cbar.set_label('NDVI', fontsize=12)
-
-        # Título do mapa
-        ax.set_title(f'{titulo_mapa}\n'
-                     f'Min: {ndvi_min_2dec} | Max: {ndvi_max_2dec} | Mean: {ndvi_mean_2dec}',
-                     fontsize=14)
-
-        # Remove eixos (opcional)
-        ax.axis('off')
-
-        # Salva a figura na pasta de saída
-        nome_arquivo_fig = os.path.join(pasta_saida, f'{titulo_mapa}.png')
-        plt.savefig(nome_arquivo_fig, dpi=150, bbox_inches='tight')
-        plt.close(fig)  # Fecha a figura para liberar memória
-
-
-import matplotlib.colors as mcolors
-
-# Paleta NDVI do GEE (exemplo resumido)
-ndvi_colors = [
-    '#FFFFFF', '#CE7E45', '#DF923D', '#F1B555', '#FCD163',
-    '#99B718', '#74A901', '#66A000', '#529400', '#3E8601',
-    '#207401', '#056201', '#004C00', '#023B01', '#012E01',
-    '#011D01', '#011301'
-]
-
-ndvi_cmap = mcolors.LinearSegmentedColormap.from_list("NDVI_GEE", ndvi_colors)
-
-# Então na função gerar_mapa_ndvi, passe cmap=ndvi_cmap
-
-
-# Caminho da pasta onde estão os GeoTIFFs exportados
-pasta_imagens = '/content/drive/MyDrive/GEE_Exports'
-
-# Pasta para salvar as figuras (pode ser a mesma, mas aqui separado):
-pasta_saida_figs = '/content/drive/MyDrive/GEE_Maps'
-os.makedirs(pasta_saida_figs, exist_ok=True)
-
-# Regex simples para capturar dados do nome do arquivo (ex: NDVI_Seco_Area1_2010.tif)
-padrao = re.compile(r'(NDVI)_(Seco|Umido)_(Area\d)_(\d{4})\.tif')
-
-# Listar arquivos na pasta de imagens
-arquivos = [f for f in os.listdir(pasta_imagens) if f.endswith('.tif')]
-
-for arq in arquivos:
-    # Tenta extrair informações do nome do arquivo via regex
-    match = padrao.match(arq)
-    if match:
-        # match.groups() -> ('NDVI', 'Seco', 'Area1', '2010')
-        ndvi_str, periodo, area, ano = match.groups()
-
-        # Monta o título
-        # Exemplo: NDVI Seco 2010 (Area1) - ajuste conforme desejar
-        titulo_map = f"{ndvi_str} {periodo} {ano} ({area})"
-
-        # Caminho completo do GeoTIFF
-        caminho_arquivo = os.path.join(pasta_imagens, arq)
-
-        # Gera o mapa e salva
-        gerar_mapa_ndvi(caminho_arquivo, titulo_map, pasta_saida_figs, cmap='viridis')
-
-        print(f"Gerado mapa: {titulo_map}")
-    else:
-        print(f"Nome de arquivo fora do padrão: {arq}")
-
-
-
-def gerar_mapa_ndvi_com_percentil(
-    caminho_imagem,
-    titulo_mapa,
-    pasta_saida,
-    cmap=ndvi_cmap,
-    pmin=2,   # percentil mínimo
-    pmax=98   # percentil máximo
-):
-    """
-    Lê a imagem NDVI (escalada em 10.000), converte para [-1, +1],
-    usa percentis para definir min/max de plotagem,
-    calcula estatísticas (min, max, mean) e gera mapa com barra de cores.
-    """
-
-    with rasterio.open(caminho_imagem) as src:
-        ndvi_array = src.read(1).astype(float)
-
-        # Trata valores nodata
-        if src.nodata is not None:
-            ndvi_array[ndvi_array == src.nodata] = np.nan
-
-        # Converte para escala real NDVI
-        ndvi_array = ndvi_array * 0.0001  # ex.: 6200 -> 0.62
-
-        # Calcula estatísticas gerais (sem recorte)
-        ndvi_min = np.nanmin(ndvi_array)
-        ndvi_max = np.nanmax(ndvi_array)
-        ndvi_mean = np.nanmean(ndvi_array)
-
-        # Arredondando p/ 2 casas decimais
-        ndvi_min_2dec = round(ndvi_min, 2)
-        ndvi_max_2dec = round(ndvi_max, 2)
-        ndvi_mean_2dec = round(ndvi_mean, 2)
-
-        # Calcula percentis para realçar a variação de cor
-        arr_sem_nan = ndvi_array[~np.isnan(ndvi_array)]
-        vmin_dyn = np.percentile(arr_sem_nan, pmin)
-        vmax_dyn = np.percentile(arr_sem_nan, pmax)
-
-        # Cria a figura
-        fig, ax = plt.subplots(figsize=(8, 6))
-
-        # Plota usando [vmin_dyn, vmax_dyn] p/ ganhar contraste
-        img_plot = ax.imshow(ndvi_array, cmap=cmap, vmin=vmin_dyn, vmax=vmax_dyn)
-
-        # Colorbar
-        cbar = fig.colorbar(img_plot, ax=ax, shrink=0.7)
-        cbar.set_label('NDVI', fontsize=12)
-
-        # Título com estatísticas
-        ax.set_title(
-            f'{titulo_mapa}\n'
-            f'Min: {ndvi_min_2dec} | Max: {ndvi_max_2dec} | Mean: {ndvi_mean_2dec}',
-            fontsize=14
-        )
-
-        ax.axis('off')
-
-        # Salva figura
-        nome_arquivo_fig = os.path.join(pasta_saida, f'{titulo_mapa}.png')
-        plt.savefig(nome_arquivo_fig, dpi=150, bbox_inches='tight')
-        plt.close(fig)
-
-
-# Paleta NDVI parecida com a do GEE
-ndvi_colors = [
-    '#FFFFFF', '#CE7E45', '#DF923D', '#F1B555', '#FCD163',
-    '#99B718', '#74A901', '#66A000', '#529400', '#3E8601',
-    '#207401', '#056201', '#004C00', '#023B01', '#012E01',
-    '#011D01', '#011301'
-]
-
-ndvi_cmap = mcolors.LinearSegmentedColormap.from_list("NDVI_GEE", ndvi_colors)
+!pip install rasterio -q
+!pip install geopandas -q
+!pip install matplotlib -q
+!pip install matplotlib-scalebar -q
+!pip install geemap -q
+
+
+import os
+from google.colab import drive
+
+# Solução completa para o problema de montagem
+if os.path.exists('/content/drive'):
+    # Remove todos os arquivos e o diretório se existir
+    !rm -rf /content/drive
+    !mkdir /content/drive
+
+# Monta o Google Drive
+drive.mount('/content/drive')
+
+import os
+import sys
+
+# Pasta com uma cópia deste repositório (contém o pacote tese_g)
+pasta_repositorio = '/content/drive/MyDrive/tese_g'
+sys.path.append(pasta_repositorio)
+
+from tese_g.atlas import gerar_animacao, gerar_atlas
+from tese_g.catalogo import atualizar_catalogo
+from tese_g.cog import converter_pasta
+from tese_g.filtros import filtrar_pasta
+from tese_g.galeria import gerar_galeria, gerar_mapas_completos
+from tese_g.indices import calcular_indices_pasta
+from tese_g.lote import processar_lote, imprimir_relatorio
+from tese_g.manifesto import listar_orfaos
+from tese_g.mapas import (
+    gerar_mapa_ndvi, gerar_mapa_ndvi_com_percentil, ndvi_colors, ndvi_cmap
+)
+from tese_g.mudancas import calcular_mudancas
+
+# As funções gerar_mapa_ndvi / gerar_mapa_ndvi_com_percentil e a paleta NDVI do GEE
+# (ndvi_colors -> ndvi_cmap) ficam em tese_g/mapas.py
+
+
+# Caminho da pasta onde estão os GeoTIFFs exportados
+pasta_imagens = '/content/drive/MyDrive/GEE_Exports'
+
+# Pasta para salvar as figuras (pode ser a mesma, mas aqui separado):
+pasta_saida_figs = '/content/drive/MyDrive/GEE_Maps'
+os.makedirs(pasta_saida_figs, exist_ok=True)
+
+# Número de processos em paralelo (padrão: todos os núcleos)
+n_processos = os.cpu_count()
+
+# Leitura reduzida ao tamanho da figura (None = resolução total)
+reamostragem = 'average'
+
+# Só refaz os mapas cujo GeoTIFF ou parâmetros mudaram (manifesto na pasta de saída)
+incremental = True
+
+# Motor de renderização: 'matplotlib' (figura completa) ou 'rapido' (quicklook sem matplotlib)
+motor = 'matplotlib'
+
+# Mesma escala de cores (p2/p98 da série inteira) para todos os anos de cada
+# índice/período/área, a partir de histogramas guardados por arquivo
+# (no mapa NDVI do matplotlib, sem ela, a escala é a automática do imshow)
+escala_comum = False
+
+# Pipeline em um processo: lê os próximos GeoTIFFs do Drive e grava os PNGs enquanto
+# desenha o atual (útil quando a leitura do Drive é o gargalo; ignora n_processos)
+pipeline = False
+
+# Catálogo SQLite com metadados e estatísticas das exportações (evita reler os pixels)
+caminho_catalogo = '/content/drive/MyDrive/catalogo_exportacoes.db'
+
+# NDVI, EVI, NDWI e LSWI calculados localmente a partir de cenas de reflectância
+# (MOD09A1, uma cena por <Seco|Umido>_<AreaN>_<ANO>), em uma leitura por cena.
+# None = usar as exportações de cada índice do GEE
+pasta_reflectancia = None  # ex.: '/content/drive/MyDrive/MODIS_REFLECTANCIA'
+if pasta_reflectancia is not None:
+    calcular_indices_pasta(pasta_reflectancia, {
+        'NDVI': pasta_imagens,
+        'EVI': '/content/drive/MyDrive/MODIS_EVI',
+        'NDWI': '/content/drive/MyDrive/MODIS_NDWI',
+        'LSWI': '/content/drive/MyDrive/MODIS_LSWI',
+    }, n_processos=n_processos)
+
+# Regrava as exportações como Cloud-Optimized GeoTIFF (blocos, compressão e overviews);
+# arquivos já otimizados são pulados. Os originais são substituídos no lugar: só ligue
+# com uma cópia das exportações guardada
+otimizar_cog = False
+if otimizar_cog:
+    print("Otimizando GeoTIFFs (COG)...", converter_pasta(pasta_imagens))
+
+# Atualiza o catálogo (só relê os arquivos novos ou alterados)
+atualizar_catalogo(caminho_catalogo, pasta_imagens, n_processos=n_processos)
+
+# Gera um mapa por arquivo NDVI_<Seco|Umido>_<AreaN>_<ANO>.tif; o título é montado
+# a partir do nome (ex: NDVI Seco 2010 (Area1)) e nomes fora do padrão viram aviso
+resultados = processar_lote(pasta_imagens, pasta_saida_figs, 'ndvi', n_processos=n_processos,
+                            reamostragem=reamostragem, incremental=incremental,
+                            catalogo=caminho_catalogo, motor=motor,
+                            escala_comum=escala_comum, pipeline=pipeline)
+arquivos_processados = len(resultados)
+
+# Sem o modo incremental não há manifesto: todo PNG pareceria órfão
+orfaos = listar_orfaos(pasta_imagens, pasta_saida_figs) if incremental else ()
+imprimir_relatorio(resultados, pasta_saida_figs, orfaos=orfaos)
+
+# Galeria para revisão: miniaturas e index.html (por índice/período/área/ano) de todo o
+# acervo em poucos minutos; os mapas completos saem depois, para todos ou só os escolhidos
+pasta_galeria = None  # ex.: '/content/drive/MyDrive/GEE_Galeria'
+if pasta_galeria is not None:
+    imprimir_relatorio(gerar_galeria(pasta_imagens, pasta_galeria), os.path.join(pasta_galeria, 'miniaturas'))
+    # gerar_mapas_completos(pasta_galeria, ['NDVI_Seco_Area1_2010.tif'], reamostragem=reamostragem)
+
+# Filtragem temporal da série (picos removidos, lacunas preenchidas e Savitzky-Golay);
+# os .tif filtrados saem com os mesmos nomes e podem ser mapeados como os originais
+pasta_filtrados = None  # ex.: '/content/drive/MyDrive/GEE_Exports_Filtrados'
+if pasta_filtrados is not None:
+    filtrar_pasta(pasta_imagens, pasta_filtrados, indices=['NDVI'], preenchimento='linear')
+    imprimir_relatorio(processar_lote(pasta_filtrados, os.path.join(pasta_filtrados, 'mapas'), 'ndvi',
+                                      n_processos=n_processos, reamostragem=reamostragem),
+                       os.path.join(pasta_filtrados, 'mapas'))
+
+# Detecção de mudança: ΔNDVI/ΔEVI/ΔNDWI/ΔLSWI Umido-Seco e entre anos consecutivos,
+# e anomalias (z-score) em relação à média da série; mapas com paleta divergente
+pasta_mudancas = None  # ex.: '/content/drive/MyDrive/MODIS_MUDANCAS'
+if pasta_mudancas is not None:
+    calcular_mudancas([pasta_imagens, '/content/drive/MyDrive/MODIS_EVI', '/content/drive/MyDrive/MODIS_NDWI',
+                       '/content/drive/MyDrive/MODIS_LSWI'], pasta_mudancas)
+    for produto in ('delta', 'anomalia'):
+        imprimir_relatorio(processar_lote(os.path.join(pasta_mudancas, produto.upper()),
+                                          os.path.join(pasta_mudancas, 'mapas'), produto,
+                                          n_processos=n_processos, reamostragem=reamostragem),
+                           os.path.join(pasta_mudancas, 'mapas'))
+
+# Atlas (anos nas linhas, Seco/Umido nas colunas, uma barra de cores) e animações
+# ano a ano de cada série, com a escala de cores da série inteira
+gerar_comparacoes = False
+if gerar_comparacoes:
+    # Numa subpasta: fora dos mapas por arquivo do modo incremental
+    pasta_atlas = os.path.join(pasta_saida_figs, 'atlas')
+    print("Atlas:", gerar_atlas(pasta_imagens, pasta_atlas, 'ndvi', colunas='periodo'))
+    print("Animações:", gerar_animacao(pasta_imagens, pasta_atlas, 'ndvi', formato='gif'))
@@ -0,0 +1,11 @@
+"""
+Rotinas compartilhadas dos scripts da tese (NDVI, EVI, LAI, NDWI, LSWI e VCI).
+
+Os scripts da raiz do repositório continuam sendo executados no Google Colab;
+as funções de geração de mapas e o processamento em lote ficam neste pacote
+para poderem ser importadas pelos processos de trabalho.
+"""
+
+
+class AvisoMapa(Exception):
+    """Arquivo que não gera mapa, mas não é um erro (ex.: sem dados válidos)."""
@@ -0,0 +1,176 @@
+"""
+Amostragem de pontos (parcelas de campo) em todo o acervo de GeoTIFFs.
+
+Os pontos vêm de uma tabela (CSV ou GeoDataFrame) e são reprojetados uma
+vez por CRS encontrado no acervo. Em cada raster, as coordenadas viram
+linha/coluna de uma vez com a transformação inversa (vetorizada), os
+pontos são agrupados pelo bloco interno do GeoTIFF que os contém e cada
+bloco com pontos é lido uma única vez. Os rasters abertos ficam num cache
+LRU pequeno (``CacheDatasets``), que pode ser reaproveitado entre chamadas.
+
+O resultado é uma tabela longa: uma linha por ponto e raster que o
+contém, com índice, período, área, ano, arquivo e o valor do pixel na
+unidade do índice (NDVI inteiro x 0,0001), NaN quando o pixel não é válido.
+"""
+
+import os
+from collections import OrderedDict
+
+import numpy as np
+import rasterio
+from affine import Affine
+from rasterio.windows import Window
+
+from .estatisticas import LIMITES_VALIDOS, mascara_validos
+from .medicao import contar_leitura
+from .nomes import interpretar_nome
+
+# Faixas de linhas lidas por vez em GeoTIFFs gravados em faixas (sem blocos quadrados)
+LINHAS_POR_FAIXA = 256
+
+
+class CacheDatasets:
+    """Rasters abertos (no máximo `maximo`), fechando o usado há mais tempo quando enche."""
+
+    def __init__(self, maximo=32):
+        self.maximo = maximo
+        self.abertos = OrderedDict()
+
+    def abrir(self, caminho):
+        src = self.abertos.pop(caminho, None)
+        if src is None:
+            src = rasterio.open(caminho)
+            while len(self.abertos) >= self.maximo:
+                self.abertos.popitem(last=False)[1].close()
+        self.abertos[caminho] = src
+        return src
+
+    def fechar(self):
+        for src in self.abertos.values():
+            src.close()
+        self.abertos.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+def _pandas():
+    try:
+        import pandas
+    except ImportError as e:
+        raise RuntimeError("A amostragem de pontos precisa do pandas (pip install .[amostragem])") from e
+    return pandas
+
+
+def carregar_pontos(pontos, x='lon', y='lat', crs='EPSG:4326', campo_id=None):
+    """
+    (ids, xs, ys, crs) a partir de um CSV (colunas `x` e `y` no `crs`), de
+    um DataFrame do pandas com essas colunas ou de um GeoDataFrame de
+    pontos (usa a geometria e o CRS dele). `campo_id` é a coluna com o nome
+    do ponto (None = número da linha).
+    """
+    pd = _pandas()
+
+    tabela = pd.read_csv(pontos) if isinstance(pontos, (str, os.PathLike)) else pontos
+    if hasattr(tabela, 'geometry') and getattr(tabela, 'crs', None) is not None:
+        xs, ys = tabela.geometry.x.to_numpy(), tabela.geometry.y.to_numpy()
+        crs = tabela.crs.to_wkt()
+    else:
+        xs, ys = tabela[x].to_numpy(), tabela[y].to_numpy()
+    ids = tabela[campo_id].to_numpy() if campo_id is not None else np.arange(len(tabela))
+    return ids, np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64), crs
+
+
+def _blocos(src):
+    """(altura, largura) dos grupos de leitura: o bloco interno ou faixas de várias linhas."""
+    altura, largura = src.block_shapes[0]
+    if largura >= src.width:
+        altura = max(altura, LINHAS_POR_FAIXA)
+    return altura, largura
+
+
+def amostrar_raster(src, xs, ys):
+    """
+    Valores do raster aberto `src` nos pontos (xs, ys) já no CRS dele:
+    (posições dos pontos dentro do raster, valores float64 com NaN nos
+    pixels inválidos). Cada bloco com pontos é lido uma vez.
+    """
+    colunas, linhas = ~Affine(*tuple(src.transform)[:6]) * (xs, ys)
+    colunas = np.floor(colunas).astype(np.int64)
+    linhas = np.floor(linhas).astype(np.int64)
+    dentro = np.flatnonzero((linhas >= 0) & (linhas < src.height) & (colunas >= 0) & (colunas < src.width))
+    valores = np.full(dentro.size, np.nan)
+    if dentro.size == 0:
+        return dentro, valores
+    linhas, colunas = linhas[dentro], colunas[dentro]
+
+    indice = (interpretar_nome(src.name) or {}).get('indice')
+    limites = LIMITES_VALIDOS.get(indice)
+    altura, largura = _blocos(src)
+    bloco_linha, bloco_coluna = linhas // altura, colunas // largura
+    chaves = bloco_linha * ((src.width + largura - 1) // largura) + bloco_coluna
+    ordem = np.argsort(chaves, kind='stable')
+    limites_grupos = np.flatnonzero(np.diff(chaves[ordem])) + 1
+    for grupo in np.split(ordem, limites_grupos):
+        l0, c0 = bloco_linha[grupo[0]] * altura, bloco_coluna[grupo[0]] * largura
+        janela = Window(c0, l0, min(largura, src.width - c0), min(altura, src.height - l0))
+        bloco = src.read(1, window=janela)
+        contar_leitura(bloco)
+        amostra = bloco[linhas[grupo] - l0, colunas[grupo] - c0]
+        validos = mascara_validos(amostra, src.nodata, limites)
+        valores[grupo] = np.where(validos, amostra, np.nan)
+
+    if indice == 'NDVI' and np.issubdtype(np.dtype(src.dtypes[0]), np.integer):
+        valores *= 0.0001
+    return dentro, valores
+
+
+def amostrar_pontos(pontos, pastas, x='lon', y='lat', crs='EPSG:4326', campo_id=None, cache=None):
+    """
+    Amostra os pontos (ver ``carregar_pontos``) em todos os .tif das pastas
+    (uma pasta ou uma lista). Retorna um DataFrame longo com 'id', 'x', 'y'
+    (coordenadas originais), 'indice', 'periodo', 'area', 'ano', 'arquivo'
+    e 'valor'; só entram os pares ponto/raster em que o ponto cai dentro do
+    raster. `cache` é um ``CacheDatasets`` para reaproveitar rasters abertos.
+    """
+    pd = _pandas()
+    from rasterio.warp import transform as reprojetar
+    from .lote import listar_tifs
+
+    ids, xs, ys, crs = carregar_pontos(pontos, x, y, crs, campo_id)
+    if isinstance(pastas, str):
+        pastas = [pastas]
+    proprio_cache = cache is None
+    cache = cache or CacheDatasets()
+
+    reprojetados = {}
+    partes = []
+    try:
+        for pasta in pastas:
+            for caminho in listar_tifs(pasta):
+                src = cache.abrir(caminho)
+                destino = src.crs.to_wkt() if src.crs else crs
+                if destino not in reprojetados:
+                    reprojetados[destino] = tuple(np.asarray(v) for v in reprojetar(crs, destino, xs, ys)) \
+                        if src.crs else (xs, ys)
+                dentro, valores = amostrar_raster(src, *reprojetados[destino])
+                if dentro.size == 0:
+                    continue
+                campos = interpretar_nome(caminho) or {}
+                partes.append(pd.DataFrame({
+                    'id': ids[dentro], 'x': xs[dentro], 'y': ys[dentro],
+                    'indice': campos.get('indice'), 'periodo': campos.get('periodo'),
+                    'area': campos.get('area'), 'ano': campos.get('ano'),
+                    'arquivo': os.path.basename(caminho), 'valor': valores,
+                }))
+    finally:
+        if proprio_cache:
+            cache.fechar()
+
+    colunas = ['id', 'x', 'y', 'indice', 'periodo', 'area', 'ano', 'arquivo', 'valor']
+    if not partes:
+        return pd.DataFrame(columns=colunas)
+    return pd.concat(partes, ignore_index=True)[colunas]
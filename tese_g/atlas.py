@@ -0,0 +1,257 @@
+"""
+Atlas (uma série inteira em uma figura) e animações ano a ano.
+
+O atlas desenha a série de um índice em uma grade de painéis: uma linha
+por ano e uma coluna por período (Seco/Umido) de uma área, ou por área de
+um período, com uma barra de cores única. A animação mostra os anos de
+uma série (mesmo índice, período e área) em sequência, em GIF (Pillow) ou
+MP4 (ffmpeg).
+
+Nos dois casos a figura, os eixos e a barra de cores são criados uma vez
+e cada painel ou quadro só troca os pixels (``set_data``), em vez de uma
+figura nova por arquivo. A escala de cores é a da série inteira
+(p`pmin`/p`pmax` dos histogramas de ``tese_g.histogramas``), então os
+painéis e quadros podem ser comparados entre si.
+"""
+
+import os
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib import animation
+from matplotlib.colors import Normalize
+from matplotlib.ticker import FuncFormatter
+
+from . import AvisoMapa
+from .cubo import ORDEM_PERIODOS
+from .estatisticas import LIMITES_VALIDOS, mascara_validos
+from .histogramas import esbocos, fator_indice, mesclar_serie
+from .leitura import ler_banda
+from .lote import listar_tifs
+from .nomes import interpretar_nome
+from .paletas import PALETAS, obter_paleta
+from .pipeline import abrir_raster
+
+# Largura de cada painel do atlas, em polegadas (a altura segue a proporção do raster)
+LARGURA_PAINEL = 3.0
+
+# Programa do matplotlib.animation usado para gravar cada formato
+GRAVADORES = {
+    'gif': 'pillow',
+    'mp4': 'ffmpeg',
+}
+
+
+def _arquivos_indice(pasta_imagens, indice):
+    """[(campos, caminho)] dos .tif do `indice` na pasta, fora os nomes fora do padrão."""
+    arquivos = []
+    for caminho in listar_tifs(pasta_imagens):
+        campos = interpretar_nome(caminho)
+        if campos is not None and campos['indice'] == indice:
+            arquivos.append((campos, caminho))
+    if not arquivos:
+        raise AvisoMapa(f"Nenhum GeoTIFF de {indice} em {pasta_imagens}")
+    return arquivos
+
+
+def _ordem(valor):
+    """Ordem de períodos (Seco antes de Umido) e áreas (Area2 antes de Area10)."""
+    return ORDEM_PERIODOS.get(valor, 0), len(valor), valor
+
+
+def _escala_serie(caminhos, indice, pasta_esbocos, pmin, pmax):
+    """
+    Escala da série inteira: (vmin, vmax, fator, conversões). vmin/vmax
+    ficam dentro da faixa física, em unidades que `fator` leva às do índice:
+    as do arquivo quando a série tem um só tipo, as do índice (fator 1)
+    quando mistura tipos (ex.: NDVI int16 e float32). `conversoes`
+    ({caminho: multiplicador}) leva os pixels de cada arquivo a essas unidades.
+    """
+    por_arquivo = esbocos(caminhos, pasta_esbocos)
+    if not por_arquivo:
+        raise AvisoMapa(f"Série sem dados válidos: {os.path.basename(caminhos[0])}")
+    serie, fator = mesclar_serie(list(por_arquivo.values()))
+    if serie.n_validos == 0:
+        raise AvisoMapa(f"Série sem dados válidos: {os.path.basename(caminhos[0])}")
+    vmin, vmax = serie.percentil(pmin), serie.percentil(pmax)
+    limites = LIMITES_VALIDOS[indice]
+    if limites is not None:
+        vmin, vmax = max(limites[0] / fator, vmin), min(limites[1] / fator, vmax)
+    conversoes = {caminho: fator_indice(esboco.indice, esboco.dtype) / fator
+                  for caminho, esboco in por_arquivo.items()}
+    return vmin, vmax, fator, conversoes
+
+
+def _proporcao(caminho):
+    """Altura / largura do raster."""
+    with abrir_raster(caminho) as src:
+        return src.height / src.width
+
+
+def _ler_painel(caminho, figsize, dpi, reamostragem, limites, conversao=1.0):
+    """Banda reduzida ao tamanho do painel, mascarada nos pixels inválidos e multiplicada por `conversao`."""
+    with abrir_raster(caminho) as src:
+        banda = ler_banda(src, figsize, dpi, reamostragem)
+        invalidos = mascara_validos(banda, src.nodata, limites, invertida=True)
+        if conversao != 1:
+            banda = banda.astype(np.float32) * np.float32(conversao)
+        return np.ma.masked_array(banda, mask=invalidos, copy=False)
+
+
+class _Grade:
+    """Figura de linhas x colunas de painéis com uma barra de cores, reaproveitada entre desenhos."""
+
+    def __init__(self, n_linhas, n_colunas, altura_painel, cmap, rotulo, largura_painel=LARGURA_PAINEL):
+        self.forma = (n_linhas, n_colunas, altura_painel)
+        self.fig, self.eixos = plt.subplots(n_linhas, n_colunas, squeeze=False, layout='constrained',
+                                            figsize=(largura_painel * n_colunas + 1, altura_painel * n_linhas))
+        self.norma = Normalize(0, 1)
+        self.imagens = np.empty((n_linhas, n_colunas), dtype=object)
+        self.vazios = np.empty((n_linhas, n_colunas), dtype=object)
+        for (i, j), ax in np.ndenumerate(self.eixos):
+            self.imagens[i, j] = ax.imshow(np.ma.masked_all((1, 1)), cmap=cmap, norm=self.norma,
+                                           interpolation='nearest')
+            self.vazios[i, j] = ax.text(0.5, 0.5, 'sem dado', transform=ax.transAxes,
+                                        ha='center', va='center', color='gray', visible=False)
+            ax.set_xticks([])
+            ax.set_yticks([])
+            for borda in ax.spines.values():
+                borda.set_visible(False)
+        self.barra = self.fig.colorbar(self.imagens[0, 0], ax=self.eixos.ravel().tolist(), shrink=0.6)
+        self.barra.set_label(rotulo, fontsize=12)
+        self.titulo = self.fig.suptitle('', fontsize=14)
+
+    def escala(self, vmin, vmax, fator):
+        """Limites de cor de todos os painéis; os rótulos da barra saem multiplicados por `fator`."""
+        self.norma.vmin, self.norma.vmax = vmin, vmax
+        self.barra.formatter = FuncFormatter(lambda valor, _: f'{valor * fator:.2f}')
+        self.barra.update_ticks()
+
+    def painel(self, i, j, dados):
+        """Troca os pixels do painel (i, j); None deixa o painel marcado como sem dado."""
+        self.vazios[i, j].set_visible(dados is None)
+        if dados is None:
+            dados = np.ma.masked_all((1, 1))
+        imagem = self.imagens[i, j]
+        imagem.set_data(dados)
+        imagem.set_extent((-0.5, dados.shape[1] - 0.5, dados.shape[0] - 0.5, -0.5))
+
+    def fechar(self):
+        plt.close(self.fig)
+
+
+def gerar_atlas(pasta_imagens, pasta_saida, indice, colunas='periodo', cmap=None, pmin=2, pmax=98,
+                reamostragem='average', pasta_esbocos=None, dpi=150):
+    """
+    Gera os atlas PNG do `indice` em `pasta_imagens`, com um ano por linha.
+    Com `colunas`='periodo' sai um atlas por área (colunas Seco e Umido);
+    com 'area', um por período (uma coluna por área). A escala de cores é a
+    da série do atlas, a partir dos histogramas em `pasta_esbocos` (padrão:
+    ``esbocos`` na pasta de saída). Retorna os nomes dos PNGs gerados
+    (``Atlas_<INDICE>_<AreaN|Periodo>.png``).
+    """
+    if colunas not in ('periodo', 'area'):
+        raise ValueError(f"colunas deve ser 'periodo' ou 'area', não {colunas!r}")
+    indice = indice.upper()
+    separar = 'area' if colunas == 'periodo' else 'periodo'
+    grupos = {}
+    for campos, caminho in _arquivos_indice(pasta_imagens, indice):
+        grupos.setdefault(campos[separar], []).append((campos, caminho))
+
+    os.makedirs(pasta_saida, exist_ok=True)
+    pasta_esbocos = pasta_esbocos or os.path.join(pasta_saida, 'esbocos')
+    paleta = obter_paleta(cmap if cmap is not None else PALETAS[indice])
+    limites = LIMITES_VALIDOS[indice]
+
+    grade = None
+    gerados = []
+    try:
+        for chave in sorted(grupos, key=_ordem):
+            grupo = grupos[chave]
+            anos = sorted({campos['ano'] for campos, _ in grupo})
+            nomes_colunas = sorted({campos[colunas] for campos, _ in grupo}, key=_ordem)
+            por_celula = {(campos['ano'], campos[colunas]): caminho for campos, caminho in grupo}
+
+            proporcao = _proporcao(grupo[0][1])
+            altura_painel = round(LARGURA_PAINEL * proporcao, 2)
+            # A figura só é refeita quando a grade muda de forma
+            if grade is None or grade.forma != (len(anos), len(nomes_colunas), altura_painel):
+                if grade is not None:
+                    grade.fechar()
+                grade = _Grade(len(anos), len(nomes_colunas), altura_painel, paleta, indice)
+
+            vmin, vmax, fator, conversoes = _escala_serie([caminho for _, caminho in grupo], indice,
+                                                          pasta_esbocos, pmin, pmax)
+            grade.escala(vmin, vmax, fator)
+            for i, ano in enumerate(anos):
+                for j, coluna in enumerate(nomes_colunas):
+                    caminho = por_celula.get((ano, coluna))
+                    dados = None if caminho is None else _ler_painel(
+                        caminho, (LARGURA_PAINEL, altura_painel), dpi, reamostragem, limites,
+                        conversoes.get(caminho, 1.0))
+                    grade.painel(i, j, dados)
+                    if i == 0:
+                        grade.eixos[i, j].set_title(coluna, fontsize=12)
+                grade.eixos[i, 0].set_ylabel(str(ano), fontsize=12)
+            grade.titulo.set_text(f'{indice} {chave}')
+
+            nome_saida = f'Atlas_{indice}_{chave}.png'
+            grade.fig.savefig(os.path.join(pasta_saida, nome_saida), dpi=dpi)
+            gerados.append(nome_saida)
+    finally:
+        if grade is not None:
+            grade.fechar()
+    return gerados
+
+
+def gerar_animacao(pasta_imagens, pasta_saida, indice, formato='gif', fps=2, cmap=None, pmin=2, pmax=98,
+                   largura=6.0, reamostragem='average', pasta_esbocos=None, dpi=100):
+    """
+    Gera uma animação por série (período e área) do `indice`, com um quadro
+    por ano e a escala de cores da série inteira: ``<INDICE>_<Periodo>_<AreaN>.gif``
+    ou ``.mp4`` (este precisa do ffmpeg instalado). `largura` é a largura
+    do mapa em polegadas. Retorna os nomes dos arquivos gerados.
+    """
+    if formato not in GRAVADORES:
+        raise ValueError(f"Formato desconhecido: {formato} (use um de {sorted(GRAVADORES)})")
+    if not animation.writers.is_available(GRAVADORES[formato]):
+        raise RuntimeError(f"Gravador '{GRAVADORES[formato]}' indisponível para {formato}; "
+                           "instale o ffmpeg ou use formato='gif'")
+    indice = indice.upper()
+    series = {}
+    for campos, caminho in _arquivos_indice(pasta_imagens, indice):
+        series.setdefault((campos['periodo'], campos['area']), []).append((campos, caminho))
+
+    os.makedirs(pasta_saida, exist_ok=True)
+    pasta_esbocos = pasta_esbocos or os.path.join(pasta_saida, 'esbocos')
+    paleta = obter_paleta(cmap if cmap is not None else PALETAS[indice])
+    limites = LIMITES_VALIDOS[indice]
+
+    quadro = None
+    gerados = []
+    try:
+        for periodo, area in sorted(series, key=lambda chave: (_ordem(chave[1]), _ordem(chave[0]))):
+            serie = sorted(series[(periodo, area)], key=lambda item: item[0]['ano'])
+            proporcao = _proporcao(serie[0][1])
+            altura = round(largura * proporcao, 2)
+            if quadro is None or quadro.forma != (1, 1, altura):
+                if quadro is not None:
+                    quadro.fechar()
+                quadro = _Grade(1, 1, altura, paleta, indice, largura_painel=largura)
+            vmin, vmax, fator, conversoes = _escala_serie([caminho for _, caminho in serie], indice,
+                                                          pasta_esbocos, pmin, pmax)
+            quadro.escala(vmin, vmax, fator)
+
+            nome_saida = f'{indice}_{periodo}_{area}.{formato}'
+            gravador = animation.writers[GRAVADORES[formato]](fps=fps)
+            with gravador.saving(quadro.fig, os.path.join(pasta_saida, nome_saida), dpi):
+                for campos, caminho in serie:
+                    quadro.painel(0, 0, _ler_painel(caminho, (largura, altura), dpi, reamostragem, limites,
+                                                    conversoes.get(caminho, 1.0)))
+                    quadro.titulo.set_text(f"{indice} {periodo} {campos['ano']} ({area})")
+                    gravador.grab_frame()
+            gerados.append(nome_saida)
+    finally:
+        if quadro is not None:
+            quadro.fechar()
+    return gerados
@@ -0,0 +1,266 @@
+"""
+Benchmark dos renderizadores com rasters sintéticos (sem Colab nem Drive).
+
+Gera GeoTIFFs com faixas de valores realistas (NDVI int16 escalado por
+10.000, EVI, LAI 0-10, NDWI/LSWI, VCI 0-100), em vários tamanhos e frações
+de nodata (manchas contíguas, como nuvens), e mede cada renderizador de
+``tese_g.mapas`` e o quicklook de ``tese_g.rapido``: tempo total, tempo
+por etapa (as de ``tese_g.medicao``) e pico de memória do processo. Cada
+medição roda em um processo novo, para o pico de memória não herdar a
+medição anterior. Os resultados vão para um JSON que pode ser comparado com o de
+outro commit::
+
+    python -m tese_g.benchmark --tamanhos 512 2048 --saida bench_abc123.json
+    python -m tese_g.benchmark --comparar bench_abc123.json bench_def456.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import tempfile
+from datetime import datetime
+
+import numpy as np
+
+# Índice: (dtype, faixa de valores, nodata)
+FIXTURES = {
+    'NDVI': ('int16', (-2000, 9000), -32768),
+    'EVI': ('float32', (-0.2, 0.9), -9999.0),
+    'LAI': ('float32', (0.0, 10.0), -9999.0),
+    'NDWI': ('float32', (-0.6, 0.6), -9999.0),
+    'LSWI': ('float32', (-0.5, 0.7), -9999.0),
+    'VCI': ('float32', (0.0, 100.0), -9999.0),
+}
+
+# Renderizador: índice da imagem sintética que ele desenha
+RENDERIZADORES = {
+    'gerar_mapa_ndvi': 'NDVI',
+    'gerar_mapa_ndvi_com_percentil': 'NDVI',
+    'gerar_mapa_evi': 'EVI',
+    'gerar_mapa_lai': 'LAI',
+    'gerar_mapa_ndwi': 'NDWI',
+    'gerar_mapa_lswi': 'LSWI',
+    'gerar_mapa_vci': 'VCI',
+    'rapido': None,
+}
+
+TAMANHOS = (512, 2048)
+FRACOES_NODATA = (0.0, 0.3)
+
+
+def _campo_suave(forma, rng, escala=64):
+    """Campo aleatório em [0, 1] com correlação espacial (grade grossa interpolada)."""
+    gh, gw = forma[0] // escala + 2, forma[1] // escala + 2
+    grade = rng.random((gh, gw), dtype=np.float32)
+    y = np.linspace(0, gh - 1, forma[0], dtype=np.float32)
+    x = np.linspace(0, gw - 1, forma[1], dtype=np.float32)
+    y0 = np.minimum(y.astype(int), gh - 2)
+    x0 = np.minimum(x.astype(int), gw - 2)
+    fy = (y - y0)[:, None]
+    fx = x - x0
+    cima = grade[y0][:, x0] * (1 - fx) + grade[y0][:, x0 + 1] * fx
+    baixo = grade[y0 + 1][:, x0] * (1 - fx) + grade[y0 + 1][:, x0 + 1] * fx
+    return cima * (1 - fy) + baixo * fy
+
+
+def gerar_raster_sintetico(caminho, indice, lado, fracao_nodata=0.0, semente=0):
+    """
+    Grava um GeoTIFF `lado` x `lado` do `indice` com valores na faixa típica
+    (campo suave + ruído) e ~`fracao_nodata` dos pixels sem dado.
+    """
+    import rasterio
+    from rasterio.transform import from_origin
+
+    dtype, (vmin, vmax), nodata = FIXTURES[indice]
+    rng = np.random.default_rng(semente)
+    forma = (lado, lado)
+    campo = _campo_suave(forma, rng)
+    campo += rng.normal(0, 0.03, forma).astype(np.float32)
+    np.clip(campo, 0, 1, out=campo)
+    valores = (vmin + campo * (vmax - vmin)).astype(dtype)
+    if fracao_nodata > 0:
+        nuvens = _campo_suave(forma, rng, escala=32)
+        valores[nuvens < np.quantile(nuvens, fracao_nodata)] = nodata
+
+    perfil = {
+        'driver': 'GTiff', 'width': lado, 'height': lado, 'count': 1, 'dtype': dtype,
+        'nodata': nodata, 'crs': 'EPSG:32722', 'transform': from_origin(500000, 8000000, 250, 250),
+    }
+    with rasterio.open(caminho, 'w', **perfil) as dst:
+        dst.write(valores, 1)
+
+
+def _chamar(renderizador, caminho, pasta_saida, estatisticas, reamostragem):
+    """Chama o renderizador com a assinatura de cada função."""
+    from . import mapas, rapido
+
+    opcoes = {'estatisticas': estatisticas, 'reamostragem': reamostragem}
+    if renderizador == 'rapido':
+        return rapido.gerar_quicklook(caminho, pasta_saida, 'NDVI', estatisticas=estatisticas,
+                                      reamostragem=reamostragem or 'average')
+    funcao = getattr(mapas, renderizador)
+    if renderizador in ('gerar_mapa_ndvi', 'gerar_mapa_ndvi_com_percentil'):
+        return funcao(caminho, 'NDVI sintético', pasta_saida, **opcoes)
+    return funcao(caminho, pasta_saida, **opcoes)
+
+
+def _medir(renderizador, indice, caminho, pasta_saida, reamostragem):
+    """Uma medição (roda em processo próprio): tempos por etapa e pico de memória."""
+    import resource
+    from .estatisticas import LIMITES_VALIDOS, estatisticas_raster
+    from .medicao import etapa, medir
+
+    rss_inicial = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with medir() as medicao:
+        estatisticas = estatisticas_raster(caminho, limites=LIMITES_VALIDOS[indice])
+        etapa('estatisticas')
+        nome_png = _chamar(renderizador, caminho, pasta_saida, estatisticas, reamostragem)
+    rss_final = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    registro = medicao.registro()
+    return {
+        'tempo_total': registro['tempo_total'],
+        'etapas': registro['etapas'],
+        'bytes_lidos': registro['bytes_lidos'],
+        # ru_maxrss vem em KB no Linux
+        'pico_rss_mb': rss_final / 1024,
+        'acrescimo_rss_mb': (rss_final - rss_inicial) / 1024,
+        'bytes_png': os.path.getsize(os.path.join(pasta_saida, nome_png)),
+    }
+
+
+def _metadados():
+    """Commit, versões e máquina, para comparar resultados entre execuções."""
+    import matplotlib
+    import rasterio
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'rasterio': rasterio.__version__,
+        'gdal': rasterio.__gdal_version__,
+        'matplotlib': matplotlib.__version__,
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def executar_benchmark(renderizadores=None, tamanhos=TAMANHOS, fracoes_nodata=FRACOES_NODATA,
+                       reamostragens=(None, 'average'), repeticoes=3, pasta=None, caminho_saida=None):
+    """
+    Mede cada combinação renderizador x tamanho x fração de nodata x
+    reamostragem `repeticoes` vezes. Retorna {'meta': ..., 'resultados': [...]}
+    e, com `caminho_saida`, grava o mesmo conteúdo em JSON.
+    """
+    from .lote import _inicializar_processo
+
+    renderizadores = list(renderizadores or RENDERIZADORES)
+    pasta_temporaria = None
+    if pasta is None:
+        pasta_temporaria = tempfile.TemporaryDirectory(prefix='bench_tese_g_')
+        pasta = pasta_temporaria.name
+
+    resultados = []
+    try:
+        for lado in tamanhos:
+            for fracao in fracoes_nodata:
+                pasta_caso = os.path.join(pasta, f'{lado}px_nodata{int(fracao * 100)}')
+                os.makedirs(pasta_caso, exist_ok=True)
+                for renderizador in renderizadores:
+                    indice = RENDERIZADORES[renderizador] or 'NDVI'
+                    caminho = os.path.join(pasta_caso, f'{indice}_Seco_Area1_2020.tif')
+                    if not os.path.exists(caminho):
+                        gerar_raster_sintetico(caminho, indice, lado, fracao)
+                    for reamostragem in reamostragens:
+                        for repeticao in range(repeticoes):
+                            with multiprocessing.Pool(1, initializer=_inicializar_processo) as pool:
+                                medicao = pool.apply(_medir, (renderizador, indice, caminho, pasta_caso,
+                                                              reamostragem))
+                            resultados.append({
+                                'renderizador': renderizador, 'indice': indice, 'lado': lado,
+                                'dtype': FIXTURES[indice][0], 'fracao_nodata': fracao,
+                                'reamostragem': reamostragem, 'repeticao': repeticao, **medicao,
+                            })
+                            print(f"{renderizador:32s} {lado:6d}px nodata {fracao:.0%} "
+                                  f"{str(reamostragem):8s} {medicao['tempo_total']:7.2f} s "
+                                  f"{medicao['acrescimo_rss_mb']:7.0f} MB")
+    finally:
+        if pasta_temporaria is not None:
+            pasta_temporaria.cleanup()
+
+    saida = {'meta': _metadados(), 'resultados': resultados}
+    if caminho_saida:
+        with open(caminho_saida, 'w', encoding='utf-8') as f:
+            json.dump(saida, f, indent=1)
+    return saida
+
+
+def resumir(resultados):
+    """Mediana de tempo e máximo de memória por caso (agregando as repetições)."""
+    casos = {}
+    for r in resultados:
+        chave = (r['renderizador'], r['lado'], r['fracao_nodata'], r['reamostragem'])
+        casos.setdefault(chave, []).append(r)
+    return {
+        chave: {
+            'tempo_total': float(np.median([r['tempo_total'] for r in grupo])),
+            'acrescimo_rss_mb': max(r['acrescimo_rss_mb'] for r in grupo),
+        }
+        for chave, grupo in casos.items()
+    }
+
+
+def comparar(caminho_antes, caminho_depois):
+    """Imprime a razão de tempo (depois/antes) e a memória de cada caso presente nos dois JSON."""
+    with open(caminho_antes, encoding='utf-8') as f:
+        antes = json.load(f)
+    with open(caminho_depois, encoding='utf-8') as f:
+        depois = json.load(f)
+    resumo_antes = resumir(antes['resultados'])
+    resumo_depois = resumir(depois['resultados'])
+
+    print(f"Antes: {antes['meta']['commit']} | Depois: {depois['meta']['commit']}")
+    for chave in sorted(set(resumo_antes) & set(resumo_depois), key=str):
+        a, d = resumo_antes[chave], resumo_depois[chave]
+        renderizador, lado, fracao, reamostragem = chave
+        print(f"{renderizador:32s} {lado:6d}px nodata {fracao:.0%} {str(reamostragem):8s} "
+              f"{a['tempo_total']:7.2f} s -> {d['tempo_total']:7.2f} s "
+              f"({d['tempo_total'] / a['tempo_total']:.2f}x) | "
+              f"{a['acrescimo_rss_mb']:6.0f} -> {d['acrescimo_rss_mb']:6.0f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dos renderizadores com rasters sintéticos")
+    parser.add_argument('--renderizadores', nargs='+', choices=list(RENDERIZADORES))
+    parser.add_argument('--tamanhos', nargs='+', type=int, default=list(TAMANHOS))
+    parser.add_argument('--nodata', nargs='+', type=float, default=list(FRACOES_NODATA),
+                        help="frações de pixels sem dado (0 a 1)")
+    parser.add_argument('--reamostragem', nargs='+', default=['none', 'average'],
+                        help="'none' = resolução total, ou nome do Resampling do rasterio")
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--pasta', help="guardar os rasters sintéticos e PNGs nesta pasta")
+    parser.add_argument('--saida', default='resultados_benchmark.json')
+    parser.add_argument('--comparar', nargs=2, metavar=('ANTES', 'DEPOIS'))
+    args = parser.parse_args(argv)
+
+    if args.comparar:
+        comparar(*args.comparar)
+        return
+    reamostragens = [None if r.lower() == 'none' else r for r in args.reamostragem]
+    executar_benchmark(args.renderizadores, args.tamanhos, args.nodata, reamostragens,
+                       args.repeticoes, args.pasta, args.saida)
+    print(f"Resultados salvos em {args.saida}")
+
+
+if __name__ == '__main__':
+    main()
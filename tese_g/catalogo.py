@@ -0,0 +1,198 @@
+"""
+Catálogo SQLite das exportações do GEE.
+
+As pastas de exportação são varridas uma vez: do nome de cada GeoTIFF saem
+índice, período, área e ano; do arquivo saem os metadados do raster (CRS,
+transformação, tamanho, dtype, nodata) e as estatísticas dos pixels válidos
+(ver ``tese_g.estatisticas``). Nas execuções seguintes só os arquivos novos
+ou alterados são relidos, e as consultas (ex.: todo NDVI Seco da Area2
+desde 2015) não tocam no sistema de arquivos.
+"""
+
+import json
+import os
+import sqlite3
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor
+
+from .nomes import interpretar_nome
+
+PERCENTIS_CATALOGO = (2, 98)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS rasters (
+    caminho     TEXT PRIMARY KEY,
+    pasta       TEXT NOT NULL,
+    arquivo     TEXT NOT NULL,
+    indice      TEXT,
+    periodo     TEXT,
+    area        TEXT,
+    ano         INTEGER,
+    tamanho     INTEGER NOT NULL,
+    mtime       INTEGER NOT NULL,
+    crs         TEXT,
+    transform   TEXT,
+    largura     INTEGER,
+    altura      INTEGER,
+    dtype       TEXT,
+    nodata      REAL,
+    n_validos   INTEGER,
+    vmin        REAL,
+    vmax        REAL,
+    media       REAL,
+    p2          REAL,
+    p98         REAL
+);
+CREATE INDEX IF NOT EXISTS rasters_busca ON rasters (indice, periodo, area, ano);
+"""
+
+
+def conectar(caminho_db):
+    """Abre (e cria, se preciso) o banco do catálogo."""
+    conexao = sqlite3.connect(caminho_db)
+    conexao.row_factory = sqlite3.Row
+    conexao.executescript(_ESQUEMA)
+    return conexao
+
+
+def _ler_raster(caminho):
+    """Metadados e estatísticas de um GeoTIFF (executado nos processos de trabalho)."""
+    import rasterio
+    from .estatisticas import LIMITES_VALIDOS, estatisticas_raster
+
+    info = os.stat(caminho)
+    campos = interpretar_nome(caminho) or {'indice': None, 'periodo': None, 'area': None, 'ano': None}
+    with rasterio.open(caminho) as src:
+        est = estatisticas_raster(src, limites=LIMITES_VALIDOS.get(campos['indice']),
+                                  percentis=PERCENTIS_CATALOGO)
+        campos.update({
+            'caminho': caminho,
+            'pasta': os.path.dirname(caminho),
+            'arquivo': os.path.basename(caminho),
+            'tamanho': info.st_size,
+            'mtime': info.st_mtime_ns,
+            'crs': src.crs.to_string() if src.crs else None,
+            'transform': json.dumps(list(src.transform)[:6]),
+            'largura': src.width,
+            'altura': src.height,
+            'dtype': src.dtypes[0],
+            'nodata': src.nodata,
+            'n_validos': est['n_validos'],
+            'vmin': est['min'],
+            'vmax': est['max'],
+            'media': est['media'],
+            'p2': est['percentis'][2],
+            'p98': est['percentis'][98],
+        })
+    return campos
+
+
+def atualizar_catalogo(caminho_db, pastas, n_processos=1):
+    """
+    Varre as `pastas` e atualiza o catálogo: lê só os .tif novos ou cujo
+    tamanho/data mudaram e remove os que sumiram dessas pastas.
+    Retorna um dicionário com as contagens 'novos', 'atuais' e 'removidos'.
+    """
+    from .lote import listar_tifs
+
+    if isinstance(pastas, str):
+        pastas = [pastas]
+
+    with closing(conectar(caminho_db)) as conexao, conexao:
+        pendentes = []
+        encontrados = set()
+        n_atuais = 0
+        n_removidos = 0
+        for pasta in pastas:
+            pasta = os.path.abspath(pasta)
+            registrados = {
+                linha['caminho']: (linha['tamanho'], linha['mtime'])
+                for linha in conexao.execute(
+                    "SELECT caminho, tamanho, mtime FROM rasters WHERE pasta = ?", (pasta,))
+            }
+            for caminho in listar_tifs(pasta):
+                encontrados.add(caminho)
+                info = os.stat(caminho)
+                if registrados.get(caminho) == (info.st_size, info.st_mtime_ns):
+                    n_atuais += 1
+                else:
+                    pendentes.append(caminho)
+            removidos = [c for c in registrados if c not in encontrados]
+            conexao.executemany("DELETE FROM rasters WHERE caminho = ?", [(c,) for c in removidos])
+            n_removidos += len(removidos)
+
+        if n_processos > 1 and len(pendentes) > 1:
+            with ProcessPoolExecutor(max_workers=n_processos) as executor:
+                linhas = list(executor.map(_ler_raster, pendentes))
+        else:
+            linhas = [_ler_raster(caminho) for caminho in pendentes]
+
+        if linhas:
+            colunas = list(linhas[0])
+            conexao.executemany(
+                f"INSERT OR REPLACE INTO rasters ({', '.join(colunas)}) "
+                f"VALUES ({', '.join(':' + c for c in colunas)})",
+                linhas,
+            )
+
+    return {'novos': len(linhas), 'atuais': n_atuais, 'removidos': n_removidos}
+
+
+def consultar(caminho_db, indice=None, periodo=None, area=None, ano_min=None, ano_max=None):
+    """
+    Lista (como dicionários) os rasters do catálogo que atendem aos filtros,
+    ordenados por índice, área, ano e período.
+    Ex.: ``consultar(db, indice='NDVI', periodo='Seco', area='Area2', ano_min=2015)``.
+    """
+    filtros = []
+    valores = []
+    for coluna, valor in (('indice', indice and indice.upper()), ('periodo', periodo), ('area', area)):
+        if valor is not None:
+            filtros.append(f"{coluna} = ?")
+            valores.append(valor)
+    if ano_min is not None:
+        filtros.append("ano >= ?")
+        valores.append(ano_min)
+    if ano_max is not None:
+        filtros.append("ano <= ?")
+        valores.append(ano_max)
+
+    sql = "SELECT * FROM rasters"
+    if filtros:
+        sql += " WHERE " + " AND ".join(filtros)
+    sql += " ORDER BY indice, area, ano, periodo"
+
+    with closing(conectar(caminho_db)) as conexao, conexao:
+        return [dict(linha) for linha in conexao.execute(sql, valores)]
+
+
+def estatisticas_do_registro(registro):
+    """Converte uma linha do catálogo no formato de ``estatisticas_raster``."""
+    return {
+        'n_validos': registro['n_validos'],
+        'min': registro['vmin'],
+        'max': registro['vmax'],
+        'media': registro['media'],
+        'percentis': {2: registro['p2'], 98: registro['p98']},
+    }
+
+
+def estatisticas_em_cache(caminho_db, caminhos, indice=None):
+    """
+    Estatísticas do catálogo para os `caminhos` cujo arquivo não mudou desde
+    a última varredura ({caminho: estatísticas}); os demais ficam de fora.
+    Com `indice`, só valem os registros desse índice: as estatísticas do
+    catálogo usam a faixa válida do índice do nome, e um arquivo fora do
+    padrão (sem faixa) precisa da passada com a faixa do índice desenhado.
+    """
+    cache = {}
+    with closing(conectar(caminho_db)) as conexao, conexao:
+        for caminho in caminhos:
+            linha = conexao.execute(
+                "SELECT * FROM rasters WHERE caminho = ?", (os.path.abspath(caminho),)).fetchone()
+            if linha is None or (indice is not None and linha['indice'] != indice.upper()):
+                continue
+            info = os.stat(caminho)
+            if (linha['tamanho'], linha['mtime']) == (info.st_size, info.st_mtime_ns):
+                cache[caminho] = estatisticas_do_registro(linha)
+    return cache
@@ -0,0 +1,327 @@
+"""
+Linha de comando do pacote, para rodar fora do Colab (servidores, lotes).
+
+    tese-g render ndvi --in GEE_Exports --out GEE_Maps --motor rapido
+    tese-g render ndvi --in GEE_Exports --out GEE_Maps --cluster tcp://10.0.0.5:8786
+    tese-g cog --in MODIS_EVI
+    tese-g vci --in GEE_Exports --out MODIS_VCI
+    tese-g indices --in MODIS_REFLECTANCIA --out MODIS
+    tese-g zonal --in MODIS_VCI --poligonos fazendas.gpkg --saida zonal.csv
+    tese-g catalogo --db catalogo.db --in GEE_Exports MODIS_EVI
+    tese-g mudancas --in MODIS_NDVI MODIS_EVI --out MODIS_MUDANCAS
+    tese-g render delta --in MODIS_MUDANCAS/DELTA --out GEE_Maps_Mudancas
+    tese-g suavizar --in GEE_Exports --out GEE_Exports_Filtrados --preenchimento harmonico
+    tese-g galeria --in GEE_Exports MODIS_EVI --out galeria --servir
+    tese-g galeria --out galeria --completos NDVI_Seco_Area1_2010.tif
+    tese-g amostrar --pontos parcelas.csv --in GEE_Exports MODIS_EVI --saida valores.csv
+    tese-g mosaico --in GEE_Exports --out mosaicos --mapa GEE_Maps_Regional
+    tese-g atlas ndvi --in GEE_Exports --out GEE_Maps/atlas --colunas area
+    tese-g animacao ndvi --in GEE_Exports --out GEE_Maps/atlas --formato gif
+
+Cada subcomando só importa os módulos que usa (matplotlib, geopandas...
+ficam para quando são necessários), para a partida ser rápida em muitos
+trabalhos curtos. Também roda com ``python -m tese_g``.
+"""
+
+import argparse
+import os
+import sys
+
+
+def _agendador(args):
+    """Agendador do backend em blocos (``tese_g.distribuido``) pedido por --grafo/--cluster, ou nulo."""
+    from contextlib import nullcontext
+
+    if args.cluster:
+        from .distribuido import conectar_cluster
+        return conectar_cluster(args.cluster)
+    if args.grafo:
+        from .distribuido import agendador_local
+        return agendador_local(args.processos)
+    return nullcontext()
+
+
+def _render(args):
+    from .lote import imprimir_relatorio, processar_lote
+    from .manifesto import listar_orfaos
+
+    opcoes = {}
+    if args.reamostragem.lower() != 'none':
+        opcoes['reamostragem'] = args.reamostragem
+    if args.memoria_max_mb is not None:
+        opcoes['memoria_max_mb'] = args.memoria_max_mb
+    if args.mascaras is not None:
+        opcoes['pasta_mascaras'] = args.mascaras
+    with _agendador(args) as agendador:
+        resultados = processar_lote(args.entrada, args.saida, args.indice, n_processos=args.processos,
+                                    incremental=args.incremental, com_hash=args.com_hash,
+                                    catalogo=args.catalogo, motor=args.motor,
+                                    escala_comum=args.escala_comum, pipeline=args.pipeline,
+                                    n_leitores=args.leitores, profundidade=args.profundidade,
+                                    agendador=agendador, **opcoes)
+    orfaos = listar_orfaos(args.entrada, args.saida) if args.incremental else ()
+    imprimir_relatorio(resultados, args.saida, orfaos=orfaos)
+    return 1 if any(r['status'] == 'erro' for r in resultados) else 0
+
+
+def _cog(args):
+    from .cog import converter_pasta
+
+    print(converter_pasta(args.entrada, nodata=args.nodata))
+    return 0
+
+
+def _vci(args):
+    from .vci import calcular_vci
+
+    if args.grafo or args.cluster:
+        from .distribuido import vci_grafo
+        with _agendador(args) as agendador:
+            gravados = vci_grafo(args.entrada, args.saida, agendador)
+    else:
+        gravados = calcular_vci(args.entrada, args.saida, recalcular=args.recalcular)
+    print(f"VCI gravados: {len(gravados)}")
+    return 0
+
+
+def _indices(args):
+    from .indices import calcular_indices_pasta
+
+    resultados = calcular_indices_pasta(args.entrada, args.saida, indices=args.indices,
+                                        n_processos=args.processos or 1)
+    print(f"Cenas processadas: {len(resultados)}")
+    return 0
+
+
+def _zonal(args):
+    from .zonal import zonal_lote
+
+    tabela = zonal_lote(args.entrada, args.poligonos, campo_id=args.campo_id, pasta_cache=args.cache,
+                        pasta_mascaras=args.mascaras)
+    tabela.to_csv(args.saida, index=False)
+    print(f"Estatísticas zonais salvas em {args.saida}: {len(tabela)} linhas")
+    return 0
+
+
+def _catalogo(args):
+    from .catalogo import atualizar_catalogo
+
+    print(atualizar_catalogo(args.db, args.entrada, n_processos=args.processos or 1))
+    return 0
+
+
+def _mudancas(args):
+    from .mudancas import calcular_mudancas
+
+    gravados = calcular_mudancas(args.entrada, args.saida, indices=args.indices, produtos=args.produtos)
+    print(f"Produtos de mudança gravados: {len(gravados)}")
+    return 0
+
+
+def _suavizar(args):
+    from .filtros import filtrar_pasta
+
+    preenchimento = None if args.preenchimento == 'nenhum' else args.preenchimento
+    gravados = filtrar_pasta(args.entrada, args.saida, indices=args.indices, picos=not args.sem_picos,
+                             limiar_pico=args.limiar_pico, preenchimento=preenchimento,
+                             suavizar=not args.sem_suavizacao, janela=args.janela, ordem=args.ordem)
+    print(f"Imagens filtradas gravadas: {len(gravados)}")
+    return 0
+
+
+def _galeria(args):
+    from .galeria import gerar_galeria, gerar_mapas_completos, servir_galeria
+    from .lote import imprimir_relatorio
+
+    if args.entrada:
+        imprimir_relatorio(gerar_galeria(args.entrada, args.saida, largura=args.largura,
+                                         n_processos=args.processos),
+                           os.path.join(args.saida, 'miniaturas'))
+    if args.completos is not None:
+        imprimir_relatorio(gerar_mapas_completos(args.saida, args.completos or None, n_processos=args.processos,
+                                                 reamostragem=args.reamostragem),
+                           os.path.join(args.saida, 'mapas'))
+    if args.servir:
+        servir_galeria(args.saida, porta=args.porta, reamostragem=args.reamostragem)
+    return 0
+
+
+def _amostrar(args):
+    from .amostragem import amostrar_pontos
+
+    tabela = amostrar_pontos(args.pontos, args.entrada, x=args.x, y=args.y, crs=args.crs,
+                             campo_id=args.campo_id)
+    tabela.to_csv(args.saida, index=False)
+    print(f"Amostras salvas em {args.saida}: {len(tabela)} linhas")
+    return 0
+
+
+def _mosaico(args):
+    from .mosaico import gerar_mapa_regional, indexar_mosaicos
+
+    indices = indexar_mosaicos(args.entrada, args.saida)
+    print(f"Mosaicos indexados: {len(indices)}")
+    if args.mapa:
+        for caminho in indices:
+            print(gerar_mapa_regional(caminho, args.mapa, bbox=args.bbox, largura_max=args.largura_max))
+    return 0
+
+
+def _atlas(args):
+    from .atlas import gerar_atlas
+
+    print(gerar_atlas(args.entrada, args.saida, args.indice, colunas=args.colunas, dpi=args.dpi))
+    return 0
+
+
+def _animacao(args):
+    from .atlas import gerar_animacao
+
+    print(gerar_animacao(args.entrada, args.saida, args.indice, formato=args.formato, fps=args.fps))
+    return 0
+
+
+def _argumentos_grafo(p):
+    p.add_argument('--grafo', action='store_true',
+                   help="backend em blocos: janelas e mapas como tarefas de um pool local")
+    p.add_argument('--cluster', metavar='ENDERECO',
+                   help="agendador do Dask distributed (ex.: tcp://10.0.0.5:8786) no lugar do pool local")
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(prog='tese-g', description="Mapas e índices da tese (NDVI, EVI, LAI, NDWI, LSWI, VCI)")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p = sub.add_parser('render', help="gera os mapas PNG de uma pasta de GeoTIFFs")
+    p.add_argument('indice', choices=['ndvi', 'evi', 'lai', 'ndwi', 'lswi', 'vci', 'delta', 'anomalia'])
+    p.add_argument('--in', dest='entrada', required=True, help="pasta com os .tif")
+    p.add_argument('--out', dest='saida', required=True, help="pasta dos PNGs")
+    p.add_argument('--motor', choices=['matplotlib', 'rapido'], default='matplotlib')
+    p.add_argument('--processos', type=int, help="processos em paralelo (padrão: núcleos)")
+    p.add_argument('--reamostragem', default='average', help="'none' = resolução total")
+    p.add_argument('--incremental', action='store_true', help="só refaz mapas desatualizados")
+    p.add_argument('--com-hash', action='store_true', help="compara o conteúdo dos .tif no modo incremental")
+    p.add_argument('--catalogo', help="banco SQLite com estatísticas já calculadas")
+    p.add_argument('--escala-comum', action='store_true', help="mesma escala de cores para toda a série")
+    p.add_argument('--memoria-max-mb', type=float)
+    p.add_argument('--mascaras', help="pasta do cache de máscaras de validade (1 bit por pixel)")
+    p.add_argument('--pipeline', action='store_true',
+                   help="um processo: lê os próximos .tif e grava os PNGs enquanto desenha")
+    p.add_argument('--leitores', type=int, default=2, help="threads de leitura do --pipeline")
+    p.add_argument('--profundidade', type=int, default=4, help="máximo de .tif na memória no --pipeline")
+    _argumentos_grafo(p)
+    p.set_defaults(funcao=_render)
+
+    p = sub.add_parser('cog', help="regrava os .tif como Cloud-Optimized GeoTIFF")
+    p.add_argument('--in', dest='entrada', required=True)
+    p.add_argument('--nodata', type=float)
+    p.set_defaults(funcao=_cog)
+
+    p = sub.add_parser('vci', help="calcula o VCI a partir do acervo de NDVI")
+    p.add_argument('--in', dest='entrada', required=True, help="pasta com os NDVI")
+    p.add_argument('--out', dest='saida', required=True)
+    p.add_argument('--recalcular', action='store_true', help="refaz todos os anos")
+    p.add_argument('--processos', type=int, help="processos do --grafo (padrão: núcleos)")
+    _argumentos_grafo(p)
+    p.set_defaults(funcao=_vci)
+
+    p = sub.add_parser('indices', help="calcula NDVI/EVI/NDWI/LSWI de cenas de reflectância")
+    p.add_argument('--in', dest='entrada', required=True)
+    p.add_argument('--out', dest='saida', required=True, help="uma subpasta por índice")
+    p.add_argument('--indices', nargs='+', default=['NDVI', 'EVI', 'NDWI', 'LSWI'])
+    p.add_argument('--processos', type=int)
+    p.set_defaults(funcao=_indices)
+
+    p = sub.add_parser('zonal', help="estatísticas por polígono")
+    p.add_argument('--in', dest='entrada', nargs='+', required=True)
+    p.add_argument('--poligonos', required=True)
+    p.add_argument('--saida', required=True, help="arquivo CSV")
+    p.add_argument('--campo-id')
+    p.add_argument('--cache', help="pasta para guardar as zonas rasterizadas")
+    p.add_argument('--mascaras', help="pasta do cache de máscaras de validade (1 bit por pixel)")
+    p.set_defaults(funcao=_zonal)
+
+    p = sub.add_parser('catalogo', help="atualiza o catálogo SQLite das exportações")
+    p.add_argument('--db', required=True)
+    p.add_argument('--in', dest='entrada', nargs='+', required=True)
+    p.add_argument('--processos', type=int)
+    p.set_defaults(funcao=_catalogo)
+
+    p = sub.add_parser('mudancas', help="diferenças Umido-Seco, entre anos e anomalias (z-score)")
+    p.add_argument('--in', dest='entrada', nargs='+', required=True)
+    p.add_argument('--out', dest='saida', required=True, help="recebe as pastas DELTA e ANOMALIA")
+    p.add_argument('--indices', nargs='+', default=['NDVI', 'EVI', 'NDWI', 'LSWI'])
+    p.add_argument('--produtos', nargs='+', choices=['estacao', 'anual', 'anomalia'],
+                   default=['estacao', 'anual', 'anomalia'])
+    p.set_defaults(funcao=_mudancas)
+
+    p = sub.add_parser('suavizar', help="remove picos, preenche lacunas e suaviza as séries no tempo")
+    p.add_argument('--in', dest='entrada', required=True)
+    p.add_argument('--out', dest='saida', required=True, help="recebe os .tif filtrados, com os mesmos nomes")
+    p.add_argument('--indices', nargs='+')
+    p.add_argument('--preenchimento', choices=['linear', 'harmonico', 'nenhum'], default='linear')
+    p.add_argument('--limiar-pico', type=float, help="na unidade do índice (padrão por índice)")
+    p.add_argument('--sem-picos', action='store_true')
+    p.add_argument('--sem-suavizacao', action='store_true')
+    p.add_argument('--janela', type=int, default=5, help="imagens na janela do Savitzky-Golay")
+    p.add_argument('--ordem', type=int, default=2, help="grau do polinômio do Savitzky-Golay")
+    p.set_defaults(funcao=_suavizar)
+
+    p = sub.add_parser('galeria', help="miniaturas e index.html primeiro; mapas completos depois ou sob demanda")
+    p.add_argument('--in', dest='entrada', nargs='+', help="pastas com os .tif (refaz miniaturas e índice)")
+    p.add_argument('--out', dest='saida', required=True, help="pasta da galeria")
+    p.add_argument('--largura', type=int, default=400, help="largura máxima das miniaturas (pixels)")
+    p.add_argument('--processos', type=int)
+    p.add_argument('--completos', nargs='*', metavar='ARQUIVO',
+                   help="gera os mapas completos desses .tif (sem nomes: de todos)")
+    p.add_argument('--reamostragem', default='average', help="dos mapas completos")
+    p.add_argument('--servir', action='store_true', help="servidor local que gera os mapas completos ao abrir")
+    p.add_argument('--porta', type=int, default=8000)
+    p.set_defaults(funcao=_galeria)
+
+    p = sub.add_parser('amostrar', help="valores de pontos de campo em todos os .tif (tabela longa); "
+                                        "precisa do pandas: pip install .[amostragem]")
+    p.add_argument('--pontos', required=True, help="CSV com as coordenadas")
+    p.add_argument('--in', dest='entrada', nargs='+', required=True)
+    p.add_argument('--saida', required=True, help="arquivo CSV")
+    p.add_argument('--x', default='lon')
+    p.add_argument('--y', default='lat')
+    p.add_argument('--crs', default='EPSG:4326', help="CRS das coordenadas do CSV")
+    p.add_argument('--campo-id')
+    p.set_defaults(funcao=_amostrar)
+
+    p = sub.add_parser('mosaico', help="índice virtual das áreas de cada índice/período/ano")
+    p.add_argument('--in', dest='entrada', nargs='+', required=True)
+    p.add_argument('--out', dest='saida', required=True, help="pasta dos JSON do mosaico")
+    p.add_argument('--mapa', help="pasta para o mapa regional de cada mosaico")
+    p.add_argument('--bbox', type=float, nargs=4, metavar=('XMIN', 'YMIN', 'XMAX', 'YMAX'))
+    p.add_argument('--largura-max', type=int, default=1500)
+    p.set_defaults(funcao=_mosaico)
+
+    p = sub.add_parser('atlas', help="uma figura por área (ou período) com todos os anos")
+    p.add_argument('indice', choices=['ndvi', 'evi', 'lai', 'ndwi', 'lswi', 'vci'])
+    p.add_argument('--in', dest='entrada', required=True)
+    p.add_argument('--out', dest='saida', required=True)
+    p.add_argument('--colunas', choices=['periodo', 'area'], default='periodo')
+    p.add_argument('--dpi', type=int, default=150)
+    p.set_defaults(funcao=_atlas)
+
+    p = sub.add_parser('animacao', help="animação ano a ano de cada série")
+    p.add_argument('indice', choices=['ndvi', 'evi', 'lai', 'ndwi', 'lswi', 'vci'])
+    p.add_argument('--in', dest='entrada', required=True)
+    p.add_argument('--out', dest='saida', required=True)
+    p.add_argument('--formato', choices=['gif', 'mp4'], default='gif')
+    p.add_argument('--fps', type=float, default=2)
+    p.set_defaults(funcao=_animacao)
+    return parser
+
+
+def main(argv=None):
+    # Sem janela: o matplotlib não precisa procurar um backend interativo
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    args = _argumentos().parse_args(argv)
+    return args.funcao(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Conversão das exportações do GEE para Cloud-Optimized GeoTIFF (COG).
+
+As exportações chegam como GeoTIFF em faixas, sem overviews: qualquer
+miniatura ou janela pequena obriga a decodificar o arquivo inteiro. Aqui
+cada arquivo é regravado (no lugar) como COG: blocos 512x512, compressão
+DEFLATE com preditor, overviews internas e nodata definido, com a
+compressão em todos os núcleos. Depois disso as leituras reduzidas de
+``tese_g.leitura`` (``out_shape``) são atendidas pelo GDAL a partir da
+overview adequada, e leituras por janela só tocam os blocos necessários.
+"""
+
+import os
+
+import rasterio
+import rasterio.shutil
+
+TAMANHO_BLOCO = 512
+
+
+def perfil_saida(src, dtype, nodata):
+    """Perfil dos GeoTIFFs gerados localmente: grade de `src`, blocos 256x256 e DEFLATE."""
+    return {
+        'driver': 'GTiff', 'count': 1, 'dtype': dtype, 'nodata': nodata,
+        'width': src.width, 'height': src.height, 'crs': src.crs, 'transform': src.transform,
+        'tiled': True, 'blockxsize': 256, 'blockysize': 256, 'compress': 'deflate',
+    }
+
+
+def esta_otimizado(src, nodata=None):
+    """True se o arquivo já é um COG em blocos, compactado, com overviews e o nodata pedido."""
+    if src.tags(ns='IMAGE_STRUCTURE').get('LAYOUT') != 'COG':
+        return False
+    if not src.profile.get('tiled') or src.compression is None:
+        return False
+    if max(src.width, src.height) > TAMANHO_BLOCO and not src.overviews(1):
+        return False
+    return nodata is None or src.nodata == nodata
+
+
+def converter_cog(caminho, destino=None, nodata=None, compressao='deflate', reamostragem='average'):
+    """
+    Regrava `caminho` como COG em `destino` (padrão: o próprio arquivo,
+    trocado de forma atômica). `nodata` define o nodata quando a exportação
+    não tem um (ou tem outro); `reamostragem` é usada nas overviews.
+    Retorna False se o arquivo já estava otimizado.
+    """
+    from rasterio.vrt import WarpedVRT
+
+    destino = destino or caminho
+    temporario = destino + '.tmp.tif'
+    opcoes = {
+        'driver': 'COG', 'blocksize': TAMANHO_BLOCO, 'compress': compressao, 'predictor': 'YES',
+        'overview_resampling': reamostragem, 'num_threads': 'ALL_CPUS', 'bigtiff': 'IF_SAFER',
+    }
+    with rasterio.open(caminho) as src:
+        if esta_otimizado(src, nodata):
+            if destino != caminho:
+                rasterio.shutil.copyfiles(caminho, destino)
+            return False
+        try:
+            if nodata is not None and src.nodata != nodata:
+                # Pixels sem dado na origem passam a ter o novo nodata; os demais são copiados
+                with WarpedVRT(src, src_nodata=src.nodata, nodata=nodata) as vrt:
+                    rasterio.shutil.copy(vrt, temporario, **opcoes)
+            else:
+                rasterio.shutil.copy(src, temporario, **opcoes)
+        except Exception:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+    os.replace(temporario, destino)
+    return True
+
+
+def converter_pasta(pasta_imagens, nodata=None, compressao='deflate', reamostragem='average'):
+    """
+    Converte para COG, no lugar, todos os .tif da pasta que ainda não estão
+    otimizados. Retorna {'convertidos': n, 'ja_otimizados': n}.
+    """
+    from .lote import listar_tifs
+
+    contagem = {'convertidos': 0, 'ja_otimizados': 0}
+    for caminho in listar_tifs(pasta_imagens):
+        convertido = converter_cog(caminho, nodata=nodata, compressao=compressao, reamostragem=reamostragem)
+        contagem['convertidos' if convertido else 'ja_otimizados'] += 1
+    return contagem
@@ -0,0 +1,187 @@
+"""
+Cubo temporal por área, gravado em disco e lido por memória mapeada.
+
+Empilha todos os anos e períodos (Seco/Umido) de um índice de uma área
+(``<INDICE>_<Seco|Umido>_<AreaN>_<ANO>.tif``) em um único ``.npy`` de forma
+(linhas, colunas, tempos): a série completa de cada pixel fica contígua no
+disco, então consultas por pixel e estatísticas da série inteira leem
+faixas contínuas do arquivo em vez de abrir dezenas de GeoTIFFs. Junto
+fica um ``cubo.json`` com os tempos e a georreferência da imagem de origem.
+"""
+
+import json
+import os
+
+import numpy as np
+import rasterio
+
+from .estatisticas import janelas_blocos, mascara_validos
+from .nomes import interpretar_nome
+
+ORDEM_PERIODOS = {'Seco': 0, 'Umido': 1}
+
+# Linhas de pixels lidas por vez ao percorrer o cubo
+LINHAS_POR_FAIXA = 256
+
+
+def nodata_padrao(dtype, nodata):
+    """Valor de nodata do cubo: o do arquivo, NaN para float ou o mínimo do tipo inteiro."""
+    if nodata is not None:
+        return nodata
+    if np.issubdtype(dtype, np.floating):
+        return float('nan')
+    return int(np.iinfo(dtype).min)
+
+
+def agrupar_series(pasta_imagens):
+    """
+    Agrupa os .tif da pasta por (índice, área), cada grupo ordenado por ano e
+    período: {('NDVI', 'Area1'): [(campos, caminho), ...]}.
+    """
+    from .lote import listar_tifs
+
+    grupos = {}
+    for caminho in listar_tifs(pasta_imagens):
+        campos = interpretar_nome(caminho)
+        if campos is not None:
+            grupos.setdefault((campos['indice'], campos['area']), []).append((campos, caminho))
+    for serie in grupos.values():
+        serie.sort(key=lambda item: (item[0]['ano'], ORDEM_PERIODOS[item[0]['periodo']]))
+    return grupos
+
+
+def construir_cubo(serie, pasta_cubo):
+    """
+    Grava o cubo de uma série [(campos, caminho), ...] em `pasta_cubo`.
+    Os GeoTIFFs são copiados bloco a bloco (memória limitada a um bloco) e
+    precisam ter a mesma grade (tamanho e transformação). Tipo e nodata do
+    cubo são os do primeiro arquivo; nos demais, os pixels sem dado (nodata
+    próprio ou NaN) passam a ter o nodata do cubo.
+    """
+    os.makedirs(pasta_cubo, exist_ok=True)
+    with rasterio.open(serie[0][1]) as src:
+        altura, largura = src.height, src.width
+        transform, crs = src.transform, src.crs
+        dtype = np.dtype(src.dtypes[0])
+        nodata = nodata_padrao(dtype, src.nodata)
+
+    dados = np.lib.format.open_memmap(
+        os.path.join(pasta_cubo, 'dados.npy'), mode='w+', dtype=dtype,
+        shape=(altura, largura, len(serie)),
+    )
+    tempos = []
+    for t, (campos, caminho) in enumerate(serie):
+        with rasterio.open(caminho) as src:
+            if (src.height, src.width) != (altura, largura) or src.transform != transform:
+                raise ValueError(f"Grade diferente do restante da série: {os.path.basename(caminho)}")
+            # O primeiro arquivo define o nodata do cubo; os outros podem ter outro (ou nenhum)
+            remapear = t > 0 and (src.nodata != nodata or np.issubdtype(np.dtype(src.dtypes[0]), np.floating))
+            for janela in janelas_blocos(src):
+                bloco = src.read(1, window=janela)
+                if remapear:
+                    invalidos = mascara_validos(bloco, src.nodata, invertida=True)
+                    bloco = np.where(invalidos, 0, bloco).astype(dtype)
+                    bloco[invalidos] = nodata
+                linhas, colunas = janela.toslices()
+                dados[linhas, colunas, t] = bloco
+        tempos.append({'ano': campos['ano'], 'periodo': campos['periodo'],
+                       'arquivo': os.path.basename(caminho)})
+    dados.flush()
+    del dados
+
+    meta = {
+        'indice': serie[0][0]['indice'],
+        'area': serie[0][0]['area'],
+        'forma': [altura, largura, len(serie)],
+        'layout': ['linha', 'coluna', 'tempo'],
+        'dtype': dtype.name,
+        'nodata': None if np.isnan(nodata) else nodata,
+        'transform': list(transform)[:6],
+        'crs': crs.to_string() if crs else None,
+        'tempos': tempos,
+    }
+    with open(os.path.join(pasta_cubo, 'cubo.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=1)
+    return meta
+
+
+def construir_cubos(pasta_imagens, pasta_cubos):
+    """
+    Constrói um cubo por (índice, área) encontrado em `pasta_imagens`, em
+    `pasta_cubos/<INDICE>_<AreaN>`. Retorna a lista de pastas criadas.
+    """
+    pastas = []
+    for (indice, area), serie in sorted(agrupar_series(pasta_imagens).items()):
+        pasta_cubo = os.path.join(pasta_cubos, f'{indice}_{area}')
+        construir_cubo(serie, pasta_cubo)
+        pastas.append(pasta_cubo)
+    return pastas
+
+
+def abrir_cubo(pasta_cubo):
+    """Abre o cubo só para leitura: (dados em memória mapeada, metadados)."""
+    with open(os.path.join(pasta_cubo, 'cubo.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    dados = np.load(os.path.join(pasta_cubo, 'dados.npy'), mmap_mode='r')
+    return dados, meta
+
+
+def _validos(valores, meta):
+    """Máscara de pixels válidos de um trecho do cubo."""
+    if meta['nodata'] is None:
+        return ~np.isnan(valores)
+    validos = valores != meta['nodata']
+    if np.issubdtype(valores.dtype, np.floating):
+        validos &= ~np.isnan(valores)
+    return validos
+
+
+def serie_pixel(pasta_cubo, x, y):
+    """
+    Série temporal do pixel que contém a coordenada (x, y) no CRS do cubo:
+    lista de {'ano', 'periodo', 'valor'} (valor None onde não há dado).
+    """
+    from affine import Affine
+
+    dados, meta = abrir_cubo(pasta_cubo)
+    coluna, linha = ~Affine(*meta['transform']) * (x, y)
+    linha, coluna = int(np.floor(linha)), int(np.floor(coluna))
+    if not (0 <= linha < dados.shape[0] and 0 <= coluna < dados.shape[1]):
+        raise IndexError(f"Coordenada ({x}, {y}) fora da área do cubo")
+
+    valores = np.array(dados[linha, coluna])
+    validos = _validos(valores, meta)
+    return [
+        {'ano': tempo['ano'], 'periodo': tempo['periodo'],
+         'valor': valores[t].item() if validos[t] else None}
+        for t, tempo in enumerate(meta['tempos'])
+    ]
+
+
+def estatisticas_temporais(pasta_cubo, linhas_por_faixa=LINHAS_POR_FAIXA):
+    """
+    Estatísticas de cada pixel ao longo de toda a série, lidas faixa a faixa:
+    dicionário com 'n_validos', 'min', 'max' e 'media' (arrays linhas x colunas,
+    float32 com NaN onde o pixel não tem nenhum dado válido).
+    """
+    dados, meta = abrir_cubo(pasta_cubo)
+    altura, largura = dados.shape[:2]
+    saida = {
+        'n_validos': np.zeros((altura, largura), dtype=np.int32),
+        'min': np.full((altura, largura), np.nan, dtype=np.float32),
+        'max': np.full((altura, largura), np.nan, dtype=np.float32),
+        'media': np.full((altura, largura), np.nan, dtype=np.float32),
+    }
+    for inicio in range(0, altura, linhas_por_faixa):
+        faixa = slice(inicio, min(inicio + linhas_por_faixa, altura))
+        valores = np.asarray(dados[faixa], dtype=np.float32)
+        validos = _validos(valores, meta)
+        contagem = validos.sum(axis=2)
+        com_dado = contagem > 0
+        soma = np.where(validos, valores, 0).sum(axis=2, dtype=np.float64)
+
+        saida['n_validos'][faixa] = contagem
+        saida['min'][faixa] = np.where(com_dado, np.where(validos, valores, np.inf).min(axis=2), np.nan)
+        saida['max'][faixa] = np.where(com_dado, np.where(validos, valores, -np.inf).max(axis=2), np.nan)
+        saida['media'][faixa] = np.where(com_dado, soma / np.maximum(contagem, 1), np.nan)
+    return saida
@@ -0,0 +1,388 @@
+"""
+Execução em blocos, sob demanda, em um agendador de vários processos ou nós.
+
+Um ``Arranjo`` representa um raster, as bandas de uma cena ou a pilha de
+uma série (rasters de mesma grade) sem ler nada: só guarda as fontes e as
+janelas de leitura, faixas de largura total alinhadas aos blocos internos
+com cerca de ``PIXELS_POR_TAREFA`` pixels. Operações (``mapear``) só se
+acumulam; cada janela vira uma tarefa independente (ler a janela de todas
+as fontes, aplicar as operações) quando o arranjo é reduzido, gravado ou
+calculado. Estatísticas (histogramas de ``tese_g.histogramas`` somados
+entre janelas), índices de reflectância, VCI e o desenho dos mapas saem
+desses grafos de tarefas.
+
+O agendador é qualquer objeto com ``submit`` no formato de
+``concurrent.futures``: ``agendador_local`` (um pool de processos na
+máquina) ou, se o pacote ``distributed`` do Dask estiver instalado,
+``conectar_cluster`` (vários nós; os caminhos dos GeoTIFFs precisam ser
+os mesmos em todos eles, ex.: Drive ou NFS). Com ``None`` as tarefas rodam
+em série no próprio processo. Só os resultados de cada janela voltam ao
+processo principal, com no máximo ``max_pendentes`` tarefas em andamento.
+Funções passadas a ``mapear``/``reduzir`` precisam ser serializáveis
+(funções de módulo ou instâncias de classes, não ``lambda``).
+"""
+
+import copy
+import os
+from collections import deque
+from functools import reduce
+
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+from .cog import perfil_saida
+from .estatisticas import LIMITES_VALIDOS, mascara_validos
+from .medicao import contar_leitura
+from .nomes import interpretar_nome
+
+# Pixels por tarefa (por fonte); faixas menores quando o arranjo tem muitas fontes
+PIXELS_POR_TAREFA = 2 ** 22
+
+# Rasters abertos em cada processo de trabalho (ver ``tese_g.amostragem.CacheDatasets``)
+MAX_ABERTOS = 16
+
+_datasets = None
+
+
+def agendador_local(n_processos=None):
+    """Pool de `n_processos` processos (padrão: núcleos) com o backend Agg do matplotlib."""
+    from concurrent.futures import ProcessPoolExecutor
+    from .lote import _inicializar_processo
+
+    n_processos = n_processos or os.cpu_count() or 1
+    agendador = ProcessPoolExecutor(max_workers=n_processos, initializer=_inicializar_processo)
+    agendador.n_trabalhadores = n_processos
+    return agendador
+
+
+def conectar_cluster(endereco):
+    """Cliente do agendador distribuído do Dask em `endereco` (ex.: 'tcp://10.0.0.5:8786')."""
+    try:
+        from distributed import Client
+    except ImportError as e:
+        raise RuntimeError("Execução em vários nós precisa do pacote 'distributed' "
+                           "(pip install distributed)") from e
+    return Client(endereco)
+
+
+def n_trabalhadores(agendador):
+    """
+    Processos (ou threads) que executam as tarefas: o ``n_trabalhadores``
+    de ``agendador_local``, a soma das threads dos workers de um cliente do
+    Dask ou, para outros agendadores, os núcleos da máquina.
+    """
+    if getattr(agendador, 'n_trabalhadores', None):
+        return agendador.n_trabalhadores
+    if hasattr(agendador, 'scheduler_info'):
+        workers = agendador.scheduler_info()['workers'].values()
+        return sum(w.get('nthreads', 1) for w in workers) or 1
+    return os.cpu_count() or 1
+
+
+def _executar(agendador, tarefas, max_pendentes=None):
+    """
+    Resultados de [(função, argumentos), ...] na ordem das tarefas, com no
+    máximo `max_pendentes` submetidas ao mesmo tempo (padrão: 2 por
+    trabalhador, ver ``n_trabalhadores``).
+    """
+    if agendador is None:
+        for funcao, argumentos in tarefas:
+            yield funcao(*argumentos)
+        return
+    if max_pendentes is None:
+        max_pendentes = 2 * n_trabalhadores(agendador)
+    pendentes = deque()
+    for funcao, argumentos in tarefas:
+        if len(pendentes) >= max_pendentes:
+            yield pendentes.popleft().result()
+        pendentes.append(agendador.submit(funcao, *argumentos))
+    while pendentes:
+        yield pendentes.popleft().result()
+
+
+def _abrir(caminho):
+    """Raster aberto no cache do processo atual."""
+    global _datasets
+    if _datasets is None:
+        from .amostragem import CacheDatasets
+        _datasets = CacheDatasets(MAX_ABERTOS)
+    return _datasets.abrir(caminho)
+
+
+def janelas_tarefas(src, pixels_por_tarefa=PIXELS_POR_TAREFA):
+    """Faixas de largura total, alinhadas à altura dos blocos internos, com cerca de `pixels_por_tarefa` pixels."""
+    altura_bloco = src.block_shapes[0][0]
+    linhas = max(altura_bloco, (pixels_por_tarefa // src.width) // altura_bloco * altura_bloco)
+    return [Window(0, linha, src.width, min(linhas, src.height - linha)) for linha in range(0, src.height, linhas)]
+
+
+def _escala_padrao(caminho, dtype):
+    """0,0001 para NDVI inteiro (x 10.000), 1 para o resto."""
+    campos = interpretar_nome(caminho)
+    return 0.0001 if campos and campos['indice'] == 'NDVI' and np.issubdtype(dtype, np.integer) else 1.0
+
+
+def _ler(caminho, banda, janela, escala):
+    """Janela de uma banda em float32, multiplicada por `escala`, com NaN nos pixels inválidos."""
+    src = _abrir(caminho)
+    bloco = src.read(banda, window=janela)
+    contar_leitura(bloco)
+    validos = mascara_validos(bloco, src.nodatavals[banda - 1])
+    valores = bloco.astype(np.float32)
+    if escala != 1:
+        valores *= np.float32(escala)
+    valores[~validos] = np.nan
+    return valores
+
+
+def _calcular_bloco(fontes, janela, operacoes):
+    """Tarefa de uma janela: pilha (fontes, linhas, colunas) com as operações aplicadas."""
+    pilha = np.stack([_ler(caminho, banda, janela, escala) for caminho, banda, escala in fontes])
+    for operacao in operacoes:
+        pilha = operacao(pilha)
+    return pilha
+
+
+def _reduzir_bloco(fontes, janela, operacoes, parcial):
+    return parcial(_calcular_bloco(fontes, janela, operacoes))
+
+
+def _converter(valores, dtype, nodata, fator=1):
+    """Valores em float para o tipo de saída: NaN vira `nodata`; com `fator`, arredonda como no NDVI x 10.000."""
+    invalidos = ~np.isfinite(valores)
+    valores = np.where(invalidos, 0, valores)
+    if fator != 1:
+        valores = np.rint(np.clip(valores, -1, 1) * fator)
+    valores = valores.astype(dtype)
+    valores[invalidos] = nodata
+    return valores
+
+
+class Arranjo:
+    """Raster ou pilha de rasters dividido em janelas, calculado só quando o resultado é pedido."""
+
+    def __init__(self, fontes, janelas, referencia):
+        self.fontes = tuple(fontes)           # (caminho, banda, escala) de cada plano da pilha
+        self.janelas = list(janelas)
+        self.referencia = referencia          # raster que dá a grade e o perfil das saídas
+        self.operacoes = ()
+
+    def mapear(self, funcao):
+        """Novo arranjo com `funcao` (pilha -> array) aplicada a cada janela."""
+        novo = copy.copy(self)
+        novo.operacoes = self.operacoes + (funcao,)
+        return novo
+
+    def _tarefas(self, funcao=_calcular_bloco, *extras):
+        return [(funcao, (self.fontes, janela, self.operacoes) + extras) for janela in self.janelas]
+
+    def reduzir(self, parcial, combinar, agendador=None):
+        """`parcial` em cada janela (nos processos de trabalho) e `combinar` dos resultados, dois a dois."""
+        return reduce(combinar, _executar(agendador, self._tarefas(_reduzir_bloco, parcial)))
+
+    def calcular(self, agendador=None):
+        """Resultado inteiro em memória (só para arranjos que cabem nela)."""
+        return np.concatenate(list(_executar(agendador, self._tarefas())), axis=-2)
+
+    def gravar(self, saidas, agendador=None):
+        """
+        Grava cada plano do resultado em um GeoTIFF na grade da referência.
+        `saidas` é uma lista de (caminho, dtype, nodata, fator), uma por plano.
+        """
+        with rasterio.open(self.referencia) as ref:
+            destinos = [rasterio.open(caminho, 'w', **perfil_saida(ref, dtype, nodata))
+                        for caminho, dtype, nodata, _ in saidas]
+        try:
+            for janela, resultado in zip(self.janelas, _executar(agendador, self._tarefas())):
+                planos = resultado.reshape((-1,) + resultado.shape[-2:])
+                for plano, dst, (_, dtype, nodata, fator) in zip(planos, destinos, saidas):
+                    dst.write(_converter(plano, dtype, nodata, fator), 1, window=janela)
+        finally:
+            for dst in destinos:
+                dst.close()
+        return [caminho for caminho, *_ in saidas]
+
+
+def abrir_arranjo(caminhos, bandas=None, escala=None, pixels_por_tarefa=PIXELS_POR_TAREFA):
+    """
+    Arranjo de um raster (ou das `bandas` de uma cena) ou da pilha de uma
+    lista de rasters de mesma grade. `escala` multiplica os valores (padrão:
+    0,0001 no NDVI inteiro, 1 no resto).
+    """
+    if isinstance(caminhos, (str, os.PathLike)):
+        caminhos = [os.fspath(caminhos)]
+    with rasterio.open(caminhos[0]) as ref:
+        grade = (ref.height, ref.width, ref.transform)
+        dtype = np.dtype(ref.dtypes[0])
+        n_planos = len(caminhos) * len(bandas or [1])
+        janelas = janelas_tarefas(ref, max(1, pixels_por_tarefa // n_planos))
+    for caminho in caminhos[1:]:
+        with rasterio.open(caminho) as src:
+            if (src.height, src.width, src.transform) != grade:
+                raise ValueError(f"Grade diferente do restante da pilha: {os.path.basename(caminho)}")
+    fontes = [
+        (caminho, banda, _escala_padrao(caminho, dtype) if escala is None else escala)
+        for caminho in caminhos for banda in (bandas or [1])
+    ]
+    return Arranjo(fontes, janelas, caminhos[0])
+
+
+# --- Estatísticas -----------------------------------------------------------
+
+def _esboco_bloco(caminho, indice, janela):
+    """Histograma (``Esboco``) dos pixels válidos de uma janela, nas unidades do arquivo."""
+    from .histogramas import Esboco
+
+    src = _abrir(caminho)
+    bloco = src.read(1, window=janela)
+    contar_leitura(bloco)
+    esboco = Esboco(indice, src.dtypes[0])
+    esboco.adicionar(bloco[mascara_validos(bloco, src.nodata, LIMITES_VALIDOS.get(indice))])
+    return esboco
+
+
+def _esboco_ou_erro(caminho, indice, janela):
+    """Como ``_esboco_bloco``, mas devolve a exceção em vez de levantá-la."""
+    try:
+        return _esboco_bloco(caminho, indice, janela)
+    except Exception as e:
+        return e
+
+
+def estatisticas_grafo(caminhos, agendador=None, percentis=(2, 98), indice=None,
+                       pixels_por_tarefa=PIXELS_POR_TAREFA, ignorar_erros=False):
+    """
+    Estatísticas de vários rasters no formato de ``estatisticas_raster``
+    ({caminho: estatísticas}), com as janelas de todos os arquivos
+    distribuídas juntas entre os processos. `indice` (padrão: o do nome)
+    dá a faixa válida e as classes do histograma. Com `ignorar_erros`,
+    arquivos que não abrem ou falham em alguma janela ficam fora do resultado.
+    """
+    from .histogramas import Esboco
+
+    tarefa = _esboco_ou_erro if ignorar_erros else _esboco_bloco
+    tarefas, donos = [], []
+    for caminho in caminhos:
+        try:
+            indice_arquivo = indice or interpretar_nome(caminho)['indice']
+            with rasterio.open(caminho) as src:
+                janelas = janelas_tarefas(src, pixels_por_tarefa)
+        except Exception:
+            if not ignorar_erros:
+                raise
+            continue
+        tarefas.extend((tarefa, (caminho, indice_arquivo, janela)) for janela in janelas)
+        donos.extend([caminho] * len(janelas))
+
+    esbocos, falhas = {}, set()
+    for caminho, esboco in zip(donos, _executar(agendador, tarefas)):
+        if isinstance(esboco, Exception):
+            falhas.add(caminho)
+            continue
+        if caminho not in esbocos:
+            esbocos[caminho] = Esboco(esboco.indice, esboco.dtype)
+        esbocos[caminho].mesclar(esboco)
+    return {caminho: esbocos[caminho].estatisticas(percentis) for caminho in caminhos
+            if caminho in esbocos and caminho not in falhas}
+
+
+# --- Índices de reflectância --------------------------------------------------
+
+class _Indices:
+    """Operação: pilha de bandas de reflectância -> um plano por índice."""
+
+    def __init__(self, indices, papeis, usadas):
+        self.indices, self.papeis, self.usadas = indices, papeis, usadas
+
+    def __call__(self, pilha):
+        from .indices import _calcular, _Termos
+
+        termos = _Termos(dict(zip(self.usadas, pilha)))
+        return np.stack([_calcular(indice, termos, self.papeis) for indice in self.indices])
+
+
+def indices_grafo(caminho_cena, pastas_saida, indices=('NDVI', 'EVI', 'NDWI', 'LSWI'), bandas=None,
+                  escala=0.0001, agendador=None):
+    """Mesmo resultado de ``tese_g.indices.calcular_indices``, com as janelas da cena como tarefas."""
+    from .indices import BANDAS_INDICE, BANDAS_MOD09A1, SAIDA_INDICE, _nome_saida
+
+    indices = [indice.upper() for indice in indices]
+    papeis = dict(BANDAS_MOD09A1, **(bandas or {}))
+    if isinstance(pastas_saida, str):
+        pastas_saida = {indice: os.path.join(pastas_saida, indice) for indice in indices}
+    usadas = sorted({papeis[p] for indice in indices for p in BANDAS_INDICE[indice]})
+
+    saidas = []
+    for indice in indices:
+        os.makedirs(pastas_saida[indice], exist_ok=True)
+        saidas.append((os.path.join(pastas_saida[indice], _nome_saida(caminho_cena, indice)),
+                       *SAIDA_INDICE[indice]))
+    arranjo = abrir_arranjo(caminho_cena, bandas=usadas, escala=escala).mapear(_Indices(indices, papeis, usadas))
+    return dict(zip(indices, arranjo.gravar(saidas, agendador)))
+
+
+# --- VCI ----------------------------------------------------------------------
+
+def _vci_pilha(pilha):
+    """Operação: série NDVI (anos, linhas, colunas) -> VCI de cada ano contra o mínimo e o máximo da série."""
+    from .vci import _vci
+
+    minimo = np.fmin.reduce(pilha, axis=0)
+    amplitude = np.fmax.reduce(pilha, axis=0) - minimo
+    return np.stack([_vci(ndvi, minimo, amplitude) for ndvi in pilha])
+
+
+def vci_grafo(pasta_ndvi, pasta_saida, agendador=None):
+    """
+    VCI de todas as séries NDVI (por área e período) de `pasta_ndvi`, como
+    ``calcular_vci(..., recalcular=True)`` mas sem gravar o histórico.
+    Retorna os caminhos gravados.
+    """
+    from .cubo import agrupar_series
+    from .nomes import montar_nome
+    from .vci import NODATA_VCI
+
+    os.makedirs(pasta_saida, exist_ok=True)
+    series = {}
+    for (indice, area), serie in agrupar_series(pasta_ndvi).items():
+        if indice == 'NDVI':
+            for campos, caminho in serie:
+                series.setdefault((area, campos['periodo']), []).append((campos, caminho))
+
+    gravados = []
+    for chave in sorted(series):
+        serie = series[chave]
+        saidas = [(os.path.join(pasta_saida, montar_nome('VCI', c['periodo'], c['area'], c['ano'])),
+                   'float32', NODATA_VCI, 1) for c, _ in serie]
+        arranjo = abrir_arranjo([caminho for _, caminho in serie], escala=1).mapear(_vci_pilha)
+        gravados.extend(arranjo.gravar(saidas, agendador))
+    return gravados
+
+
+# --- Mapas --------------------------------------------------------------------
+
+def executar_grafo(indice, caminhos, pasta_saida, opcoes_por_arquivo, motor='matplotlib', agendador=None):
+    """
+    Gera os mapas como grafo: as estatísticas que faltam saem de
+    ``estatisticas_grafo`` (janelas de todos os arquivos em paralelo) e cada
+    mapa vira uma tarefa de ``gerar_mapa_*`` que só lê a banda e desenha.
+    Arquivos com erro nas estatísticas são mandados sem elas, e o erro
+    aparece no resultado do mapa como no lote normal. Mesmo formato de
+    resultado de ``processar_lote``.
+    """
+    from .lote import _processar_arquivo
+
+    faltando = [caminho for caminho, opcoes in zip(caminhos, opcoes_por_arquivo) if 'estatisticas' not in opcoes]
+    percentis = tuple(sorted({opcoes.get(p, padrao) for opcoes in opcoes_por_arquivo
+                              for p, padrao in (('pmin', 2), ('pmax', 98))}))
+    calculadas = {}
+    if faltando:
+        calculadas = estatisticas_grafo(faltando, agendador, percentis, indice=indice.upper(), ignorar_erros=True)
+
+    tarefas = []
+    for caminho, opcoes in zip(caminhos, opcoes_por_arquivo):
+        if caminho in calculadas:
+            opcoes = dict(opcoes, estatisticas=calculadas[caminho])
+        tarefas.append((_processar_arquivo, (indice, caminho, pasta_saida, opcoes, motor)))
+    return list(_executar(agendador, tarefas))
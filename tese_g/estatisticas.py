@@ -0,0 +1,208 @@
+"""
+Estatísticas de raster em uma única passada, bloco a bloco.
+
+Em vez de ler a banda inteira (``src.read(1)``) e ordenar cópias com
+``np.percentile``, percorre as janelas internas do GeoTIFF acumulando
+contagem de pixels válidos, mínimo, máximo, média e um histograma de onde
+saem os percentis (p2/p98 etc.). O pico de memória fica limitado a um bloco.
+"""
+
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+from .medicao import contar_leitura
+
+# Número de classes do histograma para rasters em ponto flutuante
+N_CLASSES = 2 ** 14
+
+# Faixa física de valores válidos de cada índice (fora dela o pixel é ignorado)
+LIMITES_VALIDOS = {
+    'NDVI': None,
+    'EVI': None,
+    'LAI': (0, 10),
+    'NDWI': (-1, 1),
+    'LSWI': (-1, 1),
+    'VCI': (0, 100),
+    'DELTA': (-2, 2),      # diferença de índices normalizados (ver tese_g.mudancas)
+    'ANOMALIA': None,      # z-score em relação à média da série
+}
+
+# Tamanho máximo (em pixels) de uma janela de leitura quando o GeoTIFF é
+# gravado em faixas de largura total (agrupa várias faixas por leitura)
+MAX_PIXELS_JANELA = 2 ** 22
+
+
+def janelas_blocos(src, banda=1, max_pixels=MAX_PIXELS_JANELA):
+    """
+    Percorre as janelas de leitura do raster seguindo os blocos internos.
+    Faixas de largura total são agrupadas até `max_pixels` pixels por janela.
+    """
+    altura_bloco, largura_bloco = src.block_shapes[banda - 1]
+    if largura_bloco < src.width:
+        for _, janela in src.block_windows(banda):
+            yield janela
+        return
+
+    linhas = max(altura_bloco, (max_pixels // src.width) // altura_bloco * altura_bloco)
+    for linha in range(0, src.height, linhas):
+        yield Window(0, linha, src.width, min(linhas, src.height - linha))
+
+
+def mascara_validos(bloco, nodata=None, limites=None, invertida=False):
+    """
+    Máscara (True = pixel válido) a partir do nodata, NaN e dos limites
+    físicos do índice. Usa só a máscara e um buffer booleano reaproveitado,
+    sem temporários do tamanho do bloco a cada comparação. Com `invertida`,
+    True marca os pixels inválidos (formato de ``np.ma``).
+    """
+    validos = np.ones(bloco.shape, dtype=bool)
+    auxiliar = np.empty(bloco.shape, dtype=bool)
+    if np.issubdtype(bloco.dtype, np.floating):
+        np.isnan(bloco, out=auxiliar)
+        np.logical_not(auxiliar, out=validos)
+    if nodata is not None and not np.isnan(nodata):
+        validos &= np.not_equal(bloco, nodata, out=auxiliar)
+    if limites is not None:
+        validos &= np.greater_equal(bloco, limites[0], out=auxiliar)
+        validos &= np.less_equal(bloco, limites[1], out=auxiliar)
+    if invertida:
+        np.logical_not(validos, out=validos)
+    return validos
+
+
+class _Histograma:
+    """
+    Histograma acumulado bloco a bloco.
+
+    Para inteiros de até 16 bits usa uma classe por valor (percentis exatos).
+    Para os demais tipos usa `N_CLASSES` classes de mesma largura; quando um
+    bloco cai fora do intervalo atual, a largura dobra (somando classes
+    vizinhas) até cobri-lo, sem precisar de uma segunda passada.
+    """
+
+    def __init__(self, dtype):
+        dtype = np.dtype(dtype)
+        self.exato = np.issubdtype(dtype, np.integer) and dtype.itemsize <= 2
+        if self.exato:
+            info = np.iinfo(dtype)
+            self.inicio = float(info.min)
+            self.largura = 1.0
+            self.contagens = np.zeros(int(info.max) - int(info.min) + 1, dtype=np.int64)
+        else:
+            self.inicio = None
+            self.largura = None
+            self.contagens = np.zeros(N_CLASSES, dtype=np.int64)
+
+    def _expandir(self, vmin, vmax):
+        n = self.contagens.size
+        while vmin < self.inicio or vmax >= self.inicio + n * self.largura:
+            if vmin < self.inicio:
+                # Dobra a largura mantendo o fim do intervalo fixo
+                fim = self.inicio + n * self.largura
+                pares = self.contagens.reshape(-1, 2).sum(axis=1)
+                self.contagens = np.concatenate([np.zeros(n // 2, dtype=np.int64), pares])
+                self.largura *= 2
+                self.inicio = fim - n * self.largura
+            else:
+                # Dobra a largura mantendo o início do intervalo fixo
+                pares = self.contagens.reshape(-1, 2).sum(axis=1)
+                self.contagens = np.concatenate([pares, np.zeros(n // 2, dtype=np.int64)])
+                self.largura *= 2
+
+    def adicionar(self, valores, vmin, vmax):
+        """Acumula um vetor 1-D de valores válidos (com seu mínimo e máximo)."""
+        if valores.size == 0:
+            return
+        if self.exato:
+            indices = valores.astype(np.int64) - int(self.inicio)
+            self.contagens += np.bincount(indices, minlength=self.contagens.size)
+            return
+        if self.inicio is None:
+            self.inicio = float(vmin)
+            self.largura = max(float(vmax) - float(vmin), abs(float(vmin)) * 1e-6, 1e-12) / (self.contagens.size - 1)
+        self._expandir(float(vmin), float(vmax))
+        indices = ((valores.astype(np.float64) - self.inicio) / self.largura).astype(np.int64)
+        np.clip(indices, 0, self.contagens.size - 1, out=indices)
+        self.contagens += np.bincount(indices, minlength=self.contagens.size)
+
+    def percentil(self, p, vmin, vmax):
+        """Percentil `p` (0-100) com a mesma interpolação linear de ``np.percentile``."""
+        acumulado = np.cumsum(self.contagens)
+        n = int(acumulado[-1])
+        posicao = p / 100 * (n - 1)
+        k0 = int(np.floor(posicao))
+        k1 = min(k0 + 1, n - 1)
+        v0 = self._valor_ordem(acumulado, k0)
+        v1 = self._valor_ordem(acumulado, k1)
+        valor = v0 + (posicao - k0) * (v1 - v0)
+        return float(min(max(valor, vmin), vmax))
+
+    def _valor_ordem(self, acumulado, k):
+        """Valor do k-ésimo pixel (0 = menor) segundo o histograma."""
+        classe = int(np.searchsorted(acumulado, k, side='right'))
+        if self.exato:
+            return self.inicio + classe
+        anterior = int(acumulado[classe - 1]) if classe > 0 else 0
+        fracao = (k - anterior + 0.5) / int(self.contagens[classe])
+        return self.inicio + (classe + fracao) * self.largura
+
+
+def estatisticas_raster(src, banda=1, limites=None, percentis=(2, 98), mascara=None):
+    """
+    Calcula em uma passada as estatísticas dos pixels válidos da banda.
+
+    `src` pode ser um caminho ou um dataset aberto do rasterio. Pixels iguais
+    ao nodata, NaN ou fora de `limites` (mín, máx) são ignorados. Com a
+    `mascara` do raster (ver ``tese_g.mascaras``), janelas sem pixel válido
+    nem são lidas e as cheias dispensam as comparações.
+
+    Retorna um dicionário com 'n_validos', 'min', 'max', 'media' e
+    'percentis' ({p: valor}). Sem pixels válidos, 'n_validos' é 0 e os demais
+    valores são None.
+    """
+    if isinstance(src, (str, bytes)) or hasattr(src, '__fspath__'):
+        with rasterio.open(src) as dataset:
+            return estatisticas_raster(dataset, banda, limites, percentis, mascara)
+
+    nodata = src.nodatavals[banda - 1]
+    histograma = _Histograma(src.dtypes[banda - 1])
+    n_validos = 0
+    soma = 0.0
+    vmin = np.inf
+    vmax = -np.inf
+
+    if mascara is None:
+        blocos = ((None, janela, None) for janela in janelas_blocos(src, banda))
+    else:
+        blocos = ((i, janela, estado) for i, (janela, estado) in enumerate(mascara.blocos()) if estado != 'vazio')
+    for i, janela, estado in blocos:
+        bloco = src.read(banda, window=janela)
+        contar_leitura(bloco)
+        if estado == 'cheio':
+            valores = bloco.ravel()
+        elif estado == 'parcial':
+            valores = bloco[mascara.bloco(i)]
+        else:
+            valores = bloco[mascara_validos(bloco, nodata, limites)]
+        if valores.size == 0:
+            continue
+        bmin = valores.min()
+        bmax = valores.max()
+        histograma.adicionar(valores, bmin, bmax)
+        n_validos += valores.size
+        soma += float(valores.sum(dtype=np.float64))
+        vmin = min(vmin, float(bmin))
+        vmax = max(vmax, float(bmax))
+
+    if n_validos == 0:
+        return {'n_validos': 0, 'min': None, 'max': None, 'media': None,
+                'percentis': {p: None for p in percentis}}
+
+    return {
+        'n_validos': n_validos,
+        'min': vmin,
+        'max': vmax,
+        'media': soma / n_validos,
+        'percentis': {p: histograma.percentil(p, vmin, vmax) for p in percentis},
+    }
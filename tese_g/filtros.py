@@ -0,0 +1,266 @@
+"""
+Filtragem temporal das séries de índices: picos, lacunas e suavização.
+
+Para cada índice e área, os GeoTIFFs de todos os anos e períodos
+(``<INDICE>_<Seco|Umido>_<AreaN>_<ANO>.tif``, em ordem de tempo) são lidos
+janela a janela como uma pilha (tempo, pixels), como em ``tese_g.vci``.
+Sobre cada pilha, em operações do NumPy sobre todos os pixels da janela de
+uma vez (sem laço por pixel):
+
+- ``remover_picos``: valores que sobem (ou descem) mais que um limiar em
+  relação aos dois vizinhos no tempo viram lacuna;
+- ``preencher_linear`` / ``preencher_harmonico``: lacunas (nuvens, valores
+  fora da faixa física) preenchidas por interpolação linear no tempo ou por
+  um ajuste harmônico (média, tendência e ciclo anual) de cada pixel;
+- ``savitzky_golay``: suavização polinomial local ao longo do tempo.
+
+A oscilação Seco/Umido é sinal, não ruído: picos, interpolação linear e
+suavização são aplicados à série de cada período separadamente (Seco de
+um ano contra o Seco dos anos vizinhos). Só o ajuste harmônico usa os dois
+períodos juntos, já que o ciclo anual do modelo representa a estação.
+
+As séries filtradas são gravadas com o mesmo nome e o mesmo tipo das
+originais (NDVI inteiro x 10.000 inclusive) na pasta de saída, prontas
+para os ``gerar_mapa_*``. O tempo de cada imagem é ano + fração do período
+(Seco = 0, Umido = 0,5), e a suavização supõe os anos igualmente espaçados.
+"""
+
+import os
+
+import numpy as np
+import rasterio
+
+from .cog import perfil_saida
+from .cubo import ORDEM_PERIODOS, agrupar_series, nodata_padrao
+from .estatisticas import LIMITES_VALIDOS, MAX_PIXELS_JANELA, janelas_blocos, mascara_validos
+
+# Diferença (na unidade do índice) para um valor isolado contar como pico
+LIMIAR_PICO = {
+    'NDVI': 0.2,
+    'EVI': 0.2,
+    'LAI': 2.0,
+    'NDWI': 0.2,
+    'LSWI': 0.2,
+    'VCI': 40.0,
+}
+
+PREENCHIMENTOS = ('linear', 'harmonico')
+
+
+def remover_picos(valores, limiar):
+    """
+    Marca como NaN (na própria pilha (tempo, pixels)) os valores que
+    diferem mais que `limiar` da média dos dois vizinhos e estão acima (ou
+    abaixo) de ambos. Retorna a pilha.
+    """
+    if valores.shape[0] < 3:
+        return valores
+    anterior, atual, seguinte = valores[:-2], valores[1:-1], valores[2:]
+    with np.errstate(invalid='ignore'):
+        desvio = atual - (anterior + seguinte) / 2
+        isolado = ((atual - anterior) * (atual - seguinte)) > 0
+        pico = isolado & (np.abs(desvio) > limiar)
+    atual[pico] = np.nan
+    return valores
+
+
+def preencher_linear(valores, tempos):
+    """
+    Preenche os NaN de cada pixel interpolando no tempo entre os valores
+    válidos anterior e seguinte; nas pontas repete o valor válido mais
+    próximo. Pixels sem nenhum valor válido continuam NaN.
+    """
+    n = valores.shape[0]
+    validos = ~np.isnan(valores)
+    posicoes = np.arange(n)[:, None]
+    anterior = np.maximum.accumulate(np.where(validos, posicoes, -1), axis=0)
+    seguinte = np.minimum.accumulate(np.where(validos, posicoes, n)[::-1], axis=0)[::-1]
+    tem_anterior, tem_seguinte = anterior >= 0, seguinte < n
+    anterior = np.where(tem_anterior, anterior, seguinte).clip(0, n - 1)
+    seguinte = np.where(tem_seguinte, seguinte, anterior).clip(0, n - 1)
+
+    colunas = np.arange(valores.shape[1])
+    v0, v1 = valores[anterior, colunas], valores[seguinte, colunas]
+    t = np.asarray(tempos, dtype=np.float64)
+    t0, t1 = t[anterior], t[seguinte]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        peso = np.where(t1 > t0, (t[:, None] - t0) / (t1 - t0), 0.0)
+    interpolado = v0 + peso * (v1 - v0)
+    return np.where(validos, valores, interpolado).astype(valores.dtype)
+
+
+def preencher_harmonico(valores, tempos, n_harmonicos=1, ciclo=1.0):
+    """
+    Preenche os NaN com um ajuste por mínimos quadrados de cada pixel:
+    média, tendência linear e `n_harmonicos` harmônicos do `ciclo` (em
+    anos). Os sistemas de todos os pixels são resolvidos juntos. Pixels com
+    menos valores válidos que termos do ajuste ficam com as lacunas em NaN.
+    """
+    t = np.asarray(tempos, dtype=np.float64)
+    t = t - t.mean()
+    termos = [np.ones_like(t), t]
+    for k in range(1, n_harmonicos + 1):
+        termos += [np.cos(2 * np.pi * k * t / ciclo), np.sin(2 * np.pi * k * t / ciclo)]
+    # Termos que as datas disponíveis não distinguem dos anteriores (ex.: seno e cosseno
+    # com duas amostras por ciclo) saem do ajuste
+    colunas = []
+    for termo in termos:
+        if np.linalg.matrix_rank(np.stack(colunas + [termo], axis=1)) > len(colunas):
+            colunas.append(termo)
+    base = np.stack(colunas, axis=1)                     # (tempo, termos)
+
+    validos = ~np.isnan(valores)
+    pesos = validos.astype(np.float64)
+    y = np.where(validos, valores, 0).astype(np.float64)
+    normal = np.einsum('tk,tn,tl->nkl', base, pesos, base)
+    direita = np.einsum('tk,tn->nk', base, pesos * y)
+    ajustavel = validos.sum(axis=0) >= base.shape[1]
+    coeficientes = (np.linalg.pinv(normal) @ direita[..., None])[..., 0]
+    ajuste = base @ coeficientes.T                       # (tempo, pixels)
+    preencher = ~validos & ajustavel
+    return np.where(preencher, ajuste, valores).astype(valores.dtype)
+
+
+def _matriz_savitzky_golay(n, janela, ordem):
+    """
+    Matriz (n, n) que aplica o filtro de Savitzky-Golay a uma série de n
+    tempos; nas pontas, o polinômio da primeira/última janela completa.
+    """
+    janela = min(janela, n if n % 2 else n - 1)
+    if janela <= ordem:
+        return np.eye(n)
+    meia = janela // 2
+    matriz = np.zeros((n, n))
+    for t in range(n):
+        inicio = min(max(t - meia, 0), n - janela)
+        posicoes = np.arange(inicio, inicio + janela)
+        vandermonde = np.vander(posicoes - t, ordem + 1, increasing=True)
+        matriz[t, posicoes] = np.linalg.pinv(vandermonde)[0]
+    return matriz
+
+
+def savitzky_golay(valores, janela=5, ordem=2):
+    """
+    Suaviza cada pixel ao longo do tempo com Savitzky-Golay (`janela`
+    ímpar de tempos, polinômio de grau `ordem`). Pixels com lacunas ficam
+    como estão: preencha antes.
+    """
+    matriz = _matriz_savitzky_golay(valores.shape[0], janela, ordem)
+    suavizado = (matriz @ valores.astype(np.float64)).astype(valores.dtype)
+    return np.where(np.isnan(suavizado), valores, suavizado)
+
+
+def _tempos(serie):
+    """Tempo de cada imagem em anos (Seco = ano, Umido = ano + 0,5)."""
+    return np.array([campos['ano'] + ORDEM_PERIODOS[campos['periodo']] / len(ORDEM_PERIODOS)
+                     for campos, _ in serie])
+
+
+def _posicoes_periodos(serie):
+    """Posições de cada período na série: [array das posições do Seco, ... do Umido] (os que existirem)."""
+    periodos = np.array([campos['periodo'] for campos, _ in serie])
+    return [np.flatnonzero(periodos == periodo) for periodo in ORDEM_PERIODOS if (periodos == periodo).any()]
+
+
+def filtrar_valores(valores, tempos, posicoes, limiar_pico, preenchimento='linear', suavizar=True,
+                    janela=5, ordem=2, n_harmonicos=1):
+    """
+    Aplica os filtros a uma pilha (tempo, pixels): picos, interpolação
+    linear e suavização em cada período (`posicoes`, de ``_posicoes_periodos``)
+    separadamente; ajuste harmônico sobre a série inteira. `limiar_pico`
+    None desliga a remoção de picos. Retorna a pilha filtrada.
+    """
+    if limiar_pico is not None:
+        for p in posicoes:
+            valores[p] = remover_picos(valores[p], limiar_pico)
+    if preenchimento == 'linear':
+        for p in posicoes:
+            valores[p] = preencher_linear(valores[p], tempos[p])
+    elif preenchimento == 'harmonico':
+        valores = preencher_harmonico(valores, tempos, n_harmonicos)
+    if suavizar:
+        for p in posicoes:
+            valores[p] = savitzky_golay(valores[p], janela, ordem)
+    return valores
+
+
+def filtrar_serie(serie, pasta_saida, picos=True, limiar_pico=None, preenchimento='linear',
+                  suavizar=True, janela=5, ordem=2, n_harmonicos=1):
+    """
+    Filtra uma série [(campos, caminho), ...] de um índice e uma área (todos
+    os anos e períodos, em ordem de tempo) e grava cada imagem filtrada com
+    o mesmo nome em `pasta_saida` (ver ``filtrar_valores``). `preenchimento`
+    é 'linear', 'harmonico' ou None; `limiar_pico` (unidade do índice) tem padrão em ``LIMIAR_PICO``.
+    Retorna os caminhos gravados.
+    """
+    if preenchimento is not None and preenchimento not in PREENCHIMENTOS:
+        raise ValueError(f"Preenchimento desconhecido: {preenchimento} (use um de {PREENCHIMENTOS} ou None)")
+    indice = serie[0][0]['indice']
+    limites = LIMITES_VALIDOS[indice]
+    limiar_pico = LIMIAR_PICO[indice] if limiar_pico is None else limiar_pico
+    tempos = _tempos(serie)
+    posicoes = _posicoes_periodos(serie)
+    os.makedirs(pasta_saida, exist_ok=True)
+
+    fontes = [rasterio.open(caminho) for _, caminho in serie]
+    destinos = []
+    try:
+        ref = fontes[0]
+        for src in fontes[1:]:
+            if (src.height, src.width) != (ref.height, ref.width) or src.transform != ref.transform:
+                raise ValueError(f"Grade diferente do restante da série: {os.path.basename(src.name)}")
+        dtype = np.dtype(ref.dtypes[0])
+        inteiro = np.issubdtype(dtype, np.integer)
+        escala = 0.0001 if indice == 'NDVI' and inteiro else 1.0
+        nodata = nodata_padrao(dtype, ref.nodata)
+        perfil = perfil_saida(ref, dtype.name, nodata)
+        saidas = [os.path.join(pasta_saida, os.path.basename(caminho)) for _, caminho in serie]
+        destinos = [rasterio.open(saida, 'w', **perfil) for saida in saidas]
+
+        max_pixels = max(1, MAX_PIXELS_JANELA // len(fontes))
+        for janela_leitura in janelas_blocos(ref, max_pixels=max_pixels):
+            pilha = []
+            for src in fontes:
+                bloco = src.read(1, window=janela_leitura)
+                validos = mascara_validos(bloco, src.nodata)
+                bloco = bloco.astype(np.float32) * np.float32(escala)
+                bloco[~validos] = np.nan
+                if limites is not None:
+                    bloco[(bloco < limites[0]) | (bloco > limites[1])] = np.nan
+                pilha.append(bloco.ravel())
+            valores = np.stack(pilha)                    # (tempo, pixels)
+
+            valores = filtrar_valores(valores, tempos, posicoes, limiar_pico if picos else None,
+                                      preenchimento, suavizar, janela, ordem, n_harmonicos)
+            if limites is not None:
+                np.clip(valores, limites[0], limites[1], out=valores)
+
+            forma = (int(janela_leitura.height), int(janela_leitura.width))
+            for plano, dst in zip(valores, destinos):
+                vazio = np.isnan(plano)
+                plano = np.where(vazio, 0, plano / escala)
+                if inteiro:
+                    info = np.iinfo(dtype)
+                    plano = np.clip(np.rint(plano), info.min, info.max)
+                plano = plano.astype(dtype)
+                plano[vazio] = nodata
+                dst.write(plano.reshape(forma), 1, window=janela_leitura)
+    finally:
+        for dst in destinos:
+            dst.close()
+        for src in fontes:
+            src.close()
+    return saidas
+
+
+def filtrar_pasta(pasta_imagens, pasta_saida, indices=None, **opcoes):
+    """
+    Filtra todas as séries (índice, área) de `pasta_imagens` (ou só as dos
+    `indices`), gravando em `pasta_saida`; `opcoes` vão para ``filtrar_serie``.
+    Retorna os caminhos gravados.
+    """
+    gravados = []
+    for (indice, _), serie in sorted(agrupar_series(pasta_imagens).items()):
+        if indices is None or indice in [i.upper() for i in indices]:
+            gravados.extend(filtrar_serie(serie, pasta_saida, **opcoes))
+    return gravados
@@ -0,0 +1,200 @@
+"""
+Galeria em dois níveis: miniaturas primeiro, mapas completos depois ou sob demanda.
+
+``gerar_galeria`` faz a passada rápida sobre as pastas de GeoTIFFs: atualiza
+o catálogo (``tese_g.catalogo``, que calcula as estatísticas de cada arquivo
+uma única vez), gera as miniaturas com o motor rápido (``tese_g.rapido``) e
+escreve um ``index.html`` estático agrupado por índice, período, área e
+ano, com as estatísticas de cada arquivo. O acervo inteiro pode ser revisado
+sem esperar pelas figuras de 300 dpi.
+
+Os mapas completos (``tese_g.mapas``) saem depois com
+``gerar_mapas_completos``, para todos os arquivos ou só os escolhidos, ou
+sob demanda com ``servir_galeria``: um servidor HTTP local que desenha o
+mapa quando a entrada é aberta na página. Os dois níveis usam as
+estatísticas do catálogo, sem nova passada sobre o raster, e o modo
+incremental de ``processar_lote`` não refaz o que já está atualizado.
+
+Estrutura da pasta da galeria::
+
+    index.html
+    catalogo.db
+    miniaturas/   (PNGs do motor rápido)
+    mapas/        (mapas completos já gerados)
+"""
+
+import html
+import os
+from urllib.parse import quote, unquote
+
+from .catalogo import atualizar_catalogo, consultar
+from .cubo import ORDEM_PERIODOS
+from .lote import processar_lote
+from .manifesto import carregar_manifesto
+
+NOME_CATALOGO = 'catalogo.db'
+NOME_INDICE = 'index.html'
+PASTA_MINIATURAS = 'miniaturas'
+PASTA_MAPAS = 'mapas'
+
+# Largura máxima (em pixels) do mapa nas miniaturas
+LARGURA_MINIATURA = 400
+
+_ESTILO = """
+body { font-family: sans-serif; margin: 1em 2em; color: #222; }
+nav a { margin-right: 1em; }
+.serie { display: flex; flex-wrap: wrap; gap: 12px; }
+figure { margin: 0; width: 220px; font-size: 12px; }
+figure img { width: 100%; border: 1px solid #ccc; }
+.sem { color: #999; }
+"""
+
+
+def _catalogo(pasta_saida):
+    return os.path.join(pasta_saida, NOME_CATALOGO)
+
+
+def _grupos(pasta_saida):
+    """Rasters do catálogo com nome no padrão, agrupados por (pasta, índice)."""
+    grupos = {}
+    for registro in consultar(_catalogo(pasta_saida)):
+        if registro['indice'] is not None:
+            grupos.setdefault((registro['pasta'], registro['indice']), []).append(registro)
+    return grupos
+
+
+def _renderizar(pasta_saida, subpasta, motor, arquivos=None, n_processos=None, **opcoes):
+    """Gera (em modo incremental) os mapas do `motor` em `subpasta`, com as estatísticas do catálogo."""
+    resultados = []
+    for (pasta, indice), registros in sorted(_grupos(pasta_saida).items()):
+        nomes = [r['arquivo'] for r in registros if arquivos is None or r['arquivo'] in arquivos]
+        if nomes:
+            resultados += processar_lote(pasta, os.path.join(pasta_saida, subpasta), indice.lower(),
+                                         n_processos=n_processos, incremental=True,
+                                         catalogo=_catalogo(pasta_saida), motor=motor, arquivos=nomes, **opcoes)
+    return resultados
+
+
+def gerar_galeria(pastas, pasta_saida, largura=LARGURA_MINIATURA, n_processos=None):
+    """
+    Primeiro nível: catálogo, miniaturas de todos os .tif das `pastas` (uma
+    pasta ou uma lista) e ``index.html`` em `pasta_saida`. Retorna os
+    resultados das miniaturas (formato de ``processar_lote``).
+    """
+    os.makedirs(pasta_saida, exist_ok=True)
+    atualizar_catalogo(_catalogo(pasta_saida), pastas, n_processos=n_processos or os.cpu_count() or 1)
+    resultados = _renderizar(pasta_saida, PASTA_MINIATURAS, 'rapido', n_processos=n_processos,
+                             largura_max=largura)
+    escrever_indice(pasta_saida)
+    return resultados
+
+
+def gerar_mapas_completos(pasta_saida, arquivos=None, n_processos=None, **opcoes):
+    """
+    Segundo nível: mapas do matplotlib dos .tif da galeria (todos ou só os
+    nomes em `arquivos`), com as estatísticas do catálogo; o ``index.html``
+    passa a apontar para eles. `opcoes` vão para ``processar_lote`` (ex.:
+    ``reamostragem='average'``). Retorna os resultados por arquivo.
+    """
+    resultados = _renderizar(pasta_saida, PASTA_MAPAS, 'matplotlib', arquivos, n_processos, **opcoes)
+    escrever_indice(pasta_saida)
+    return resultados
+
+
+def _ordem_area(area):
+    """Area2 antes de Area10."""
+    return len(area), area
+
+
+def _resumo(registro):
+    """Texto com min/máx/média do catálogo, na unidade do índice."""
+    if not registro['n_validos']:
+        return '<span class="sem">sem dados válidos</span>'
+    escala = 0.0001 if registro['indice'] == 'NDVI' and registro['dtype'].startswith(('int', 'uint')) else 1.0
+    return (f"min {registro['vmin'] * escala:.2f} | máx {registro['vmax'] * escala:.2f}"
+            f" | média {registro['media'] * escala:.2f}")
+
+
+def _saida(manifesto, pasta, arquivo):
+    """PNG registrado no manifesto para o .tif, se existir na pasta."""
+    entrada = manifesto.get(arquivo)
+    if entrada and entrada.get('saida') and os.path.exists(os.path.join(pasta, entrada['saida'])):
+        return entrada['saida']
+    return None
+
+
+def escrever_indice(pasta_saida):
+    """Reescreve o ``index.html`` da galeria a partir do catálogo e dos manifestos. Retorna o caminho."""
+    pasta_miniaturas = os.path.join(pasta_saida, PASTA_MINIATURAS)
+    pasta_mapas = os.path.join(pasta_saida, PASTA_MAPAS)
+    miniaturas = carregar_manifesto(pasta_miniaturas)
+    mapas = carregar_manifesto(pasta_mapas)
+
+    arvore = {}
+    for registros in _grupos(pasta_saida).values():
+        for r in registros:
+            arvore.setdefault(r['indice'], {}).setdefault(r['periodo'], {}).setdefault(r['area'], []).append(r)
+
+    partes = ['<!DOCTYPE html>', '<html lang="pt-BR"><head><meta charset="utf-8">',
+              '<title>Galeria de mapas</title>', f'<style>{_ESTILO}</style></head><body>',
+              '<h1>Galeria de mapas</h1>',
+              '<nav>' + ''.join(f'<a href="#{indice}">{indice}</a>' for indice in sorted(arvore)) + '</nav>']
+    for indice in sorted(arvore):
+        partes.append(f'<h2 id="{indice}">{indice}</h2>')
+        for periodo in sorted(arvore[indice], key=lambda p: ORDEM_PERIODOS.get(p, len(ORDEM_PERIODOS))):
+            for area in sorted(arvore[indice][periodo], key=_ordem_area):
+                partes.append(f'<h3>{html.escape(periodo)} · {html.escape(area)}</h3><div class="serie">')
+                for r in sorted(arvore[indice][periodo][area], key=lambda r: r['ano']):
+                    miniatura = _saida(miniaturas, pasta_miniaturas, r['arquivo'])
+                    mapa = _saida(mapas, pasta_mapas, r['arquivo'])
+                    if mapa is not None:
+                        link, texto = f'{PASTA_MAPAS}/{quote(mapa)}', 'mapa completo'
+                    else:
+                        link, texto = f'completo/{quote(r["arquivo"])}', 'gerar mapa completo'
+                    imagem = (f'<img src="{PASTA_MINIATURAS}/{quote(miniatura)}" loading="lazy" '
+                              f'alt="{html.escape(r["arquivo"])}">' if miniatura is not None
+                              else '<span class="sem">sem miniatura</span>')
+                    partes.append(f'<figure><a href="{link}">{imagem}</a><figcaption><b>{r["ano"]}</b> '
+                                  f'{_resumo(r)}<br><a href="{link}">{texto}</a></figcaption></figure>')
+                partes.append('</div>')
+    partes.append('</body></html>')
+
+    caminho = os.path.join(pasta_saida, NOME_INDICE)
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(partes))
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def servir_galeria(pasta_saida, porta=8000, **opcoes):
+    """
+    Serve a galeria em http://localhost:`porta`/. Os links "gerar mapa
+    completo" (``/completo/<arquivo.tif>``) desenham o mapa na hora com
+    ``gerar_mapas_completos`` (`opcoes` vão para ele) e redirecionam para o
+    PNG. Roda até Ctrl+C.
+    """
+    from functools import partial
+    from http.server import HTTPServer, SimpleHTTPRequestHandler
+
+    class _Pedido(SimpleHTTPRequestHandler):
+        def do_GET(self):
+            if not self.path.startswith('/completo/'):
+                return super().do_GET()
+            arquivo = os.path.basename(unquote(self.path[len('/completo/'):]))
+            resultados = gerar_mapas_completos(pasta_saida, [arquivo], n_processos=1, **opcoes)
+            if not resultados:
+                return self.send_error(404, explain=f"Arquivo fora da galeria: {arquivo}")
+            resultado = resultados[0]
+            if resultado['status'] not in ('ok', 'atual'):
+                return self.send_error(500, explain=f"{arquivo}: {resultado['mensagem']}")
+            self.send_response(303)
+            self.send_header('Location', f'/{PASTA_MAPAS}/{quote(resultado["mensagem"])}')
+            self.end_headers()
+
+    with HTTPServer(('localhost', porta), partial(_Pedido, directory=pasta_saida)) as servidor:
+        print(f"Galeria em http://localhost:{porta}/ (Ctrl+C para encerrar)")
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
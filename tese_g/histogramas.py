@@ -0,0 +1,268 @@
+"""
+Histogramas de classes fixas por raster, que podem ser somados entre arquivos.
+
+Cada GeoTIFF vira um esboço: contagens em classes fixas (uma por valor para
+inteiros de até 16 bits, como o NDVI escalado; ``N_CLASSES`` classes na
+faixa física do índice para float), mais contagem, soma, mínimo e máximo.
+Como todos os esboços de um índice usam as mesmas classes, juntar arquivos
+é só somar contagens: a série inteira (ex.: todo o NDVI Seco da Area1,
+2000-2023) ganha um vmin/vmax comum (p2/p98) sem reler pixels nem ordenar.
+
+Os esboços ficam gravados (``.npz``) numa pasta, com o tamanho e a data do
+GeoTIFF de origem; ao chegar um ano novo só o esboço dele é calculado.
+Uma série que mistura tipos (ex.: NDVI int16 x 10.000 e float32) é somada
+nas unidades do índice (``mesclar_serie``).
+"""
+
+import json
+import os
+
+import numpy as np
+import rasterio
+
+from .estatisticas import LIMITES_VALIDOS, N_CLASSES, janelas_blocos, mascara_validos
+from .manifesto import assinatura_entrada
+from .nomes import interpretar_nome
+
+# Faixa das classes para rasters em ponto flutuante (valores fora vão para as classes das pontas)
+FAIXAS_FLOAT = {
+    'NDVI': (-1.0, 1.0),
+    'EVI': (-1.0, 1.0),
+    'LAI': (0.0, 10.0),
+    'NDWI': (-1.0, 1.0),
+    'LSWI': (-1.0, 1.0),
+    'VCI': (0.0, 100.0),
+    'DELTA': (-2.0, 2.0),
+    'ANOMALIA': (-10.0, 10.0),
+}
+
+
+def fator_indice(indice, dtype):
+    """Fator do arquivo para as unidades do índice: 0,0001 no NDVI inteiro (x 10.000), 1 no resto."""
+    return 0.0001 if indice == 'NDVI' and np.issubdtype(np.dtype(dtype), np.integer) else 1.0
+
+
+class Esboco:
+    """Histograma de classes fixas de um ou mais rasters do mesmo índice e tipo."""
+
+    def __init__(self, indice, dtype):
+        self.indice = indice
+        dtype = np.dtype(dtype)
+        self.exato = np.issubdtype(dtype, np.integer) and dtype.itemsize <= 2
+        if self.exato:
+            info = np.iinfo(dtype)
+            self.inicio, self.fim = float(info.min), float(info.max) + 1
+            n_classes = int(info.max) - int(info.min) + 1
+        else:
+            self.inicio, self.fim = FAIXAS_FLOAT[indice]
+            n_classes = N_CLASSES
+        self.dtype = dtype.name
+        self.largura = (self.fim - self.inicio) / n_classes
+        self.contagens = np.zeros(n_classes, dtype=np.int64)
+        self.n_validos = 0
+        self.soma = 0.0
+        self.minimo = np.inf
+        self.maximo = -np.inf
+
+    def adicionar(self, valores):
+        """Acumula um vetor 1-D de valores válidos."""
+        if valores.size == 0:
+            return
+        if self.exato:
+            classes = valores.astype(np.int64) - int(self.inicio)
+        else:
+            classes = ((valores.astype(np.float64) - self.inicio) / self.largura).astype(np.int64)
+            np.clip(classes, 0, self.contagens.size - 1, out=classes)
+        self.contagens += np.bincount(classes, minlength=self.contagens.size)
+        self.n_validos += valores.size
+        self.soma += float(valores.sum(dtype=np.float64))
+        self.minimo = min(self.minimo, float(valores.min()))
+        self.maximo = max(self.maximo, float(valores.max()))
+
+    def mesclar(self, outro):
+        """Soma outro esboço (mesmo índice e tipo) a este."""
+        if (self.indice, self.dtype) != (outro.indice, outro.dtype):
+            raise ValueError(f"Esboços incompatíveis: {self.indice}/{self.dtype} e {outro.indice}/{outro.dtype}")
+        self.contagens += outro.contagens
+        self.n_validos += outro.n_validos
+        self.soma += outro.soma
+        self.minimo = min(self.minimo, outro.minimo)
+        self.maximo = max(self.maximo, outro.maximo)
+        return self
+
+    def em_unidades_indice(self):
+        """
+        Esboço de classes float (``FAIXAS_FLOAT``) nas unidades do índice,
+        para somar com esboços de outro tipo. Esboços float já estão nelas.
+        """
+        if not self.exato:
+            return self
+        fator = fator_indice(self.indice, self.dtype)
+        novo = Esboco(self.indice, 'float32')
+        ocupadas = np.flatnonzero(self.contagens)
+        valores = (self.inicio + ocupadas) * fator
+        classes = ((valores - novo.inicio) / novo.largura).astype(np.int64)
+        np.clip(classes, 0, novo.contagens.size - 1, out=classes)
+        np.add.at(novo.contagens, classes, self.contagens[ocupadas])
+        novo.n_validos = self.n_validos
+        novo.soma = self.soma * fator
+        novo.minimo = self.minimo * fator
+        novo.maximo = self.maximo * fator
+        return novo
+
+    def percentil(self, p):
+        """Percentil `p` (0-100), com a interpolação linear de ``np.percentile``."""
+        if self.n_validos == 0:
+            return None
+        acumulado = np.cumsum(self.contagens)
+        posicao = p / 100 * (self.n_validos - 1)
+        k0 = int(np.floor(posicao))
+        k1 = min(k0 + 1, self.n_validos - 1)
+        v0 = self._valor_ordem(acumulado, k0)
+        v1 = self._valor_ordem(acumulado, k1)
+        valor = v0 + (posicao - k0) * (v1 - v0)
+        return float(min(max(valor, self.minimo), self.maximo))
+
+    def _valor_ordem(self, acumulado, k):
+        """Valor do k-ésimo pixel (0 = menor) segundo o histograma."""
+        classe = int(np.searchsorted(acumulado, k, side='right'))
+        if self.exato:
+            return self.inicio + classe
+        anterior = int(acumulado[classe - 1]) if classe > 0 else 0
+        fracao = (k - anterior + 0.5) / int(self.contagens[classe])
+        return self.inicio + (classe + fracao) * self.largura
+
+    def estatisticas(self, percentis=(2, 98)):
+        """Mesmo formato de ``estatisticas_raster`` (aceito em ``estatisticas=`` dos mapas)."""
+        if self.n_validos == 0:
+            return {'n_validos': 0, 'min': None, 'max': None, 'media': None,
+                    'percentis': {p: None for p in percentis}}
+        return {
+            'n_validos': self.n_validos,
+            'min': self.minimo,
+            'max': self.maximo,
+            'media': self.soma / self.n_validos,
+            'percentis': {p: self.percentil(p) for p in percentis},
+        }
+
+    def salvar(self, caminho, origem=None):
+        """Grava o esboço em .npz (com a assinatura do GeoTIFF de `origem`, se houver)."""
+        meta = {'indice': self.indice, 'dtype': self.dtype, 'n_validos': self.n_validos,
+                'soma': self.soma, 'minimo': self.minimo, 'maximo': self.maximo,
+                'origem': origem}
+        temporario = caminho + '.tmp.npz'
+        np.savez_compressed(temporario, contagens=self.contagens, meta=json.dumps(meta))
+        os.replace(temporario, caminho)
+
+    @classmethod
+    def carregar(cls, caminho):
+        """Lê um esboço gravado por ``salvar``: (esboço, assinatura da origem)."""
+        with np.load(caminho) as dados:
+            meta = json.loads(str(dados['meta']))
+            esboco = cls(meta['indice'], meta['dtype'])
+            esboco.contagens = dados['contagens']
+        esboco.n_validos = meta['n_validos']
+        esboco.soma = meta['soma']
+        esboco.minimo = meta['minimo']
+        esboco.maximo = meta['maximo']
+        return esboco, meta['origem']
+
+
+def esboco_raster(caminho, indice=None):
+    """Esboço de um GeoTIFF em uma passada bloco a bloco (pixels válidos do índice)."""
+    if indice is None:
+        indice = interpretar_nome(caminho)['indice']
+    limites = LIMITES_VALIDOS[indice]
+    with rasterio.open(caminho) as src:
+        esboco = Esboco(indice, src.dtypes[0])
+        for janela in janelas_blocos(src):
+            bloco = src.read(1, window=janela)
+            esboco.adicionar(bloco[mascara_validos(bloco, src.nodata, limites)])
+    return esboco
+
+
+def _calcular_e_salvar(caminho, caminho_esboco):
+    esboco = esboco_raster(caminho)
+    esboco.salvar(caminho_esboco, assinatura_entrada(caminho))
+    return esboco
+
+
+def esbocos(caminhos, pasta_esbocos, n_processos=1):
+    """
+    Esboços dos GeoTIFFs {caminho: Esboco}: lê os gravados em `pasta_esbocos`
+    que ainda correspondem ao arquivo e calcula (em paralelo) só os que
+    faltam ou mudaram. Arquivos fora do padrão de nome são ignorados.
+    """
+    os.makedirs(pasta_esbocos, exist_ok=True)
+    resultado = {}
+    pendentes = []
+    for caminho in caminhos:
+        if interpretar_nome(caminho) is None:
+            continue
+        caminho_esboco = os.path.join(pasta_esbocos, os.path.splitext(os.path.basename(caminho))[0] + '.npz')
+        if os.path.exists(caminho_esboco):
+            esboco, origem = Esboco.carregar(caminho_esboco)
+            if origem == assinatura_entrada(caminho):
+                resultado[caminho] = esboco
+                continue
+        pendentes.append((caminho, caminho_esboco))
+
+    if n_processos == 1 or len(pendentes) <= 1:
+        novos = [_calcular_e_salvar(*args) for args in pendentes]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=n_processos) as executor:
+            novos = list(executor.map(_calcular_e_salvar, *zip(*pendentes)))
+    for (caminho, _), esboco in zip(pendentes, novos):
+        resultado[caminho] = esboco
+    return {caminho: resultado[caminho] for caminho in caminhos if caminho in resultado}
+
+
+def chave_serie(caminho):
+    """(índice, período, área) do arquivo: os anos de uma mesma chave formam a série."""
+    campos = interpretar_nome(caminho)
+    return campos['indice'], campos['periodo'], campos['area']
+
+
+def mesclar_serie(lista):
+    """
+    Soma os esboços de uma série: (esboço da série, fator das unidades dele
+    para as do índice). Com um só tipo, a soma fica nas unidades do arquivo;
+    com tipos diferentes, nas unidades do índice (fator 1).
+    """
+    tipos = {esboco.dtype for esboco in lista}
+    if len(tipos) > 1:
+        lista = [esboco.em_unidades_indice() for esboco in lista]
+    serie = Esboco(lista[0].indice, lista[0].dtype)
+    for esboco in lista:
+        serie.mesclar(esboco)
+    return serie, fator_indice(serie.indice, serie.dtype)
+
+
+def escalas_series(caminhos, pasta_esbocos, percentis=(2, 98), n_processos=1):
+    """
+    Estatísticas por arquivo no formato de ``estatisticas_raster`` em que
+    min/max/média são do próprio arquivo e os 'percentis' são os da série
+    (mesmo índice, período e área) inteira: todos os anos ficam com a mesma
+    escala de cores. Numa série que mistura tipos (ex.: NDVI int16 x 10.000
+    e float32), os percentis vêm nas unidades de cada arquivo.
+    Retorna {caminho: estatisticas}.
+    """
+    por_arquivo = esbocos(caminhos, pasta_esbocos, n_processos)
+    series = {}
+    for caminho, esboco in por_arquivo.items():
+        series.setdefault(chave_serie(caminho), []).append(esboco)
+
+    percentis_serie = {}
+    for chave, lista in series.items():
+        serie, fator = mesclar_serie(lista)
+        percentis_serie[chave] = ({p: serie.percentil(p) for p in percentis}, fator)
+
+    resultado = {}
+    for caminho, esboco in por_arquivo.items():
+        valores, fator = percentis_serie[chave_serie(caminho)]
+        conversao = fator / fator_indice(esboco.indice, esboco.dtype)
+        estatisticas = esboco.estatisticas(percentis=())
+        estatisticas['percentis'] = {p: None if v is None else v * conversao for p, v in valores.items()}
+        resultado[caminho] = estatisticas
+    return resultado
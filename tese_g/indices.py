@@ -0,0 +1,173 @@
+"""
+Cálculo local de NDVI, EVI, NDWI e LSWI a partir de uma imagem de
+reflectância de superfície com várias bandas (ex.: MOD09A1).
+
+Em vez de uma exportação do GEE por índice, a cena é lida uma única vez,
+bloco a bloco, só nas bandas que os índices pedidos usam, e todos os
+índices saem da mesma passada. Termos comuns (ex.: NIR - Vermelho, usado
+pelo NDVI e pelo EVI) são calculados uma vez por bloco e reaproveitados. Cada índice é
+gravado no padrão ``<INDICE>_<Seco|Umido>_<AreaN>_<ANO>.tif`` das
+exportações, no formato que os ``gerar_mapa_*`` já esperam: NDVI em int16
+escalado por 10.000 e os demais em float32.
+"""
+
+import os
+import re
+
+import numpy as np
+import rasterio
+
+from .cog import perfil_saida
+from .estatisticas import janelas_blocos, mascara_validos
+from .nomes import montar_nome
+
+# Posição (1-based) de cada banda no GeoTIFF de reflectância; padrão: ordem do MOD09A1
+BANDAS_MOD09A1 = {
+    'vermelho': 1,   # 620-670 nm
+    'nir': 2,        # 841-876 nm
+    'azul': 3,       # 459-479 nm
+    'verde': 4,      # 545-565 nm
+    'swir1240': 5,   # 1230-1250 nm
+    'swir1640': 6,   # 1628-1652 nm
+    'swir2130': 7,   # 2105-2155 nm
+}
+
+# Bandas usadas por cada índice
+BANDAS_INDICE = {
+    'NDVI': ('nir', 'vermelho'),
+    'EVI': ('nir', 'vermelho', 'azul'),
+    'NDWI': ('nir', 'swir1240'),   # Gao (1996)
+    'LSWI': ('nir', 'swir1640'),   # Xiao et al. (2004)
+}
+
+# Tipo e nodata de cada índice gravado (NDVI como nas exportações: inteiro x 10.000)
+SAIDA_INDICE = {
+    'NDVI': ('int16', -32768, 10000),
+    'EVI': ('float32', -9999.0, 1),
+    'NDWI': ('float32', -9999.0, 1),
+    'LSWI': ('float32', -9999.0, 1),
+}
+
+PADRAO_CENA = re.compile(r'_(Seco|Umido)_(Area\d+)_(\d{4})\.tif$', re.IGNORECASE)
+
+
+class _Termos:
+    """Termos de um bloco (somas e diferenças de bandas) calculados uma vez só."""
+
+    def __init__(self, bandas):
+        self.bandas = bandas
+        self.cache = {}
+
+    def soma(self, a, b):
+        return self._termo(('+', a, b), lambda: self.bandas[a] + self.bandas[b])
+
+    def diferenca(self, a, b):
+        return self._termo(('-', a, b), lambda: self.bandas[a] - self.bandas[b])
+
+    def diferenca_normalizada(self, a, b):
+        return self._termo(('nd', a, b), lambda: _dividir(self.diferenca(a, b), self.soma(a, b)))
+
+    def _termo(self, chave, calcular):
+        if chave not in self.cache:
+            self.cache[chave] = calcular()
+        return self.cache[chave]
+
+
+def _dividir(numerador, denominador):
+    """Divisão com NaN onde o denominador é zero."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        resultado = numerador / denominador
+    resultado[denominador == 0] = np.nan
+    return resultado
+
+
+def _calcular(indice, termos, papeis):
+    """Índice de um bloco (float32, NaN onde não é calculável)."""
+    if indice == 'EVI':
+        nir, vermelho, azul = (termos.bandas[papeis[p]] for p in BANDAS_INDICE['EVI'])
+        denominador = nir + 6 * vermelho - 7.5 * azul + 1
+        return _dividir(2.5 * termos.diferenca(papeis['nir'], papeis['vermelho']), denominador)
+    a, b = BANDAS_INDICE[indice]
+    return termos.diferenca_normalizada(papeis[a], papeis[b])
+
+
+def _nome_saida(caminho_cena, indice):
+    """Nome no padrão das exportações, se a cena indicar período/área/ano; senão <cena>_<INDICE>.tif."""
+    nome = os.path.basename(caminho_cena)
+    match = PADRAO_CENA.search(nome)
+    if match:
+        periodo, area, ano = match.groups()
+        return montar_nome(indice, periodo.capitalize(), area.capitalize(), ano)
+    return f"{os.path.splitext(nome)[0]}_{indice}.tif"
+
+
+def calcular_indices(caminho_cena, pastas_saida, indices=('NDVI', 'EVI', 'NDWI', 'LSWI'),
+                     bandas=None, escala=0.0001):
+    """
+    Calcula os `indices` da cena em uma passada e grava um GeoTIFF por
+    índice. `pastas_saida` é uma pasta (cada índice vai para uma subpasta
+    com o nome dele) ou um dicionário índice -> pasta. `bandas` troca a
+    posição das bandas (padrão ``BANDAS_MOD09A1``) e `escala` converte os
+    números digitais em reflectância (necessário para a constante do EVI).
+    Retorna {índice: caminho gravado}.
+    """
+    indices = [indice.upper() for indice in indices]
+    papeis = dict(BANDAS_MOD09A1, **(bandas or {}))
+    if isinstance(pastas_saida, str):
+        pastas_saida = {indice: os.path.join(pastas_saida, indice) for indice in indices}
+    usadas = sorted({papeis[p] for indice in indices for p in BANDAS_INDICE[indice]})
+
+    saidas = {}
+    with rasterio.open(caminho_cena) as src:
+        destinos = {}
+        try:
+            for indice in indices:
+                dtype, nodata, _ = SAIDA_INDICE[indice]
+                os.makedirs(pastas_saida[indice], exist_ok=True)
+                saidas[indice] = os.path.join(pastas_saida[indice], _nome_saida(caminho_cena, indice))
+                destinos[indice] = rasterio.open(saidas[indice], 'w', **perfil_saida(src, dtype, nodata))
+
+            for janela in janelas_blocos(src):
+                # Todas as bandas necessárias em uma só leitura
+                bloco = src.read(usadas, window=janela)
+                bandas_bloco = {}
+                for i, numero in enumerate(usadas):
+                    validos = mascara_validos(bloco[i], src.nodatavals[numero - 1])
+                    valores = bloco[i].astype(np.float32)
+                    valores *= escala
+                    valores[~validos] = np.nan
+                    bandas_bloco[numero] = valores
+                termos = _Termos(bandas_bloco)
+
+                for indice in indices:
+                    dtype, nodata, fator = SAIDA_INDICE[indice]
+                    valores = _calcular(indice, termos, papeis)
+                    invalidos = ~np.isfinite(valores)
+                    valores = np.where(invalidos, 0, valores)
+                    if fator != 1:
+                        valores = np.rint(np.clip(valores, -1, 1) * fator)
+                    valores = valores.astype(dtype)
+                    valores[invalidos] = nodata
+                    destinos[indice].write(valores, 1, window=janela)
+        finally:
+            for dst in destinos.values():
+                dst.close()
+    return saidas
+
+
+def calcular_indices_pasta(pasta_cenas, pastas_saida, indices=('NDVI', 'EVI', 'NDWI', 'LSWI'),
+                           bandas=None, escala=0.0001, n_processos=1):
+    """
+    Calcula os índices de todas as cenas .tif de `pasta_cenas` (ver
+    ``calcular_indices``), uma cena por processo. Retorna a lista de
+    {índice: caminho} na ordem das cenas.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from .lote import listar_tifs
+
+    cenas = listar_tifs(pasta_cenas)
+    argumentos = [(cena, pastas_saida, indices, bandas, escala) for cena in cenas]
+    if n_processos == 1 or len(cenas) <= 1:
+        return [calcular_indices(*args) for args in argumentos]
+    with ProcessPoolExecutor(max_workers=n_processos) as executor:
+        return list(executor.map(calcular_indices, *zip(*argumentos)))
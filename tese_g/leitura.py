@@ -0,0 +1,60 @@
+"""
+Leitura reduzida de rasters para desenho dos mapas.
+
+A figura salva tem no máximo ``figsize * dpi`` pixels; ler a banda em
+resolução total e deixar o matplotlib reduzir desperdiça I/O e tempo de
+``imshow``. Aqui a leitura já pede ao rasterio (``out_shape``) só a
+resolução necessária, o que também aproveita as overviews do GeoTIFF.
+"""
+
+import math
+
+import numpy as np
+from rasterio.enums import Resampling
+
+from .medicao import contar_leitura
+
+
+def forma_necessaria(src, figsize, dpi):
+    """
+    (linhas, colunas) suficientes para desenhar o raster em uma figura de
+    `figsize` polegadas a `dpi` pontos por polegada, sem ampliar a imagem.
+    """
+    largura_px = figsize[0] * dpi
+    altura_px = figsize[1] * dpi
+    fator = min(1.0, largura_px / src.width, altura_px / src.height)
+    return (max(1, math.ceil(src.height * fator)), max(1, math.ceil(src.width * fator)))
+
+
+def verificar_memoria(forma, dtype, memoria_max_mb):
+    """
+    Levanta MemoryError antes da leitura se a banda (no tipo original) mais a
+    máscara de validade (1 byte/pixel) passarem de `memoria_max_mb`.
+    """
+    if memoria_max_mb is None:
+        return
+    necessario = forma[0] * forma[1] * (np.dtype(dtype).itemsize + 1)
+    if necessario > memoria_max_mb * 2 ** 20:
+        raise MemoryError(
+            f"Leitura de {forma[0]}x{forma[1]} pixels precisa de ~{necessario / 2 ** 20:.0f} MB "
+            f"(limite: {memoria_max_mb} MB); use reamostragem ou aumente o limite"
+        )
+
+
+def ler_banda(src, figsize, dpi, reamostragem=None, banda=1, memoria_max_mb=None):
+    """
+    Lê a banda para desenho, no tipo de dado original (sem conversão para
+    float). Com `reamostragem` None lê a resolução total; com um nome de
+    ``rasterio.enums.Resampling`` ('average', 'nearest', 'bilinear', ...) lê
+    só o tamanho que a figura precisa. Com `memoria_max_mb`, falha antes de
+    ler se a banda não couber no limite.
+    """
+    if reamostragem is None:
+        verificar_memoria((src.height, src.width), src.dtypes[banda - 1], memoria_max_mb)
+        banda_lida = src.read(banda)
+    else:
+        forma = forma_necessaria(src, figsize, dpi)
+        verificar_memoria(forma, src.dtypes[banda - 1], memoria_max_mb)
+        banda_lida = src.read(banda, out_shape=forma, resampling=Resampling[reamostragem])
+    contar_leitura(banda_lida)
+    return banda_lida
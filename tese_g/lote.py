@@ -0,0 +1,259 @@
+"""
+Processamento em lote: distribui os GeoTIFFs de uma pasta entre vários
+processos e junta o resultado de cada arquivo em um relatório único.
+"""
+
+import importlib
+import json
+import os
+import traceback
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from .medicao import NOME_LOG, escrever_log, mais_lentos, medir, resumo_etapas
+
+# Módulo com as funções de mapa de cada motor de renderização
+MOTORES = {
+    'matplotlib': 'tese_g.mapas',   # figuras completas (título, barra de cores, escala)
+    'rapido': 'tese_g.rapido',      # quicklooks com tabela de cores, sem matplotlib.pyplot
+}
+
+
+def obter_renderizadores(motor='matplotlib'):
+    """Dicionário índice -> função de mapa do motor escolhido."""
+    if motor not in MOTORES:
+        raise ValueError(f"Motor desconhecido: {motor} (use um de {sorted(MOTORES)})")
+    return importlib.import_module(MOTORES[motor]).RENDERIZADORES
+
+
+def _inicializar_processo():
+    """Usa o backend não interativo Agg em cada processo de trabalho."""
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+
+
+def _processar_arquivo(indice, caminho_imagem, pasta_saida, opcoes, motor='matplotlib'):
+    """
+    Gera o mapa de um arquivo e devolve o resultado em vez de imprimir, com
+    a medição por etapa (ver ``tese_g.medicao``) e, em erros, o traceback.
+    """
+    from . import AvisoMapa
+
+    resultado = {'arquivo': os.path.basename(caminho_imagem), 'status': 'ok', 'mensagem': ''}
+    with medir() as medicao:
+        try:
+            resultado['mensagem'] = obter_renderizadores(motor)[indice](caminho_imagem, pasta_saida, **opcoes)
+        except AvisoMapa as e:
+            resultado['status'] = 'aviso'
+            resultado['mensagem'] = str(e)
+        except Exception as e:
+            resultado['status'] = 'erro'
+            resultado['mensagem'] = f"{type(e).__name__}: {e}"
+            resultado['traceback'] = traceback.format_exc()
+    resultado['medicao'] = medicao.registro()
+    resultado['medicao']['tamanho_arquivo'] = os.path.getsize(caminho_imagem) \
+        if os.path.exists(caminho_imagem) else None
+    return resultado
+
+
+def listar_tifs(pasta_imagens):
+    """Lista (em ordem) os caminhos dos arquivos .tif de uma pasta."""
+    return [
+        os.path.join(pasta_imagens, arquivo)
+        for arquivo in sorted(os.listdir(pasta_imagens))
+        if arquivo.lower().endswith('.tif')
+    ]
+
+
+def _executar(indice, caminhos, pasta_saida, opcoes, n_processos, cache_estatisticas=None,
+              motor='matplotlib', pipeline=None, agendador=None):
+    """
+    Gera os mapas de `caminhos` em série, no pool de processos, com
+    `pipeline` ((n_leitores, profundidade)) em pipeline (ver ``tese_g.pipeline``)
+    ou, com `agendador`, como grafo de tarefas (ver ``tese_g.distribuido``).
+    """
+    opcoes_por_arquivo = [opcoes] * len(caminhos)
+    if cache_estatisticas:
+        opcoes_por_arquivo = [
+            dict(opcoes, estatisticas=cache_estatisticas[caminho]) if caminho in cache_estatisticas else opcoes
+            for caminho in caminhos
+        ]
+
+    if agendador is not None:
+        from .distribuido import executar_grafo
+        return executar_grafo(indice, caminhos, pasta_saida, opcoes_por_arquivo, motor, agendador)
+
+    if pipeline is not None:
+        from .pipeline import executar_pipeline
+        n_leitores, profundidade = pipeline
+        return executar_pipeline(indice, caminhos, pasta_saida, opcoes_por_arquivo, motor,
+                                 n_leitores, profundidade)
+
+    if n_processos == 1 or len(caminhos) <= 1:
+        return [_processar_arquivo(indice, caminho, pasta_saida, opcoes_arquivo, motor)
+                for caminho, opcoes_arquivo in zip(caminhos, opcoes_por_arquivo)]
+
+    with ProcessPoolExecutor(max_workers=n_processos, initializer=_inicializar_processo) as executor:
+        return list(executor.map(
+            _processar_arquivo,
+            [indice] * len(caminhos),
+            caminhos,
+            [pasta_saida] * len(caminhos),
+            opcoes_por_arquivo,
+            [motor] * len(caminhos),
+        ))
+
+
+def processar_lote(pasta_imagens, pasta_saida, indice, n_processos=None,
+                   incremental=False, com_hash=False, catalogo=None, motor='matplotlib',
+                   caminho_log=None, escala_comum=False, pasta_esbocos=None,
+                   pipeline=False, n_leitores=2, profundidade=4, arquivos=None, agendador=None, **opcoes):
+    """
+    Gera os mapas de todos os .tif de `pasta_imagens` usando `n_processos`
+    processos (padrão: número de núcleos). `indice` é uma das chaves de
+    ``tese_g.mapas.RENDERIZADORES`` ('ndvi', 'evi', 'lai', 'ndwi', 'lswi', 'vci').
+    As `opcoes` extras (ex.: ``reamostragem='average'``) vão para a função de mapa.
+
+    Com `incremental`, só refaz os mapas que o manifesto da pasta de saída
+    aponta como desatualizados ou ausentes (ver ``tese_g.manifesto``); com
+    `com_hash`, o conteúdo dos GeoTIFFs também entra na comparação.
+    Com `catalogo` (caminho do banco de ``tese_g.catalogo``), as estatísticas
+    já calculadas dos arquivos não alterados são reaproveitadas. `motor`
+    escolhe entre as figuras do matplotlib ('matplotlib') e os quicklooks
+    rápidos com tabela de cores ('rapido', ver ``tese_g.rapido``).
+
+    Com `escala_comum`, todos os anos de uma série (mesmo índice, período e
+    área) usam os mesmos limites de cor (p`pmin`/p`pmax` da série inteira),
+    tirados de histogramas por arquivo guardados em `pasta_esbocos` (padrão:
+    ``esbocos`` na pasta de saída; ver ``tese_g.histogramas``).
+
+    Com `pipeline`, os mapas são desenhados em um só processo enquanto
+    `n_leitores` threads carregam os próximos GeoTIFFs (no máximo
+    `profundidade` na memória) e outra grava os PNGs (ver
+    ``tese_g.pipeline``); `n_processos` é ignorado e os PNGs são os mesmos.
+
+    Com `arquivos` (nomes dos .tif), só esses arquivos da pasta entram no lote.
+
+    Com `agendador` (``agendador_local`` ou ``conectar_cluster`` de
+    ``tese_g.distribuido``), as estatísticas que faltam são calculadas por
+    janelas em paralelo e cada mapa vira uma tarefa do agendador, que pode
+    estar em vários nós; `n_processos` e `pipeline` são ignorados.
+
+    Cada arquivo processado vira uma linha JSON em `caminho_log` (padrão:
+    ``log_execucao.jsonl`` na pasta de saída; False desliga o log).
+
+    Retorna a lista de resultados por arquivo, na ordem dos arquivos, com as
+    chaves 'arquivo', 'status' ('ok', 'aviso', 'erro' ou 'atual'), 'mensagem'
+    e, nos arquivos processados, 'medicao' (tempos por etapa, bytes e pixels
+    lidos, pico de memória).
+    """
+    renderizadores = obter_renderizadores(motor)
+    indice = indice.lower()
+    if indice not in renderizadores:
+        raise ValueError(f"Índice desconhecido: {indice} (use um de {sorted(renderizadores)})")
+
+    os.makedirs(pasta_saida, exist_ok=True)
+    caminhos = listar_tifs(pasta_imagens)
+    if arquivos is not None:
+        arquivos = set(arquivos)
+        caminhos = [caminho for caminho in caminhos if os.path.basename(caminho) in arquivos]
+    n_processos = n_processos or os.cpu_count() or 1
+
+    cache_estatisticas = None
+    if catalogo is not None:
+        from .catalogo import estatisticas_em_cache
+        cache_estatisticas = estatisticas_em_cache(catalogo, caminhos, indice)
+    if escala_comum:
+        from .histogramas import escalas_series
+        percentis = (opcoes.get('pmin', 2), opcoes.get('pmax', 98))
+        # Percentis explícitos: o mapa NDVI do matplotlib só usa a escala comum quando eles são passados
+        opcoes = dict(opcoes, pmin=percentis[0], pmax=percentis[1])
+        escalas = escalas_series(caminhos, pasta_esbocos or os.path.join(pasta_saida, 'esbocos'),
+                                 percentis, n_processos)
+        # Min/máx/média do catálogo (quando há) com os percentis da série
+        base = cache_estatisticas or {}
+        cache_estatisticas = {caminho: dict(base.get(caminho, est), percentis=est['percentis'])
+                              for caminho, est in escalas.items()}
+
+    if caminho_log is None:
+        caminho_log = os.path.join(pasta_saida, NOME_LOG)
+    contexto_log = {'execucao': datetime.now().isoformat(timespec='seconds'), 'indice': indice,
+                    'motor': motor}
+    pipeline = (n_leitores, profundidade) if pipeline else None
+
+    if not incremental:
+        resultados = _executar(indice, caminhos, pasta_saida, opcoes, n_processos, cache_estatisticas, motor,
+                               pipeline, agendador)
+        if caminho_log:
+            escrever_log(caminho_log, resultados, **contexto_log)
+        return resultados
+
+    from . import manifesto as mf
+
+    manifesto = mf.carregar_manifesto(pasta_saida)
+    impressao = mf.impressao_parametros(indice, opcoes, motor)
+    resultados = {}
+    pendentes = []
+    impressoes = {}
+    for caminho in caminhos:
+        entrada = manifesto.get(os.path.basename(caminho))
+        impressoes[caminho] = impressao
+        if escala_comum and caminho in cache_estatisticas:
+            # A escala da série muda quando entra um ano novo: o mapa precisa ser refeito
+            impressoes[caminho] = f"{impressao}:{json.dumps(cache_estatisticas[caminho]['percentis'])}"
+        if mf.esta_atualizado(entrada, caminho, impressoes[caminho], pasta_saida, com_hash):
+            resultados[caminho] = {'arquivo': os.path.basename(caminho), 'status': 'atual',
+                                   'mensagem': entrada['saida'] or ''}
+        else:
+            pendentes.append(caminho)
+
+    novos = _executar(indice, pendentes, pasta_saida, opcoes, n_processos, cache_estatisticas, motor, pipeline,
+                      agendador)
+    for caminho, r in zip(pendentes, novos):
+        resultados[caminho] = r
+        if r['status'] in ('ok', 'aviso'):
+            nome_saida = r['mensagem'] if r['status'] == 'ok' else None
+            mf.registrar(manifesto, caminho, impressoes[caminho], nome_saida, r['status'], com_hash)
+
+    mf.salvar_manifesto(pasta_saida, manifesto)
+    if caminho_log:
+        escrever_log(caminho_log, novos, **contexto_log)
+    return [resultados[caminho] for caminho in caminhos]
+
+
+def imprimir_relatorio(resultados, pasta_saida, orfaos=(), n_lentos=5):
+    """
+    Relatório final: avisos, erros e PNGs órfãos por arquivo, tempos p50/p95
+    de cada etapa, os arquivos mais lentos e o total processado.
+    """
+    for status, simbolo in (('aviso', '⚠'), ('erro', '✖')):
+        for r in resultados:
+            if r['status'] == status:
+                print(f"{simbolo} {r['arquivo']}: {r['mensagem']}")
+    for arquivo in orfaos:
+        print(f"? Mapa sem imagem de origem: {arquivo}")
+
+    n_ok = sum(r['status'] == 'ok' for r in resultados)
+    n_atuais = sum(r['status'] == 'atual' for r in resultados)
+    n_avisos = sum(r['status'] == 'aviso' for r in resultados)
+    n_erros = sum(r['status'] == 'erro' for r in resultados)
+
+    print("\n" + "="*50)
+    resumo = resumo_etapas(resultados)
+    if resumo:
+        print(f"{'Etapa':<14}{'p50 (s)':>10}{'p95 (s)':>10}")
+        for nome, (p50, p95) in sorted(resumo.items(), key=lambda item: item[0] == 'total'):
+            print(f"{nome:<14}{p50:>10.3f}{p95:>10.3f}")
+        print("Arquivos mais lentos:")
+        for r in mais_lentos(resultados, n_lentos):
+            medicao = r['medicao']
+            print(f"  {medicao['tempo_total']:8.2f} s  {medicao['pico_memoria_mb']:7.0f} MB  {r['arquivo']}")
+        print("-"*50)
+    print(f"Total de arquivos processados: {len(resultados)}")
+    print(f"✔ Mapas gerados: {n_ok} | ⚠ Avisos: {n_avisos} | ✖ Erros: {n_erros}")
+    if n_atuais or orfaos:
+        print(f"↺ Já atualizados: {n_atuais} | ? Mapas órfãos: {len(orfaos)}")
+    print(f"Mapas salvos em: {pasta_saida}")
+    if os.path.exists(os.path.join(pasta_saida, NOME_LOG)):
+        print(f"Log da execução: {os.path.join(pasta_saida, NOME_LOG)}")
+    print("="*50)
@@ -0,0 +1,144 @@
+"""
+Manifesto para regerar só os mapas desatualizados.
+
+Para cada GeoTIFF o manifesto (um JSON na pasta de saída) guarda tamanho,
+data de modificação e, opcionalmente, o hash do arquivo, junto com uma
+impressão digital dos parâmetros do mapa (índice, opções, paleta, constantes
+e versão do desenho do motor) e o nome do PNG gerado. Na próxima execução só
+são refeitos os mapas cuja entrada, parâmetros ou PNG mudaram.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+
+NOME_MANIFESTO = 'manifesto_mapas.json'
+
+
+def hash_arquivo(caminho, tamanho_bloco=2 ** 20):
+    """SHA-256 do conteúdo do arquivo, lido em blocos."""
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def assinatura_entrada(caminho, com_hash=False):
+    """Tamanho, data de modificação e (se pedido) hash do GeoTIFF."""
+    info = os.stat(caminho)
+    assinatura = {'tamanho': info.st_size, 'mtime': info.st_mtime_ns}
+    if com_hash:
+        assinatura['hash'] = hash_arquivo(caminho)
+    return assinatura
+
+
+def impressao_parametros(indice, opcoes, motor='matplotlib'):
+    """
+    Impressão digital dos parâmetros do mapa: índice, motor, valores padrão
+    da função de desenho sobrescritos pelas `opcoes`, cores da paleta (256
+    amostras), constantes de layout do módulo do motor (nomes em maiúsculas
+    com valores simples) e a ``VERSAO_RENDER`` do índice nesse módulo, que
+    sobe quando o desenho (dpi, tamanho da figura, legendas...) muda.
+    Comentários e mudanças em outros renderizadores não invalidam os mapas.
+    """
+    import importlib
+    import numpy as np
+    from .lote import MOTORES
+    from .paletas import obter_paleta
+
+    modulo = importlib.import_module(MOTORES[motor])
+    funcao = modulo.RENDERIZADORES[indice]
+    parametros = {
+        nome: p.default
+        for nome, p in inspect.signature(funcao).parameters.items()
+        if p.default is not inspect.Parameter.empty
+    }
+    parametros.update(opcoes)
+    cmap = parametros.pop('cmap', None)
+    versao = getattr(modulo, 'VERSAO_RENDER', 0)
+    if isinstance(versao, dict):
+        versao = versao.get(indice, 0)
+    constantes = {
+        nome: valor for nome, valor in vars(modulo).items()
+        if nome.isupper() and isinstance(valor, (bool, int, float, str, tuple))
+    }
+
+    h = hashlib.sha256()
+    h.update(f'{motor}:{indice}'.encode())
+    h.update(json.dumps([parametros, constantes, versao], sort_keys=True, default=str).encode())
+    if cmap is not None:
+        cores = obter_paleta(cmap)(np.linspace(0, 1, 256))
+        h.update(np.round(cores, 6).tobytes())
+    return h.hexdigest()[:16]
+
+
+def carregar_manifesto(pasta_saida):
+    """Lê o manifesto da pasta de saída (vazio se ainda não existir)."""
+    caminho = os.path.join(pasta_saida, NOME_MANIFESTO)
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def salvar_manifesto(pasta_saida, manifesto):
+    """Grava o manifesto de forma atômica (arquivo temporário + rename)."""
+    caminho = os.path.join(pasta_saida, NOME_MANIFESTO)
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, indent=1, sort_keys=True, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+def esta_atualizado(entrada, caminho_imagem, impressao, pasta_saida, com_hash=False):
+    """
+    True se o mapa registrado em `entrada` ainda vale: mesmos parâmetros,
+    mesmo GeoTIFF e PNG presente. Com `com_hash`, um arquivo cujo tamanho ou
+    data mudaram mas o conteúdo não é considerado atual.
+    """
+    if entrada is None or entrada.get('parametros') != impressao:
+        return False
+    if entrada.get('saida') and not os.path.exists(os.path.join(pasta_saida, entrada['saida'])):
+        return False
+
+    atual = assinatura_entrada(caminho_imagem)
+    registrada = entrada['entrada']
+    if atual['tamanho'] == registrada['tamanho'] and atual['mtime'] == registrada['mtime']:
+        return True
+    if com_hash and 'hash' in registrada and atual['tamanho'] == registrada['tamanho']:
+        if hash_arquivo(caminho_imagem) == registrada['hash']:
+            registrada['mtime'] = atual['mtime']
+            return True
+    return False
+
+
+def registrar(manifesto, caminho_imagem, impressao, nome_saida, status, com_hash=False):
+    """Registra no manifesto o resultado de um mapa gerado (ou de um aviso)."""
+    manifesto[os.path.basename(caminho_imagem)] = {
+        'entrada': assinatura_entrada(caminho_imagem, com_hash),
+        'parametros': impressao,
+        'saida': nome_saida,
+        'status': status,
+    }
+
+
+def listar_orfaos(pasta_imagens, pasta_saida, manifesto=None):
+    """
+    PNGs da pasta de saída registrados no manifesto para GeoTIFFs que não
+    existem mais em `pasta_imagens` (ex.: a imagem de origem foi apagada ou
+    renomeada) e que não são o mapa de nenhum GeoTIFF atual. Só os nomes
+    gerados pelos renderizadores (os do manifesto) entram: atlas, galerias e
+    outros PNGs na mesma pasta não são órfãos. Nada é apagado; a lista
+    serve para o relatório.
+    """
+    if manifesto is None:
+        manifesto = carregar_manifesto(pasta_saida)
+    existentes = set(os.listdir(pasta_imagens))
+    validos, registrados = set(), set()
+    for nome, entrada in manifesto.items():
+        if entrada.get('saida'):
+            (validos if nome in existentes else registrados).add(entrada['saida'])
+    presentes = set(os.listdir(pasta_saida))
+    return sorted((registrados - validos) & presentes)
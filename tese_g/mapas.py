@@ -0,0 +1,609 @@
+"""
+Funções de geração de mapas para cada índice (NDVI, EVI, LAI, NDWI, LSWI, VCI).
+
+Cada função lê um GeoTIFF, calcula as estatísticas e salva a figura em PNG.
+Com ``reamostragem`` (ex.: 'average') a banda é lida só no tamanho que a
+figura precisa (ver ``tese_g.leitura``); as estatísticas do título e os
+limites de cor continuam calculados na resolução total. Estatísticas já
+calculadas (ex.: do catálogo, ver ``tese_g.catalogo``) podem ser passadas em
+``estatisticas`` para evitar a passada sobre o raster. Os pixels são
+desenhados no tipo original do arquivo (sem cópias em float64) e
+``memoria_max_mb`` faz a leitura falhar logo se a banda não couber no limite.
+Com ``pasta_mascaras``, a máscara de validade vem do cache compactado de
+``tese_g.mascaras``: arquivos sem pixel válido são recusados antes da
+leitura e as estatísticas pulam as janelas vazias.
+
+Em caso de sucesso retorna o nome do arquivo gerado; arquivos sem dados
+válidos ou fora do padrão de nome levantam ``AvisoMapa`` e os demais
+problemas sobem como exceção para quem chamou (ver ``tese_g.lote``).
+"""
+
+import os
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.ticker import FuncFormatter
+
+from . import AvisoMapa
+from .estatisticas import LIMITES_VALIDOS, estatisticas_raster, mascara_validos
+from .leitura import ler_banda
+from .mascaras import mascara_do_mapa
+from .medicao import etapa
+from .nomes import PADRAO_NOME, interpretar_mudanca, interpretar_nome, titulo_mudanca
+from .paletas import ndvi_colors, ndvi_cmap, evi_cmap, lai_cmap, ndwi_cmap, lswi_cmap, vci_cmap, mudanca_cmap
+from .pipeline import abrir_raster, destino_png
+
+plt.style.use('seaborn-v0_8-whitegrid')  # Estilo moderno para os gráficos
+
+# Versão do desenho de cada renderizador (chaves de RENDERIZADORES): aumente a do
+# índice ao mudar dpi, tamanho da figura, legendas ou títulos, para o modo
+# incremental de ``processar_lote`` refazer só os mapas desse índice
+VERSAO_RENDER = {
+    'ndvi': 1,
+    'evi': 1,
+    'lai': 1,
+    'ndwi': 1,
+    'lswi': 1,
+    'vci': 1,
+    'delta': 1,
+    'anomalia': 1,
+}
+
+# Padrão dos nomes (ex: NDVI_Seco_Area1_2010.tif), o mesmo de tese_g.nomes; mantido aqui para os scripts
+padrao = PADRAO_NOME
+
+
+def _verificar_arquivo(caminho_imagem):
+    """Levanta FileNotFoundError se o GeoTIFF não existir."""
+    if not os.path.exists(caminho_imagem):
+        raise FileNotFoundError(f"Arquivo não encontrado: {os.path.basename(caminho_imagem)}")
+
+
+def _adicionar_escala(ax, src, largura_lida):
+    """Adiciona a barra de escala (opcional), considerando a leitura reduzida."""
+    try:
+        from matplotlib_scalebar.scalebar import ScaleBar
+        dx = src.res[0] * src.width / largura_lida
+        ax.add_artist(ScaleBar(dx, units="m", location='lower left'))
+    except Exception:
+        pass
+
+
+def _mascarar(banda, nodata, limites=None, mascara=None):
+    """
+    Array mascarado sobre a própria banda (sem cópia), com a máscara montada
+    no lugar. Com a `mascara` em cache: raster todo válido fica sem máscara
+    e a leitura em resolução total usa os bits guardados.
+    """
+    if mascara is not None and mascara.cheia:
+        return np.ma.masked_array(banda, copy=False)
+    if mascara is not None and banda.shape == mascara.forma:
+        invalidos = mascara.completa()
+        return np.ma.masked_array(banda, mask=np.logical_not(invalidos, out=invalidos), copy=False)
+    return np.ma.masked_array(banda, mask=mascara_validos(banda, nodata, limites, invertida=True), copy=False)
+
+
+def _obter_estatisticas(src, estatisticas, limites=None, percentis=(), mascara=None):
+    """Usa as estatísticas já calculadas (ex.: do catálogo) ou faz a passada sobre o raster."""
+    if estatisticas is not None and all(p in estatisticas['percentis'] for p in percentis):
+        return estatisticas
+    return estatisticas_raster(src, limites=limites, percentis=percentis, mascara=mascara)
+
+
+def gerar_mapa_ndvi(
+    caminho_imagem,       # caminho completo do GeoTIFF
+    titulo_mapa,          # título do mapa: NDVI + período + ano
+    pasta_saida,          # pasta onde salvar a figura
+    cmap='viridis',       # colormap do matplotlib ou paleta personalizada
+    reamostragem=None,    # None = resolução total; ex.: 'average' lê só o tamanho da figura
+    estatisticas=None,    # estatísticas já calculadas (ex.: do catálogo), evita reler o raster
+    memoria_max_mb=None,  # limite de memória da leitura; acima dele falha em vez de usar swap
+    pasta_mascaras=None,  # pasta das máscaras de validade (ver tese_g.mascaras); None = sem cache
+    percentis=None        # (pmin, pmax): escala de cores entre esses percentis; None = escala automática
+):
+    """
+    Lê a imagem NDVI, calcula estatísticas, desenha e salva uma figura
+    com barra de cores (legenda), título e valores aproximados. Com
+    `percentis`, a escala de cores vai dos percentis das `estatisticas`
+    (ex.: os da série inteira, com ``escala_comum``) em vez da automática.
+    """
+
+    # Abre o arquivo raster
+    with abrir_raster(caminho_imagem) as src:
+        mascara = mascara_do_mapa(caminho_imagem, src, None, pasta_mascaras)
+        # Lê a primeira banda no tipo original (ex.: int16) e mascara o NoData
+        ndvi_array = ler_banda(src, (8, 6), 150, reamostragem, memoria_max_mb=memoria_max_mb)
+        etapa('leitura')
+        ndvi_array = _mascarar(ndvi_array, src.nodata, mascara=mascara)
+        etapa('mascara')
+
+        # Calcula estatísticas (uma passada bloco a bloco)
+        est = _obter_estatisticas(src, estatisticas, percentis=percentis or (), mascara=mascara)
+        etapa('estatisticas')
+        if est['n_validos'] == 0:
+            raise AvisoMapa(f"Arquivo sem dados válidos: {os.path.basename(caminho_imagem)}")
+        ndvi_min, ndvi_max, ndvi_mean = est['min'], est['max'], est['media']
+        vmin, vmax = (est['percentis'][percentis[0]], est['percentis'][percentis[1]]) if percentis else (None, None)
+
+        # Arredondar para 2 casas decimais
+        ndvi_min_2dec = round(ndvi_min, 2)
+        ndvi_max_2dec = round(ndvi_max, 2)
+        ndvi_mean_2dec = round(ndvi_mean, 2)
+
+        # Cria a figura e o eixo
+        fig, ax = plt.subplots(figsize=(8, 6))
+
+        # Plota o raster
+        img_plot = ax.imshow(ndvi_array, cmap=cmap, vmin=vmin, vmax=vmax)
+        etapa('imshow')
+
+        # Adiciona a colorbar
+        cbar = fig.colorbar(img_plot, ax=ax, shrink=0.7)
+        cbar.set_label('NDVI', fontsize=12)
+        etapa('colorbar')
+
+        # Título do mapa
+        ax.set_title(f'{titulo_mapa}\n'
+                     f'Min: {ndvi_min_2dec} | Max: {ndvi_max_2dec} | Mean: {ndvi_mean_2dec}',
+                     fontsize=14)
+
+        # Remove eixos (opcional)
+        ax.axis('off')
+
+        etapa('anotacoes')
+
+        # Salva a figura na pasta de saída
+        nome_saida = f'{titulo_mapa}.png'
+        with destino_png(os.path.join(pasta_saida, nome_saida)) as destino:
+            plt.savefig(destino, format='png', dpi=150, bbox_inches='tight')
+        etapa('savefig')
+        plt.close(fig)  # Fecha a figura para liberar memória
+
+    return nome_saida
+
+
+def gerar_mapa_ndvi_com_percentil(
+    caminho_imagem,
+    titulo_mapa,
+    pasta_saida,
+    cmap=ndvi_cmap,
+    pmin=2,   # percentil mínimo
+    pmax=98,  # percentil máximo
+    reamostragem=None,
+    estatisticas=None,
+    memoria_max_mb=None,
+    pasta_mascaras=None
+):
+    """
+    Lê a imagem NDVI (escalada em 10.000), usa percentis para definir
+    min/max de plotagem, calcula estatísticas (min, max, mean) e gera mapa
+    com barra de cores em [-1, +1]. Os pixels ficam no tipo inteiro original;
+    a escala 0.0001 só é aplicada às estatísticas e aos rótulos da barra.
+    As estatísticas são sempre da resolução total, mesmo com `reamostragem`.
+    """
+
+    with abrir_raster(caminho_imagem) as src:
+        mascara = mascara_do_mapa(caminho_imagem, src, None, pasta_mascaras)
+        ndvi_array = ler_banda(src, (8, 6), 150, reamostragem, memoria_max_mb=memoria_max_mb)
+        etapa('leitura')
+
+        # Trata valores nodata (máscara sobre o array inteiro, sem cópia)
+        ndvi_array = _mascarar(ndvi_array, src.nodata, mascara=mascara)
+        etapa('mascara')
+
+        # Calcula estatísticas gerais (sem recorte) e percentis em uma passada
+        est = _obter_estatisticas(src, estatisticas, percentis=(pmin, pmax), mascara=mascara)
+        etapa('estatisticas')
+        if est['n_validos'] == 0:
+            raise AvisoMapa(f"Arquivo sem dados válidos: {os.path.basename(caminho_imagem)}")
+        ndvi_min = est['min'] * 0.0001
+        ndvi_max = est['max'] * 0.0001
+        ndvi_mean = est['media'] * 0.0001
+
+        # Arredondando p/ 2 casas decimais
+        ndvi_min_2dec = round(ndvi_min, 2)
+        ndvi_max_2dec = round(ndvi_max, 2)
+        ndvi_mean_2dec = round(ndvi_mean, 2)
+
+        # Percentis para realçar a variação de cor (na escala inteira do arquivo)
+        vmin_dyn = est['percentis'][pmin]
+        vmax_dyn = est['percentis'][pmax]
+
+        # Cria a figura
+        fig, ax = plt.subplots(figsize=(8, 6))
+
+        # Plota usando [vmin_dyn, vmax_dyn] p/ ganhar contraste
+        img_plot = ax.imshow(ndvi_array, cmap=cmap, vmin=vmin_dyn, vmax=vmax_dyn)
+        etapa('imshow')
+
+        # Colorbar com rótulos na escala real NDVI (ex.: 6200 -> 0.62)
+        cbar = fig.colorbar(img_plot, ax=ax, shrink=0.7)
+        cbar.formatter = FuncFormatter(lambda valor, _: f'{valor * 0.0001:.2f}')
+        cbar.update_ticks()
+        cbar.set_label('NDVI', fontsize=12)
+        etapa('colorbar')
+
+        # Título com estatísticas
+        ax.set_title(
+            f'{titulo_mapa}\n'
+            f'Min: {ndvi_min_2dec} | Max: {ndvi_max_2dec} | Mean: {ndvi_mean_2dec}',
+            fontsize=14
+        )
+
+        ax.axis('off')
+
+        etapa('anotacoes')
+
+        # Salva figura
+        nome_saida = f'{titulo_mapa}.png'
+        with destino_png(os.path.join(pasta_saida, nome_saida)) as destino:
+            plt.savefig(destino, format='png', dpi=150, bbox_inches='tight')
+        etapa('savefig')
+        plt.close(fig)
+
+    return nome_saida
+
+
+def gerar_mapa_evi(caminho_imagem, pasta_saida, cmap=evi_cmap, pmin=2, pmax=98, reamostragem=None,
+                   estatisticas=None, memoria_max_mb=None, pasta_mascaras=None):
+    """Gera mapa EVI a partir de qualquer arquivo .tif"""
+    with abrir_raster(caminho_imagem) as src:
+        mascara = mascara_do_mapa(caminho_imagem, src, None, pasta_mascaras)
+        evi = ler_banda(src, (10, 10), 300, reamostragem, memoria_max_mb=memoria_max_mb)
+        etapa('leitura')
+        evi = _mascarar(evi, src.nodata, mascara=mascara)
+        etapa('mascara')
+
+        est = _obter_estatisticas(src, estatisticas, percentis=(pmin, pmax), mascara=mascara)
+        etapa('estatisticas')
+        if est['n_validos'] == 0:
+            raise AvisoMapa(f"Arquivo sem dados válidos: {os.path.basename(caminho_imagem)}")
+
+        # Cálculo automático da escala
+        vmin = est['percentis'][pmin]
+        vmax = est['percentis'][pmax]
+
+        # Configuração do plot
+        plt.figure(figsize=(10, 10))
+        img = plt.imshow(evi, cmap=cmap, vmin=vmin, vmax=vmax)
+        etapa('imshow')
+
+        # Título baseado no nome do arquivo
+        nome_arquivo = os.path.basename(caminho_imagem)
+        plt.title(f"EVI {os.path.splitext(nome_arquivo)[0]}", fontsize=14, pad=20)
+        plt.axis('off')
+
+        # Barra de cores
+        cbar = plt.colorbar(fraction=0.046, pad=0.04)
+        cbar.set_label('Índice EVI', rotation=270, labelpad=20)
+        etapa('colorbar')
+
+        # Salvar figura
+        nome_saida = os.path.splitext(nome_arquivo)[0] + '.png'
+        with destino_png(os.path.join(pasta_saida, nome_saida)) as destino:
+            plt.savefig(destino, format='png', bbox_inches='tight', dpi=300)
+        etapa('savefig')
+        plt.close()
+
+    return nome_saida
+
+
+def gerar_mapa_lai(caminho_imagem, pasta_saida, cmap=lai_cmap, pmin=2, pmax=98, reamostragem=None,
+                   estatisticas=None, memoria_max_mb=None, pasta_mascaras=None):
+    """Gera mapa LAI a partir de arquivos .tif com tratamento de erros completo"""
+    _verificar_arquivo(caminho_imagem)
+
+    with abrir_raster(caminho_imagem) as src:
+        mascara = mascara_do_mapa(caminho_imagem, src, (0, 10), pasta_mascaras)
+        lai = ler_banda(src, (10, 10), 300, reamostragem, memoria_max_mb=memoria_max_mb)
+        etapa('leitura')
+
+        # Cria máscara para valores nodata e fora da faixa (LAI típico 0-10)
+        lai = _mascarar(lai, src.nodata, limites=(0, 10), mascara=mascara)
+        etapa('mascara')
+
+        # Estatísticas e percentis em uma passada (mesmos limites da máscara)
+        est = _obter_estatisticas(src, estatisticas, limites=(0, 10), percentis=(pmin, pmax), mascara=mascara)
+        etapa('estatisticas')
+
+        # Verifica se há dados válidos
+        if est['n_validos'] == 0:
+            raise AvisoMapa(f"Arquivo sem dados válidos: {os.path.basename(caminho_imagem)}")
+
+        # Cálculo automático da escala (com limites para LAI)
+        vmin = max(0, est['percentis'][pmin])
+        vmax = min(10, est['percentis'][pmax])
+
+        # Configuração do plot
+        fig, ax = plt.subplots(figsize=(10, 10), dpi=120)
+        img = ax.imshow(lai, cmap=cmap, vmin=vmin, vmax=vmax)
+        etapa('imshow')
+
+        # Título baseado no nome do arquivo
+        nome_arquivo = os.path.basename(caminho_imagem)
+        titulo = nome_arquivo.replace('LAI_', '').replace('_', ' ').replace('.tif', '')
+        ax.set_title(f"LAI {titulo}", fontsize=14, pad=20)
+        ax.axis('off')
+
+        # Barra de cores
+        cbar = plt.colorbar(img, fraction=0.046, pad=0.04)
+        cbar.set_label('Leaf Area Index (m²/m²)', rotation=270, labelpad=20)
+        etapa('colorbar')
+
+        _adicionar_escala(ax, src, lai.shape[1])
+
+        etapa('anotacoes')
+
+        # Salvar figura
+        nome_saida = f"LAI_{titulo.replace(' ', '_')}.png"
+        with destino_png(os.path.join(pasta_saida, nome_saida)) as destino:
+            plt.savefig(destino, format='png', bbox_inches='tight', dpi=300)
+        etapa('savefig')
+        plt.close()
+
+    return nome_saida
+
+
+def gerar_mapa_ndwi(caminho_imagem, pasta_saida, cmap=ndwi_cmap, pmin=2, pmax=98, reamostragem=None,
+                   estatisticas=None, memoria_max_mb=None, pasta_mascaras=None):
+    """Gera mapa NDWI a partir de arquivos .tif com tratamento de erros completo"""
+    _verificar_arquivo(caminho_imagem)
+
+    with abrir_raster(caminho_imagem) as src:
+        mascara = mascara_do_mapa(caminho_imagem, src, (-1, 1), pasta_mascaras)
+        ndwi = ler_banda(src, (10, 10), 300, reamostragem, memoria_max_mb=memoria_max_mb)
+        etapa('leitura')
+
+        # Cria máscara para valores nodata e fora da faixa (NDWI -1 a 1)
+        ndwi = _mascarar(ndwi, src.nodata, limites=(-1, 1), mascara=mascara)
+        etapa('mascara')
+
+        # Estatísticas e percentis em uma passada (mesmos limites da máscara)
+        est = _obter_estatisticas(src, estatisticas, limites=(-1, 1), percentis=(pmin, pmax), mascara=mascara)
+        etapa('estatisticas')
+
+        # Verifica se há dados válidos
+        if est['n_validos'] == 0:
+            raise AvisoMapa(f"Arquivo sem dados válidos: {os.path.basename(caminho_imagem)}")
+
+        # Cálculo automático da escala (com limites para NDWI)
+        vmin = max(-1, est['percentis'][pmin])
+        vmax = min(1, est['percentis'][pmax])
+
+        # Configuração do plot
+        fig, ax = plt.subplots(figsize=(10, 10), dpi=120)
+        img = ax.imshow(ndwi, cmap=cmap, vmin=vmin, vmax=vmax)
+        etapa('imshow')
+
+        # Título baseado no nome do arquivo
+        nome_arquivo = os.path.basename(caminho_imagem)
+        titulo = nome_arquivo.replace('NDWI_', '').replace('_', ' ').replace('.tif', '')
+        ax.set_title(f"NDWI {titulo}", fontsize=14, pad=20)
+        ax.axis('off')
+
+        # Barra de cores
+        cbar = plt.colorbar(img, fraction=0.046, pad=0.04)
+        cbar.set_label('Índice NDWI', rotation=270, labelpad=20)
+        etapa('colorbar')
+
+        _adicionar_escala(ax, src, ndwi.shape[1])
+
+        etapa('anotacoes')
+
+        # Salvar figura
+        nome_saida = f"NDWI_{titulo.replace(' ', '_')}.png"
+        with destino_png(os.path.join(pasta_saida, nome_saida)) as destino:
+            plt.savefig(destino, format='png', bbox_inches='tight', dpi=300)
+        etapa('savefig')
+        plt.close()
+
+    return nome_saida
+
+
+def gerar_mapa_lswi(caminho_imagem, pasta_saida, cmap=lswi_cmap, pmin=2, pmax=98, reamostragem=None,
+                   estatisticas=None, memoria_max_mb=None, pasta_mascaras=None):
+    """Gera mapa LSWI a partir de arquivos .tif com tratamento de erros completo"""
+    _verificar_arquivo(caminho_imagem)
+
+    with abrir_raster(caminho_imagem) as src:
+        mascara = mascara_do_mapa(caminho_imagem, src, (-1, 1), pasta_mascaras)
+        lswi = ler_banda(src, (10, 10), 300, reamostragem, memoria_max_mb=memoria_max_mb)
+        etapa('leitura')
+
+        # Cria máscara para valores nodata e fora da faixa (LSWI típico -1 a 1)
+        lswi = _mascarar(lswi, src.nodata, limites=(-1, 1), mascara=mascara)
+        etapa('mascara')
+
+        # Estatísticas e percentis em uma passada (mesmos limites da máscara)
+        est = _obter_estatisticas(src, estatisticas, limites=(-1, 1), percentis=(pmin, pmax), mascara=mascara)
+        etapa('estatisticas')
+
+        # Verifica se há dados válidos
+        if est['n_validos'] == 0:
+            raise AvisoMapa(f"Arquivo sem dados válidos: {os.path.basename(caminho_imagem)}")
+
+        # Cálculo automático da escala (com limites para LSWI)
+        vmin = max(-1, est['percentis'][pmin])
+        vmax = min(1, est['percentis'][pmax])
+
+        # Configuração do plot
+        fig, ax = plt.subplots(figsize=(10, 10), dpi=120)
+        img = ax.imshow(lswi, cmap=cmap, vmin=vmin, vmax=vmax)
+        etapa('imshow')
+
+        # Título baseado no nome do arquivo
+        nome_arquivo = os.path.basename(caminho_imagem)
+        titulo = nome_arquivo.replace('LSWI_', '').replace('_', ' ').replace('.tif', '')
+        ax.set_title(f"LSWI {titulo}", fontsize=14, pad=20)
+        ax.axis('off')
+
+        # Barra de cores
+        cbar = plt.colorbar(img, fraction=0.046, pad=0.04)
+        cbar.set_label('Land Surface Water Index', rotation=270, labelpad=20)
+        etapa('colorbar')
+
+        _adicionar_escala(ax, src, lswi.shape[1])
+
+        etapa('anotacoes')
+
+        # Salvar figura
+        nome_saida = f"LSWI_{titulo.replace(' ', '_')}.png"
+        with destino_png(os.path.join(pasta_saida, nome_saida)) as destino:
+            plt.savefig(destino, format='png', bbox_inches='tight', dpi=300)
+        etapa('savefig')
+        plt.close()
+
+    return nome_saida
+
+
+def gerar_mapa_vci(caminho_imagem, pasta_saida, cmap=vci_cmap, pmin=2, pmax=98, reamostragem=None,
+                   estatisticas=None, memoria_max_mb=None, pasta_mascaras=None):
+    """Gera mapa VCI a partir de arquivos .tif com tratamento de erros completo"""
+    _verificar_arquivo(caminho_imagem)
+
+    with abrir_raster(caminho_imagem) as src:
+        mascara = mascara_do_mapa(caminho_imagem, src, (0, 100), pasta_mascaras)
+        vci = ler_banda(src, (10, 10), 300, reamostragem, memoria_max_mb=memoria_max_mb)
+        etapa('leitura')
+
+        # Cria máscara para valores nodata e fora da faixa (VCI típico 0-100)
+        vci = _mascarar(vci, src.nodata, limites=(0, 100), mascara=mascara)
+        etapa('mascara')
+
+        # Estatísticas e percentis em uma passada (mesmos limites da máscara)
+        est = _obter_estatisticas(src, estatisticas, limites=(0, 100), percentis=(pmin, pmax),
+                                  mascara=mascara)
+        etapa('estatisticas')
+
+        # Verifica se há dados válidos
+        if est['n_validos'] == 0:
+            raise AvisoMapa(f"Arquivo sem dados válidos: {os.path.basename(caminho_imagem)}")
+
+        # Cálculo automático da escala (com limites para VCI)
+        vmin = max(0, est['percentis'][pmin])
+        vmax = min(100, est['percentis'][pmax])
+
+        # Configuração do plot
+        fig, ax = plt.subplots(figsize=(10, 10), dpi=120)
+        img = ax.imshow(vci, cmap=cmap, vmin=vmin, vmax=vmax)
+        etapa('imshow')
+
+        # Título baseado no nome do arquivo
+        nome_arquivo = os.path.basename(caminho_imagem)
+        titulo = nome_arquivo.replace('VCI_', '').replace('_', ' ').replace('.tif', '')
+        ax.set_title(f"VCI {titulo}", fontsize=14, pad=20)
+        ax.axis('off')
+
+        # Barra de cores
+        cbar = plt.colorbar(img, fraction=0.046, pad=0.04)
+        cbar.set_label('Vegetation Condition Index (%)', rotation=270, labelpad=20)
+        etapa('colorbar')
+
+        _adicionar_escala(ax, src, vci.shape[1])
+
+        # Adiciona linhas de referência para interpretação
+        ax.text(0.02, 0.95, "Legenda:", transform=ax.transAxes, fontsize=10,
+                bbox=dict(facecolor='white', alpha=0.7))
+        ax.text(0.02, 0.90, ">80% - Condição excelente", transform=ax.transAxes, fontsize=10,
+                bbox=dict(facecolor='white', alpha=0.7))
+        ax.text(0.02, 0.85, "40-80% - Condição normal", transform=ax.transAxes, fontsize=10,
+                bbox=dict(facecolor='white', alpha=0.7))
+        ax.text(0.02, 0.80, "<40% - Estresse vegetativo", transform=ax.transAxes, fontsize=10,
+                bbox=dict(facecolor='white', alpha=0.7))
+
+        etapa('anotacoes')
+
+        # Salvar figura
+        nome_saida = f"VCI_{titulo.replace(' ', '_')}.png"
+        with destino_png(os.path.join(pasta_saida, nome_saida)) as destino:
+            plt.savefig(destino, format='png', bbox_inches='tight', dpi=300)
+        etapa('savefig')
+        plt.close()
+
+    return nome_saida
+
+
+def gerar_mapa_ndvi_por_nome(caminho_imagem, pasta_saida, cmap='viridis', reamostragem=None,
+                             estatisticas=None, memoria_max_mb=None, pasta_mascaras=None, pmin=None, pmax=None):
+    """
+    Monta o título a partir do nome do arquivo (ex: NDVI_Seco_Area1_2010.tif) e gera o mapa NDVI.
+    Com `pmin`/`pmax`, a escala de cores vai desses percentis (ex.: a escala comum da série).
+    """
+    arq = os.path.basename(caminho_imagem)
+    campos = interpretar_nome(arq)
+    if campos is None or campos['indice'] != 'NDVI':
+        raise AvisoMapa(f"Nome de arquivo fora do padrão: {arq}")
+
+    # campos -> {'indice': 'NDVI', 'periodo': 'Seco', 'area': 'Area1', 'ano': 2010}
+    titulo_map = f"{campos['indice']} {campos['periodo']} {campos['ano']} ({campos['area']})"
+    return gerar_mapa_ndvi(caminho_imagem, titulo_map, pasta_saida, cmap=cmap, reamostragem=reamostragem,
+                           estatisticas=estatisticas, memoria_max_mb=memoria_max_mb,
+                           pasta_mascaras=pasta_mascaras,
+                           percentis=None if pmin is None and pmax is None
+                           else (2 if pmin is None else pmin, 98 if pmax is None else pmax))
+
+
+def gerar_mapa_mudanca(caminho_imagem, pasta_saida, cmap=mudanca_cmap, pmin=2, pmax=98, reamostragem=None,
+                       estatisticas=None, memoria_max_mb=None, pasta_mascaras=None):
+    """
+    Gera o mapa de um produto de ``tese_g.mudancas`` (DELTA ou ANOMALIA) com
+    paleta divergente centrada em zero: a escala vai de -m a +m, com m o
+    maior valor absoluto entre os percentis `pmin` e `pmax`.
+    """
+    _verificar_arquivo(caminho_imagem)
+    campos = interpretar_mudanca(caminho_imagem)
+    if campos is None:
+        raise AvisoMapa(f"Nome de arquivo fora do padrão: {os.path.basename(caminho_imagem)}")
+    limites = LIMITES_VALIDOS[campos['produto']]
+
+    with abrir_raster(caminho_imagem) as src:
+        mascara = mascara_do_mapa(caminho_imagem, src, limites, pasta_mascaras)
+        dados = ler_banda(src, (10, 10), 300, reamostragem, memoria_max_mb=memoria_max_mb)
+        etapa('leitura')
+        dados = _mascarar(dados, src.nodata, limites=limites, mascara=mascara)
+        etapa('mascara')
+
+        est = _obter_estatisticas(src, estatisticas, limites=limites, percentis=(pmin, pmax), mascara=mascara)
+        etapa('estatisticas')
+        if est['n_validos'] == 0:
+            raise AvisoMapa(f"Arquivo sem dados válidos: {os.path.basename(caminho_imagem)}")
+
+        # Escala simétrica: zero (sem mudança) fica no centro da paleta
+        limite = max(abs(est['percentis'][pmin]), abs(est['percentis'][pmax])) or 1.0
+
+        fig, ax = plt.subplots(figsize=(10, 10))
+        img = ax.imshow(dados, cmap=cmap, vmin=-limite, vmax=limite)
+        etapa('imshow')
+
+        ax.set_title(f"{titulo_mudanca(campos)}\n"
+                     f"Min: {round(est['min'], 2)} | Max: {round(est['max'], 2)} | Mean: {round(est['media'], 2)}",
+                     fontsize=14, pad=20)
+        ax.axis('off')
+
+        cbar = plt.colorbar(img, fraction=0.046, pad=0.04)
+        rotulo = f"Δ{campos['indice']}" if campos['produto'] == 'DELTA' else 'z-score (desvios padrão)'
+        cbar.set_label(rotulo, rotation=270, labelpad=20)
+        etapa('colorbar')
+
+        _adicionar_escala(ax, src, dados.shape[1])
+        etapa('anotacoes')
+
+        nome_saida = os.path.splitext(os.path.basename(caminho_imagem))[0] + '.png'
+        with destino_png(os.path.join(pasta_saida, nome_saida)) as destino:
+            plt.savefig(destino, format='png', bbox_inches='tight', dpi=300)
+        etapa('savefig')
+        plt.close(fig)
+
+    return nome_saida
+
+
+# Função de mapa usada por cada tipo de índice no processamento em lote
+RENDERIZADORES = {
+    'ndvi': gerar_mapa_ndvi_por_nome,
+    'evi': gerar_mapa_evi,
+    'lai': gerar_mapa_lai,
+    'ndwi': gerar_mapa_ndwi,
+    'lswi': gerar_mapa_lswi,
+    'vci': gerar_mapa_vci,
+    'delta': gerar_mapa_mudanca,      # produtos de tese_g.mudancas
+    'anomalia': gerar_mapa_mudanca,
+}
@@ -0,0 +1,147 @@
+"""
+Máscaras de validade compactadas (1 bit por pixel), guardadas como os esboços.
+
+A máscara de um raster (nodata, NaN e faixa física do índice, como em
+``mascara_validos``) é calculada uma vez, bloco a bloco, e gravada em
+``.npz`` com os bits de cada janela de ``janelas_blocos`` (``np.packbits``)
+e a contagem de pixels válidos por janela. As passadas seguintes sobre o
+mesmo arquivo usam as contagens para pular as janelas vazias sem lê-las e
+para dispensar a máscara nas janelas cheias; só as janelas parciais
+desempacotam os bits. Em exportações grandes e quase todas sem dado, isso
+corta leituras e comparações repetidas, com 1/8 da memória de uma máscara
+booleana.
+
+O arquivo guarda o tamanho e a data do GeoTIFF de origem e os limites
+usados; se algum mudar, a máscara é recalculada.
+"""
+
+import json
+import os
+
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+from . import AvisoMapa
+from .estatisticas import janelas_blocos, mascara_validos
+from .manifesto import assinatura_entrada
+from .medicao import contar_leitura
+
+
+class MascaraValidos:
+    """Máscara de validade de um raster, em bits por janela, com a contagem de válidos de cada janela."""
+
+    def __init__(self, forma, janelas, contagens, bits, inicios, limites=None):
+        self.forma = tuple(forma)
+        self.janelas = np.asarray(janelas, dtype=np.int64)     # (n, 4): linha, coluna, altura, largura
+        self.contagens = np.asarray(contagens, dtype=np.int64)
+        self.bits = bits
+        self.inicios = np.asarray(inicios, dtype=np.int64)     # posição dos bits de cada janela em `bits`
+        self.limites = None if limites is None else tuple(limites)
+
+    @property
+    def n_validos(self):
+        return int(self.contagens.sum())
+
+    @property
+    def tamanhos(self):
+        return self.janelas[:, 2] * self.janelas[:, 3]
+
+    @property
+    def cheia(self):
+        """True quando todos os pixels do raster são válidos."""
+        return bool((self.contagens == self.tamanhos).all())
+
+    def blocos(self):
+        """Percorre (janela, estado) com estado 'vazio', 'cheio' ou 'parcial'."""
+        for (linha, coluna, altura, largura), n in zip(self.janelas.tolist(), self.contagens.tolist()):
+            estado = 'vazio' if n == 0 else 'cheio' if n == altura * largura else 'parcial'
+            yield Window(coluna, linha, largura, altura), estado
+
+    def bloco(self, i):
+        """Máscara booleana (altura, largura) da janela `i` (True = válido)."""
+        _, _, altura, largura = self.janelas[i].tolist()
+        pacote = self.bits[self.inicios[i]:self.inicios[i + 1]]
+        return np.unpackbits(pacote, count=altura * largura).view(bool).reshape(altura, largura)
+
+    def completa(self):
+        """Máscara booleana do raster inteiro, montada janela a janela."""
+        validos = np.zeros(self.forma, dtype=bool)
+        for i, (janela, estado) in enumerate(self.blocos()):
+            if estado == 'vazio':
+                continue
+            linhas, colunas = janela.toslices()
+            validos[linhas, colunas] = True if estado == 'cheio' else self.bloco(i)
+        return validos
+
+    def salvar(self, caminho, origem=None):
+        """Grava a máscara em .npz (com a assinatura do GeoTIFF de `origem`, se houver)."""
+        meta = {'forma': self.forma, 'limites': self.limites, 'origem': origem}
+        temporario = caminho + '.tmp.npz'
+        np.savez_compressed(temporario, janelas=self.janelas, contagens=self.contagens, bits=self.bits,
+                            inicios=self.inicios, meta=json.dumps(meta))
+        os.replace(temporario, caminho)
+
+    @classmethod
+    def carregar(cls, caminho):
+        """Lê uma máscara gravada por ``salvar``: (máscara, assinatura da origem)."""
+        with np.load(caminho) as dados:
+            meta = json.loads(str(dados['meta']))
+            mascara = cls(meta['forma'], dados['janelas'], dados['contagens'], dados['bits'],
+                          dados['inicios'], meta['limites'])
+        return mascara, meta['origem']
+
+
+def calcular_mascara(src, limites=None, banda=1):
+    """Máscara de validade do raster aberto `src` em uma passada pelas janelas de ``janelas_blocos``."""
+    janelas, contagens, pacotes = [], [], []
+    for janela in janelas_blocos(src, banda):
+        bloco = src.read(banda, window=janela)
+        contar_leitura(bloco)
+        validos = mascara_validos(bloco, src.nodatavals[banda - 1], limites)
+        janelas.append((janela.row_off, janela.col_off, janela.height, janela.width))
+        contagens.append(int(np.count_nonzero(validos)))
+        pacotes.append(np.packbits(validos))
+    inicios = np.concatenate([[0], np.cumsum([pacote.size for pacote in pacotes])])
+    bits = np.concatenate(pacotes) if pacotes else np.zeros(0, dtype=np.uint8)
+    return MascaraValidos((src.height, src.width), janelas, contagens, bits, inicios, limites)
+
+
+def mascara_raster(caminho, limites=None, pasta_mascaras=None, src=None):
+    """
+    Máscara de validade do GeoTIFF: a gravada em `pasta_mascaras` quando
+    ainda corresponde ao arquivo e aos `limites`, ou calculada (a partir de
+    `src`, se já estiver aberto) e gravada lá. Sem `pasta_mascaras`, só calcula.
+    """
+    limites = None if limites is None else tuple(limites)
+    caminho_mascara = None
+    if pasta_mascaras is not None:
+        nome = os.path.splitext(os.path.basename(caminho))[0] + '.mascara.npz'
+        caminho_mascara = os.path.join(pasta_mascaras, nome)
+        if os.path.exists(caminho_mascara):
+            mascara, origem = MascaraValidos.carregar(caminho_mascara)
+            if origem == assinatura_entrada(caminho) and mascara.limites == limites:
+                return mascara
+
+    if src is None:
+        with rasterio.open(caminho) as dataset:
+            mascara = calcular_mascara(dataset, limites)
+    else:
+        mascara = calcular_mascara(src, limites)
+    if caminho_mascara is not None:
+        os.makedirs(pasta_mascaras, exist_ok=True)
+        mascara.salvar(caminho_mascara, assinatura_entrada(caminho))
+    return mascara
+
+
+def mascara_do_mapa(caminho, src, limites, pasta_mascaras):
+    """
+    Máscara em cache para as funções de mapa (None sem `pasta_mascaras`).
+    Arquivo sem pixel válido levanta ``AvisoMapa`` antes de qualquer leitura da banda.
+    """
+    if pasta_mascaras is None:
+        return None
+    mascara = mascara_raster(caminho, limites, pasta_mascaras, src=src)
+    if mascara.n_validos == 0:
+        raise AvisoMapa(f"Arquivo sem dados válidos: {os.path.basename(caminho)}")
+    return mascara
@@ -0,0 +1,137 @@
+"""
+Medição por etapa dos renderizadores e log estruturado da execução.
+
+Enquanto um arquivo é processado (``medir``), os renderizadores marcam o
+fim de cada etapa com ``etapa('leitura')``, ``etapa('savefig')`` etc.: o
+tempo desde a marca anterior (``time.perf_counter``) é somado na etapa.
+Fora de uma medição as marcas não fazem nada. As leituras de pixels
+(``contar_leitura``) somam bytes e pixels, e o pico de memória do processo
+é zerado no início de cada arquivo quando o sistema permite
+(``/proc/self/clear_refs`` no Linux).
+
+Cada arquivo vira uma linha JSON no log da execução (``escrever_log``) e
+``resumo_etapas`` dá p50/p95 por etapa e os arquivos mais lentos.
+"""
+
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+NOME_LOG = 'log_execucao.jsonl'
+
+# Medição em andamento de cada thread (as threads de leitura do pipeline não se misturam)
+_local = threading.local()
+
+
+class Medicao:
+    """Tempos por etapa, bytes e pixels lidos de um arquivo."""
+
+    def __init__(self):
+        self.etapas = {}
+        self.bytes_lidos = 0
+        self.pixels_lidos = 0
+        self.inicio = time.perf_counter()
+        self.marca = self.inicio
+        self.tempo_total = None
+
+    def registro(self):
+        """Dicionário serializável em JSON com a medição."""
+        return {
+            'tempo_total': round(self.tempo_total, 6),
+            'etapas': {nome: round(t, 6) for nome, t in self.etapas.items()},
+            'bytes_lidos': self.bytes_lidos,
+            'pixels_lidos': self.pixels_lidos,
+            'pico_memoria_mb': round(pico_memoria_mb(), 1),
+        }
+
+
+def _atual():
+    return getattr(_local, 'medicao', None)
+
+
+def etapa(nome):
+    """Soma na etapa `nome` o tempo desde a marca anterior da medição atual."""
+    medicao = _atual()
+    if medicao is None:
+        return
+    agora = time.perf_counter()
+    medicao.etapas[nome] = medicao.etapas.get(nome, 0.0) + agora - medicao.marca
+    medicao.marca = agora
+
+
+def contar_leitura(array):
+    """Soma os bytes e pixels de um array lido do disco na medição atual."""
+    medicao = _atual()
+    if medicao is not None:
+        medicao.bytes_lidos += array.nbytes
+        medicao.pixels_lidos += array.size
+
+
+def _zerar_pico():
+    """Zera o pico de memória (VmHWM) do processo, se o sistema permitir."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def pico_memoria_mb():
+    """Pico de memória residente do processo em MB."""
+    try:
+        with open('/proc/self/status') as f:
+            for linha in f:
+                if linha.startswith('VmHWM:'):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em bytes no macOS e em KB no Linux
+    return pico / 2 ** 20 if sys.platform == 'darwin' else pico / 1024
+
+
+@contextmanager
+def medir():
+    """Mede o bloco como o processamento de um arquivo."""
+    _zerar_pico()
+    anterior = _atual()
+    medicao = _local.medicao = Medicao()
+    try:
+        yield medicao
+    finally:
+        medicao.tempo_total = time.perf_counter() - medicao.inicio
+        _local.medicao = anterior
+
+
+def escrever_log(caminho_log, resultados, **contexto):
+    """Acrescenta ao log uma linha JSON por resultado, com os campos de `contexto`."""
+    with open(caminho_log, 'a', encoding='utf-8') as f:
+        for r in resultados:
+            f.write(json.dumps({**contexto, **r}, ensure_ascii=False) + '\n')
+
+
+def resumo_etapas(resultados):
+    """
+    {etapa: (p50, p95)} dos tempos por arquivo (inclui 'total'), só dos
+    resultados que têm medição.
+    """
+    import numpy as np
+
+    tempos = {}
+    for r in resultados:
+        medicao = r.get('medicao')
+        if not medicao:
+            continue
+        for nome, t in medicao['etapas'].items():
+            tempos.setdefault(nome, []).append(t)
+        tempos.setdefault('total', []).append(medicao['tempo_total'])
+    return {nome: tuple(np.percentile(valores, (50, 95))) for nome, valores in tempos.items()}
+
+
+def mais_lentos(resultados, n=5):
+    """Os `n` resultados com maior tempo total."""
+    medidos = [r for r in resultados if r.get('medicao')]
+    return sorted(medidos, key=lambda r: r['medicao']['tempo_total'], reverse=True)[:n]
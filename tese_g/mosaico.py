@@ -0,0 +1,246 @@
+"""
+Mosaico virtual das áreas de um índice, período e ano.
+
+As áreas (``Area1``, ``Area2``, ...) são exportadas em GeoTIFFs separados.
+Em vez de copiar os pixels para um mosaico, ``indexar_mosaicos`` grava um
+índice JSON leve por índice/período/ano (``MOSAICO_<INDICE>_<Periodo>_<ANO>.json``)
+com a pegada (limites, transformação, tamanho, nodata) de cada arquivo,
+como um VRT. Leituras de uma caixa (``bbox``) abrem só os arquivos que a
+cruzam e leem só a janela da interseção; pedindo uma largura máxima
+(``largura_max``), a leitura já sai reduzida e o GDAL usa as overviews
+dos GeoTIFFs (ver ``tese_g.cog``), então o mapa do estado inteiro custa
+mais ou menos a leitura das overviews, não a das áreas em resolução total.
+
+Todas as áreas de um mosaico precisam estar no mesmo CRS e com o norte
+para cima; onde áreas se sobrepõem vale o primeiro arquivo (em ordem de
+área) com dado válido.
+"""
+
+import json
+import math
+import os
+
+import numpy as np
+import rasterio
+from affine import Affine
+
+from .estatisticas import LIMITES_VALIDOS, MAX_PIXELS_JANELA, mascara_validos
+from .histogramas import Esboco
+from .lote import listar_tifs
+from .medicao import contar_leitura
+from .nomes import interpretar_nome
+
+# Tolerância (em pixels) para arredondar limites que caem quase na borda de um pixel
+_TOLERANCIA = 1e-6
+
+
+def _pegada(caminho, campos):
+    """Entrada do índice do mosaico para um GeoTIFF."""
+    with rasterio.open(caminho) as src:
+        if src.transform.b != 0 or src.transform.d != 0 or src.transform.e >= 0:
+            raise ValueError(f"Só rasters com o norte para cima: {os.path.basename(caminho)}")
+        return {
+            'caminho': os.path.abspath(caminho),
+            'area': campos['area'],
+            'crs': src.crs.to_string() if src.crs else None,
+            'limites': list(src.bounds),
+            'transform': list(src.transform)[:6],
+            'largura': src.width,
+            'altura': src.height,
+            'dtype': src.dtypes[0],
+            'nodata': src.nodata,
+            'overviews': src.overviews(1),
+        }
+
+
+def indexar_mosaicos(pastas, pasta_saida):
+    """
+    Grava um índice de mosaico por (índice, período, ano) encontrado nas
+    pastas (uma pasta ou uma lista). Nenhum pixel é lido. Retorna os
+    caminhos dos JSON gravados.
+    """
+    if isinstance(pastas, str):
+        pastas = [pastas]
+    grupos = {}
+    for pasta in pastas:
+        for caminho in listar_tifs(pasta):
+            campos = interpretar_nome(caminho)
+            if campos is not None:
+                chave = (campos['indice'], campos['periodo'], campos['ano'])
+                grupos.setdefault(chave, []).append(_pegada(caminho, campos))
+
+    os.makedirs(pasta_saida, exist_ok=True)
+    gravados = []
+    for (indice, periodo, ano), blocos in sorted(grupos.items()):
+        crs = {bloco['crs'] for bloco in blocos}
+        if len(crs) > 1:
+            raise ValueError(f"Áreas de {indice} {periodo} {ano} em CRS diferentes: {sorted(map(str, crs))}")
+        blocos.sort(key=lambda bloco: (len(bloco['area']), bloco['area']))
+        mosaico = {
+            'indice': indice,
+            'periodo': periodo,
+            'ano': ano,
+            'crs': blocos[0]['crs'],
+            'limites': [min(b['limites'][0] for b in blocos), min(b['limites'][1] for b in blocos),
+                        max(b['limites'][2] for b in blocos), max(b['limites'][3] for b in blocos)],
+            'resolucao': min(b['transform'][0] for b in blocos),
+            'blocos': blocos,
+        }
+        caminho = os.path.join(pasta_saida, f'MOSAICO_{indice}_{periodo}_{ano}.json')
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump(mosaico, f, indent=1)
+        gravados.append(caminho)
+    return gravados
+
+
+def carregar_mosaico(mosaico):
+    """O índice do mosaico a partir do caminho do JSON (ou ele mesmo, se já for um dicionário)."""
+    if isinstance(mosaico, dict):
+        return mosaico
+    with open(mosaico, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _intersecao(a, b):
+    """Interseção de dois limites (xmin, ymin, xmax, ymax), ou None se não se cruzam."""
+    xmin, ymin = max(a[0], b[0]), max(a[1], b[1])
+    xmax, ymax = min(a[2], b[2]), min(a[3], b[3])
+    if xmin >= xmax or ymin >= ymax:
+        return None
+    return xmin, ymin, xmax, ymax
+
+
+def _janela_pixels(bloco, limites):
+    """(linha0, linha1, coluna0, coluna1) do arquivo que cobrem `limites`, dentro do raster."""
+    t = Affine(*bloco['transform'])
+    coluna0 = math.floor((limites[0] - t.c) / t.a + _TOLERANCIA)
+    coluna1 = math.ceil((limites[2] - t.c) / t.a - _TOLERANCIA)
+    linha0 = math.floor((limites[3] - t.f) / t.e + _TOLERANCIA)
+    linha1 = math.ceil((limites[1] - t.f) / t.e - _TOLERANCIA)
+    return (max(0, linha0), min(bloco['altura'], linha1),
+            max(0, coluna0), min(bloco['largura'], coluna1))
+
+
+def _cruzamentos(mosaico, bbox):
+    """[(bloco, (linha0, linha1, coluna0, coluna1))] dos arquivos que cruzam `bbox`."""
+    resultado = []
+    for bloco in mosaico['blocos']:
+        inter = _intersecao(bloco['limites'], bbox)
+        if inter is None:
+            continue
+        linha0, linha1, coluna0, coluna1 = _janela_pixels(bloco, inter)
+        if linha1 > linha0 and coluna1 > coluna0:
+            resultado.append((bloco, (linha0, linha1, coluna0, coluna1)))
+    return resultado
+
+
+def ler_mosaico(mosaico, bbox=None, largura_max=None, reamostragem='average'):
+    """
+    Lê o mosaico na caixa `bbox` (xmin, ymin, xmax, ymax no CRS do mosaico;
+    padrão: tudo). Sem `largura_max` a leitura é na resolução mais fina das
+    áreas; com ela, reduzida para no máximo `largura_max` colunas (usando as
+    overviews). Retorna (valores float32 nas unidades do arquivo com NaN
+    onde não há dado, transformação da grade de saída).
+    """
+    from rasterio.enums import Resampling
+    from rasterio.windows import Window
+
+    mosaico = carregar_mosaico(mosaico)
+    bbox = tuple(bbox or mosaico['limites'])
+    resolucao = mosaico['resolucao']
+    if largura_max:
+        resolucao = max(resolucao, (bbox[2] - bbox[0]) / largura_max)
+    largura = max(1, math.ceil((bbox[2] - bbox[0]) / resolucao - _TOLERANCIA))
+    altura = max(1, math.ceil((bbox[3] - bbox[1]) / resolucao - _TOLERANCIA))
+    transform = Affine(resolucao, 0, bbox[0], 0, -resolucao, bbox[3])
+    valores = np.full((altura, largura), np.nan, dtype=np.float32)
+    limites_indice = LIMITES_VALIDOS.get(mosaico['indice'])
+
+    for bloco, (linha0, linha1, coluna0, coluna1) in _cruzamentos(mosaico, bbox):
+        t = Affine(*bloco['transform'])
+        # Posição da janela do arquivo na grade de saída
+        x0, y0 = t * (coluna0, linha0)
+        x1, y1 = t * (coluna1, linha1)
+        c0 = max(0, int(round((x0 - bbox[0]) / resolucao)))
+        c1 = min(largura, int(round((x1 - bbox[0]) / resolucao)))
+        l0 = max(0, int(round((bbox[3] - y0) / resolucao)))
+        l1 = min(altura, int(round((bbox[3] - y1) / resolucao)))
+        if c1 <= c0 or l1 <= l0:
+            continue
+        with rasterio.open(bloco['caminho']) as src:
+            lido = src.read(1, window=Window(coluna0, linha0, coluna1 - coluna0, linha1 - linha0),
+                            out_shape=(l1 - l0, c1 - c0), resampling=Resampling[reamostragem])
+        contar_leitura(lido)
+        destino = valores[l0:l1, c0:c1]
+        preencher = np.isnan(destino) & mascara_validos(lido, bloco['nodata'], limites_indice)
+        destino[preencher] = lido[preencher]
+    return valores, transform
+
+
+def estatisticas_mosaico(mosaico, bbox=None, percentis=(2, 98)):
+    """
+    Estatísticas (formato de ``estatisticas_raster``) dos pixels válidos do
+    mosaico na caixa `bbox`, em resolução total: lê só as janelas dos
+    arquivos que cruzam a caixa, em faixas de linhas. Pixels de áreas
+    sobrepostas entram uma vez por arquivo.
+    """
+    from rasterio.windows import Window
+
+    mosaico = carregar_mosaico(mosaico)
+    bbox = tuple(bbox or mosaico['limites'])
+    limites_indice = LIMITES_VALIDOS.get(mosaico['indice'])
+    esboco = None
+    for bloco, (linha0, linha1, coluna0, coluna1) in _cruzamentos(mosaico, bbox):
+        if esboco is None:
+            esboco = Esboco(mosaico['indice'], bloco['dtype'])
+        linhas_por_faixa = max(1, MAX_PIXELS_JANELA // (coluna1 - coluna0))
+        with rasterio.open(bloco['caminho']) as src:
+            for linha in range(linha0, linha1, linhas_por_faixa):
+                janela = Window(coluna0, linha, coluna1 - coluna0, min(linhas_por_faixa, linha1 - linha))
+                faixa = src.read(1, window=janela)
+                contar_leitura(faixa)
+                esboco.adicionar(faixa[mascara_validos(faixa, src.nodata, limites_indice)])
+    if esboco is None:
+        return {'n_validos': 0, 'min': None, 'max': None, 'media': None, 'percentis': {p: None for p in percentis}}
+    return esboco.estatisticas(percentis)
+
+
+def gerar_mapa_regional(mosaico, pasta_saida, bbox=None, largura_max=1500, cmap=None, pmin=2, pmax=98,
+                        reamostragem='average', nome_saida=None):
+    """
+    Quicklook PNG (ver ``tese_g.rapido``) do mosaico na caixa `bbox`, lido
+    já reduzido a `largura_max` colunas. Cores e min/max/média do título
+    vêm da própria leitura reduzida, sem passar pela resolução total.
+    Retorna o nome do PNG (padrão: ``<INDICE>_<Periodo>_<ANO>_regional.png``).
+    """
+    from . import AvisoMapa
+    from .paletas import PALETAS, obter_paleta
+    from .rapido import colorir, montar_quicklook, tabela_cores
+
+    mosaico = carregar_mosaico(mosaico)
+    indice = mosaico['indice']
+    valores, _ = ler_mosaico(mosaico, bbox, largura_max, reamostragem)
+    validos = ~np.isnan(valores)
+    if not validos.any():
+        raise AvisoMapa(f"Mosaico sem dados válidos na caixa: {indice} {mosaico['periodo']} {mosaico['ano']}")
+
+    vmin, vmax = np.percentile(valores[validos], (pmin, pmax))
+    limites = LIMITES_VALIDOS.get(indice)
+    if limites is not None:
+        vmin, vmax = max(limites[0], vmin), min(limites[1], vmax)
+    paleta = obter_paleta(cmap if cmap is not None else PALETAS[indice])
+    inteiro = np.issubdtype(np.dtype(mosaico['blocos'][0]['dtype']), np.integer)
+    escala = 0.0001 if indice == 'NDVI' and inteiro else 1.0
+
+    rgba = colorir(valores, validos, vmin, vmax, tabela_cores(paleta))
+    areas = ', '.join(bloco['area'] for bloco in mosaico['blocos'])
+    subtitulo = (f"Min: {round(float(valores[validos].min()) * escala, 2)}"
+                 f" | Max: {round(float(valores[validos].max()) * escala, 2)}"
+                 f" | Mean: {round(float(valores[validos].mean()) * escala, 2)}")
+    imagem = montar_quicklook(rgba, f"{indice} {mosaico['periodo']} {mosaico['ano']} ({areas})", subtitulo,
+                              paleta.name, vmin * escala, vmax * escala, indice)
+
+    os.makedirs(pasta_saida, exist_ok=True)
+    nome_saida = nome_saida or f"{indice}_{mosaico['periodo']}_{mosaico['ano']}_regional.png"
+    imagem.save(os.path.join(pasta_saida, nome_saida), compress_level=3)
+    return nome_saida
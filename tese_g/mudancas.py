@@ -0,0 +1,172 @@
+"""
+Produtos de detecção de mudança entre períodos e anos.
+
+Para cada índice (NDVI, EVI, NDWI, LSWI) e área:
+
+- ``DELTA_<INDICE>_Umido-Seco_<AreaN>_<ANO>.tif``: Umido menos Seco do mesmo ano;
+- ``DELTA_<INDICE>_<Periodo>_<AreaN>_<ANO1>-<ANO2>.tif``: ano seguinte menos
+  o anterior, para anos consecutivos do mesmo período;
+- ``ANOMALIA_<INDICE>_<Periodo>_<AreaN>_<ANO>.tif``: z-score de cada pixel em
+  relação à média e ao desvio padrão de todos os anos do período.
+
+Os valores ficam na unidade do índice (o NDVI inteiro x 10.000 volta para
+-1..1). Cada raster é alinhado à grade do primeiro da comparação (um
+``WarpedVRT`` quando a grade difere) e todos são lidos nas mesmas janelas,
+então nunca há duas cenas inteiras na memória. As diferenças vão para
+``DELTA/`` e as anomalias para ``ANOMALIA/`` na pasta de saída, prontas
+para ``processar_lote(..., 'delta')`` e ``'anomalia'``, que desenham com
+uma paleta divergente centrada em zero.
+"""
+
+import os
+from contextlib import ExitStack
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.vrt import WarpedVRT
+
+from .cog import perfil_saida
+from .cubo import agrupar_series, nodata_padrao
+from .estatisticas import MAX_PIXELS_JANELA, janelas_blocos, mascara_validos
+from .nomes import montar_nome_mudanca
+
+INDICES_MUDANCA = ('NDVI', 'EVI', 'NDWI', 'LSWI')
+PRODUTOS = ('estacao', 'anual', 'anomalia')
+NODATA_MUDANCA = -9999.0
+
+# Anos necessários em um período para a anomalia ter sentido (média e desvio da série)
+ANOS_MINIMOS_ANOMALIA = 3
+
+
+def _abrir_alinhado(pilha, caminho, ref=None):
+    """
+    Abre `caminho` dentro da `pilha` (ExitStack); se a grade for diferente
+    da de `ref`, devolve um WarpedVRT na grade de `ref` (vizinho mais próximo).
+    """
+    src = pilha.enter_context(rasterio.open(caminho))
+    if ref is None or (src.crs, src.transform, src.width, src.height) == \
+            (ref.crs, ref.transform, ref.width, ref.height):
+        return src
+    nodata = nodata_padrao(np.dtype(src.dtypes[0]), src.nodata)
+    return pilha.enter_context(WarpedVRT(src, crs=ref.crs, transform=ref.transform, width=ref.width,
+                                         height=ref.height, resampling=Resampling.nearest, nodata=nodata))
+
+
+def _ler(src, janela, indice):
+    """Janela em float32 na unidade do índice, com NaN nos pixels inválidos."""
+    bloco = src.read(1, window=janela)
+    validos = mascara_validos(bloco, src.nodata)
+    escalado = indice == 'NDVI' and np.issubdtype(bloco.dtype, np.integer)
+    bloco = bloco.astype(np.float32)
+    if escalado:
+        bloco *= 0.0001
+    bloco[~validos] = np.nan
+    return bloco
+
+
+def _gravar(dst, janela, valores):
+    """Grava a janela em float32 com o nodata no lugar de NaN."""
+    dst.write(np.where(np.isnan(valores), NODATA_MUDANCA, valores).astype(np.float32), 1, window=janela)
+
+
+def diferenca(caminho_antes, caminho_depois, destino, indice):
+    """
+    Grava em `destino` a diferença depois - antes, na grade de `caminho_antes`.
+    Pixels sem dado em qualquer um dos dois ficam como nodata.
+    """
+    with ExitStack() as pilha:
+        antes = _abrir_alinhado(pilha, caminho_antes)
+        depois = _abrir_alinhado(pilha, caminho_depois, antes)
+        with rasterio.open(destino, 'w', **perfil_saida(antes, 'float32', NODATA_MUDANCA)) as dst:
+            for janela in janelas_blocos(antes, max_pixels=MAX_PIXELS_JANELA // 2):
+                _gravar(dst, janela, _ler(depois, janela, indice) - _ler(antes, janela, indice))
+    return destino
+
+
+def anomalias(serie, pasta_saida, indice):
+    """
+    Grava o z-score de cada ano de uma série [(campos, caminho), ...] de um
+    período e uma área: (valor - média) / desvio padrão (amostral) do pixel
+    em todos os anos. Pixels com menos de dois anos válidos ou sem variação
+    ficam como nodata. Retorna os caminhos gravados.
+    """
+    saidas = [
+        os.path.join(pasta_saida, montar_nome_mudanca('ANOMALIA', indice, campos['periodo'],
+                                                      campos['area'], campos['ano']))
+        for campos, _ in serie
+    ]
+    with ExitStack() as pilha:
+        ref = _abrir_alinhado(pilha, serie[0][1])
+        fontes = [ref] + [_abrir_alinhado(pilha, caminho, ref) for _, caminho in serie[1:]]
+        perfil = perfil_saida(ref, 'float32', NODATA_MUDANCA)
+        destinos = [pilha.enter_context(rasterio.open(saida, 'w', **perfil)) for saida in saidas]
+
+        # A pilha de uma janela tem um plano por ano
+        max_pixels = max(1, MAX_PIXELS_JANELA // len(fontes))
+        for janela in janelas_blocos(ref, max_pixels=max_pixels):
+            valores = np.stack([_ler(src, janela, indice) for src in fontes])
+            validos = ~np.isnan(valores)
+            n = validos.sum(axis=0)
+            media = np.where(validos, valores, 0).sum(axis=0) / np.maximum(n, 1)
+            desvios = np.where(validos, valores - media, 0)
+            desvio_padrao = np.sqrt((desvios ** 2).sum(axis=0) / np.maximum(n - 1, 1))
+            calculavel = (n >= 2) & (desvio_padrao > 0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                z = np.where(calculavel, desvios / desvio_padrao, np.nan)
+            z[~validos] = np.nan
+            for plano, dst in zip(z, destinos):
+                _gravar(dst, janela, plano)
+    return saidas
+
+
+def calcular_mudancas(pastas, pasta_saida, indices=INDICES_MUDANCA, produtos=PRODUTOS):
+    """
+    Calcula os produtos de mudança dos GeoTIFFs das pastas (uma pasta ou
+    uma lista, ex.: uma por índice). `produtos` escolhe entre 'estacao'
+    (Umido - Seco), 'anual' (anos consecutivos) e 'anomalia' (z-score; só
+    em períodos com pelo menos ``ANOS_MINIMOS_ANOMALIA`` anos). Retorna os
+    caminhos gravados.
+    """
+    desconhecidos = set(produtos) - set(PRODUTOS)
+    if desconhecidos:
+        raise ValueError(f"Produtos desconhecidos: {sorted(desconhecidos)} (use {PRODUTOS})")
+    if isinstance(pastas, str):
+        pastas = [pastas]
+    indices = [indice.upper() for indice in indices]
+
+    series = {}
+    for pasta in pastas:
+        for (indice, area), serie in agrupar_series(pasta).items():
+            if indice in indices:
+                series.setdefault((indice, area), []).extend(serie)
+
+    pasta_delta = os.path.join(pasta_saida, 'DELTA')
+    pasta_anomalia = os.path.join(pasta_saida, 'ANOMALIA')
+    for pasta in (pasta_delta, pasta_anomalia):
+        os.makedirs(pasta, exist_ok=True)
+
+    gravados = []
+    for (indice, area), serie in sorted(series.items()):
+        por_chave = {(campos['periodo'], campos['ano']): (campos, caminho) for campos, caminho in serie}
+
+        if 'estacao' in produtos:
+            for ano in sorted({ano for _, ano in por_chave}):
+                if ('Seco', ano) in por_chave and ('Umido', ano) in por_chave:
+                    destino = os.path.join(pasta_delta, montar_nome_mudanca('DELTA', indice, 'Umido-Seco',
+                                                                            area, ano))
+                    gravados.append(diferenca(por_chave[('Seco', ano)][1], por_chave[('Umido', ano)][1],
+                                              destino, indice))
+
+        for periodo in ('Seco', 'Umido'):
+            anos = sorted(ano for p, ano in por_chave if p == periodo)
+            if 'anual' in produtos:
+                for ano in anos:
+                    if ano - 1 in anos:
+                        destino = os.path.join(pasta_delta, montar_nome_mudanca('DELTA', indice, periodo, area,
+                                                                                f'{ano - 1}-{ano}'))
+                        gravados.append(diferenca(por_chave[(periodo, ano - 1)][1], por_chave[(periodo, ano)][1],
+                                                  destino, indice))
+            if 'anomalia' in produtos and len(anos) >= ANOS_MINIMOS_ANOMALIA:
+                gravados.extend(anomalias([por_chave[(periodo, ano)] for ano in anos], pasta_anomalia, indice))
+    return gravados
@@ -0,0 +1,68 @@
+"""
+Padrão de nomes dos GeoTIFFs exportados do GEE.
+
+Os arquivos seguem ``<INDICE>_<Seco|Umido>_<AreaN>_<ANO>.tif``
+(ex.: ``NDVI_Seco_Area1_2010.tif``).
+"""
+
+import os
+import re
+
+INDICES = ('NDVI', 'EVI', 'LAI', 'NDWI', 'LSWI', 'VCI')
+
+PADRAO_NOME = re.compile(
+    r'^(NDVI|EVI|LAI|NDWI|LSWI|VCI)_(Seco|Umido)_(Area\d+)_(\d{4})\.tif$',
+    re.IGNORECASE
+)
+
+
+def interpretar_nome(arquivo):
+    """
+    Extrai índice, período, área e ano do nome do arquivo.
+    Retorna None se o nome estiver fora do padrão.
+    """
+    match = PADRAO_NOME.match(os.path.basename(arquivo))
+    if not match:
+        return None
+    indice, periodo, area, ano = match.groups()
+    return {'indice': indice.upper(), 'periodo': periodo, 'area': area, 'ano': int(ano)}
+
+
+def montar_nome(indice, periodo, area, ano, extensao='.tif'):
+    """Nome de arquivo no padrão das exportações (ex.: VCI_Seco_Area1_2010.tif)."""
+    return f"{indice.upper()}_{periodo}_{area}_{ano}{extensao}"
+
+
+# Produtos de mudança (ver ``tese_g.mudancas``): diferenças entre períodos ou anos e anomalias
+PRODUTOS_MUDANCA = ('DELTA', 'ANOMALIA')
+
+PADRAO_MUDANCA = re.compile(
+    r'^(DELTA|ANOMALIA)_(NDVI|EVI|NDWI|LSWI)_(Seco|Umido|Umido-Seco)_(Area\d+)_(\d{4}(?:-\d{4})?)\.tif$',
+    re.IGNORECASE
+)
+
+
+def interpretar_mudanca(arquivo):
+    """
+    Extrai produto, índice, período, área e ano de um produto de mudança
+    (ex.: ``DELTA_NDVI_Seco_Area1_2009-2010.tif``). O período pode ser o par
+    'Umido-Seco' e o ano um par '2009-2010', por isso ano fica como texto.
+    Retorna None se o nome estiver fora do padrão.
+    """
+    match = PADRAO_MUDANCA.match(os.path.basename(arquivo))
+    if not match:
+        return None
+    produto, indice, periodo, area, ano = match.groups()
+    return {'produto': produto.upper(), 'indice': indice.upper(), 'periodo': periodo,
+            'area': area, 'ano': ano}
+
+
+def montar_nome_mudanca(produto, indice, periodo, area, ano, extensao='.tif'):
+    """Nome de um produto de mudança (ex.: DELTA_NDVI_Umido-Seco_Area1_2010.tif)."""
+    return f"{produto.upper()}_{indice.upper()}_{periodo}_{area}_{ano}{extensao}"
+
+
+def titulo_mudanca(campos):
+    """Título de um produto de mudança (ex.: ΔNDVI Seco 2009-2010 (Area1))."""
+    nome = f"Δ{campos['indice']}" if campos['produto'] == 'DELTA' else f"Anomalia {campos['indice']}"
+    return f"{nome} {campos['periodo']} {campos['ano']} ({campos['area']})"
@@ -0,0 +1,43 @@
+"""
+Paletas de cores de cada índice.
+
+Usa apenas ``matplotlib.colors``/``matplotlib.colormaps`` (sem pyplot), para
+poder ser importado pelo renderizador rápido sem o custo de criar figuras.
+"""
+
+import matplotlib
+import matplotlib.colors as mcolors
+
+# Paleta NDVI parecida com a do GEE
+ndvi_colors = [
+    '#FFFFFF', '#CE7E45', '#DF923D', '#F1B555', '#FCD163',
+    '#99B718', '#74A901', '#66A000', '#529400', '#3E8601',
+    '#207401', '#056201', '#004C00', '#023B01', '#012E01',
+    '#011D01', '#011301'
+]
+
+ndvi_cmap = mcolors.LinearSegmentedColormap.from_list("NDVI_GEE", ndvi_colors)
+evi_cmap = ndvi_cmap                      # EVI usa a mesma paleta de vegetação do GEE
+lai_cmap = matplotlib.colormaps['YlGn']    # Paleta verde-amarela para LAI
+ndwi_cmap = matplotlib.colormaps['Blues_r']  # Paleta azul invertida (mais escura = maior NDWI)
+lswi_cmap = matplotlib.colormaps['Blues']  # Paleta azul para representar água/umidade
+vci_cmap = matplotlib.colormaps['YlOrRd']  # Paleta amarelo-vermelho para condições de vegetação
+mudanca_cmap = matplotlib.colormaps['BrBG']  # Divergente: marrom = perda, verde = ganho (centro em zero)
+
+PALETAS = {
+    'NDVI': ndvi_cmap,
+    'EVI': evi_cmap,
+    'LAI': lai_cmap,
+    'NDWI': ndwi_cmap,
+    'LSWI': lswi_cmap,
+    'VCI': vci_cmap,
+    'DELTA': mudanca_cmap,
+    'ANOMALIA': mudanca_cmap,
+}
+
+
+def obter_paleta(cmap):
+    """Colormap a partir de um nome do matplotlib ou de um objeto Colormap."""
+    if isinstance(cmap, str):
+        return matplotlib.colormaps[cmap]
+    return cmap
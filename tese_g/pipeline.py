@@ -0,0 +1,177 @@
+"""
+Processamento em lote em pipeline, dentro de um único processo.
+
+Enquanto um arquivo é desenhado, um grupo limitado de threads de leitura
+já carrega para a memória os próximos GeoTIFFs (no Drive do Colab é a
+parte lenta) e faz sobre eles a passada das estatísticas; uma thread de
+escrita grava em disco os PNGs prontos sem segurar o desenho do próximo
+arquivo. ``profundidade`` limita quantos GeoTIFFs ficam carregados ao
+mesmo tempo (e quantos PNGs esperam gravação), o que limita a memória.
+
+O desenho continua em série, na ordem dos arquivos e com as mesmas
+funções de mapa: elas abrem o raster com ``abrir_raster`` e salvam com
+``destino_png``, que fora do pipeline são ``rasterio.open`` e o próprio
+caminho do PNG. Os PNGs saem idênticos aos do laço serial.
+"""
+
+import io
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import rasterio
+from rasterio.io import MemoryFile
+
+from .estatisticas import LIMITES_VALIDOS, estatisticas_raster
+
+# Conteúdo dos GeoTIFFs já carregados (caminho -> bytes) e fila de PNGs a gravar,
+# preenchidos só enquanto ``executar_pipeline`` roda
+_carregados = {}
+_fila_escrita = None
+
+
+@contextmanager
+def _abrir(caminho, conteudo):
+    """Abre o GeoTIFF do disco ou, havendo `conteudo` (bytes), da memória."""
+    if conteudo is None:
+        with rasterio.open(caminho) as src:
+            yield src
+    else:
+        with MemoryFile(conteudo) as memoria, memoria.open() as src:
+            yield src
+
+
+def abrir_raster(caminho):
+    """``rasterio.open(caminho)``, mas a partir da memória se o pipeline já carregou o arquivo."""
+    return _abrir(caminho, _carregados.get(caminho))
+
+
+@contextmanager
+def destino_png(caminho):
+    """
+    Destino para salvar o PNG `caminho`: o próprio caminho ou, dentro do
+    pipeline, um buffer em memória que vai para a thread de escrita.
+    """
+    fila = _fila_escrita
+    if fila is None:
+        yield caminho
+        return
+    buffer = io.BytesIO()
+    yield buffer
+    fila.put((caminho, buffer.getvalue()))
+
+
+def _carregar(caminho, indice, percentis, estatisticas):
+    """
+    Lê o arquivo inteiro e, se faltarem, calcula as estatísticas que o mapa
+    vai pedir. Falhas ficam para o desenho, que reproduz o erro do laço serial.
+    Retorna (conteúdo ou None, estatísticas ou None, segundos gastos).
+    """
+    inicio = time.perf_counter()
+    conteudo = None
+    # Overviews externas (.ovr) não iriam junto para a memória e mudariam a leitura reduzida
+    if not os.path.exists(caminho + '.ovr'):
+        try:
+            with open(caminho, 'rb') as f:
+                conteudo = f.read()
+        except OSError:
+            return None, None, time.perf_counter() - inicio
+
+    try:
+        with _abrir(caminho, conteudo) as src:
+            if estatisticas is None or not all(p in estatisticas['percentis'] for p in percentis):
+                estatisticas = estatisticas_raster(src, limites=LIMITES_VALIDOS[indice.upper()],
+                                                   percentis=percentis)
+    except Exception:
+        # Arquivo ilegível: o desenho abre do disco e dá a mesma mensagem de erro
+        conteudo, estatisticas = None, None
+    return conteudo, estatisticas, time.perf_counter() - inicio
+
+
+def _escrever(fila, falhas):
+    """Thread de escrita: grava os PNGs da fila até receber None."""
+    while True:
+        item = fila.get()
+        if item is None:
+            return
+        caminho, conteudo = item
+        try:
+            with open(caminho, 'wb') as f:
+                f.write(conteudo)
+        except OSError as e:
+            falhas[caminho] = f"{type(e).__name__}: {e}"
+
+
+def executar_pipeline(indice, caminhos, pasta_saida, opcoes_por_arquivo, motor='matplotlib',
+                      n_leitores=2, profundidade=4):
+    """
+    Gera os mapas de `caminhos` em pipeline (ver o início do módulo) e
+    devolve os resultados de ``tese_g.lote._processar_arquivo`` na ordem
+    dos arquivos. `n_leitores` é o número de threads de leitura e
+    `profundidade` o máximo de GeoTIFFs carregados ao mesmo tempo,
+    contando o que está sendo desenhado.
+    """
+    global _fila_escrita
+    from .lote import _processar_arquivo
+
+    profundidade = max(1, profundidade)
+    opcoes = opcoes_por_arquivo[0] if opcoes_por_arquivo else {}
+    percentis = (opcoes.get('pmin', 2), opcoes.get('pmax', 98))
+
+    fila = queue.Queue(maxsize=profundidade)
+    falhas = {}
+    escritor = threading.Thread(target=_escrever, args=(fila, falhas), daemon=True)
+    escritor.start()
+    _fila_escrita = fila
+
+    resultados = []
+    proximos = iter(zip(caminhos, opcoes_por_arquivo))
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, n_leitores)) as leitores:
+            em_leitura = deque()
+
+            def agendar():
+                for caminho, opcoes_arquivo in proximos:
+                    futuro = leitores.submit(_carregar, caminho, indice, percentis,
+                                             opcoes_arquivo.get('estatisticas'))
+                    em_leitura.append((caminho, opcoes_arquivo, futuro))
+                    return
+
+            for _ in range(profundidade):
+                agendar()
+
+            while em_leitura:
+                caminho, opcoes_arquivo, futuro = em_leitura.popleft()
+                inicio_espera = time.perf_counter()
+                conteudo, estatisticas, tempo_carga = futuro.result()
+                espera = time.perf_counter() - inicio_espera
+                if estatisticas is not None:
+                    opcoes_arquivo = dict(opcoes_arquivo, estatisticas=estatisticas)
+                if conteudo is not None:
+                    _carregados[caminho] = conteudo
+                try:
+                    resultado = _processar_arquivo(indice, caminho, pasta_saida, opcoes_arquivo, motor)
+                finally:
+                    _carregados.pop(caminho, None)
+                    conteudo = None
+                resultado['medicao']['etapas']['espera_leitura'] = round(espera, 6)
+                resultado['medicao']['etapas']['pre_carga'] = round(tempo_carga, 6)
+                resultados.append(resultado)
+                agendar()
+    finally:
+        _fila_escrita = None
+        fila.put(None)
+        escritor.join()
+
+    for resultado in resultados:
+        if resultado['status'] != 'ok':
+            continue
+        falha = falhas.get(os.path.join(pasta_saida, resultado['mensagem']))
+        if falha is not None:
+            resultado['status'] = 'erro'
+            resultado['mensagem'] = falha
+    return resultados
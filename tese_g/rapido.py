@@ -0,0 +1,186 @@
+"""
+Renderizador rápido de quicklooks em PNG, sem figuras do matplotlib.
+
+A paleta do índice vira uma tabela de 256 cores RGBA (uint8) aplicada com
+indexação vetorizada do NumPy; pixels mascarados ficam transparentes. A
+faixa do título e a barra de cores (gradiente pré-renderizado por paleta)
+são montadas direto na imagem com o Pillow, que grava o PNG. Sem
+``plt.subplots``/``colorbar``/``savefig(bbox_inches='tight')``, serve para
+gerar quicklooks de lotes inteiros bem mais rápido que ``tese_g.mapas``.
+"""
+
+import os
+from functools import lru_cache, partial
+
+import numpy as np
+import matplotlib
+from PIL import Image, ImageDraw, ImageFont
+
+from . import AvisoMapa
+from .estatisticas import LIMITES_VALIDOS, estatisticas_raster, mascara_validos
+from .leitura import ler_banda
+from .mascaras import mascara_do_mapa
+from .medicao import etapa
+from .nomes import PRODUTOS_MUDANCA, interpretar_mudanca, interpretar_nome, titulo_mudanca
+from .paletas import PALETAS, obter_paleta
+from .pipeline import abrir_raster, destino_png
+
+# Versão do desenho do quicklook (o mesmo para todos os índices): aumente ao
+# mudar o layout para o modo incremental refazer os quicklooks
+VERSAO_RENDER = 1
+
+# Layout do quicklook (em pixels)
+MARGEM = 10
+TAMANHO_FONTE = 16
+LARGURA_BARRA = 20
+LARGURA_COLUNA_BARRA = 100
+N_MARCAS = 5
+
+_cache_tabelas = {}
+
+
+def tabela_cores(cmap):
+    """Tabela (256, 4) uint8 com as cores RGBA da paleta, guardada por nome."""
+    paleta = obter_paleta(cmap)
+    if paleta.name not in _cache_tabelas:
+        _cache_tabelas[paleta.name] = paleta(np.linspace(0, 1, 256), bytes=True)
+    return _cache_tabelas[paleta.name]
+
+
+def colorir(valores, validos, vmin, vmax, tabela):
+    """
+    Converte a banda em RGBA com a tabela de cores: normaliza para 0-255
+    entre `vmin` e `vmax`, indexa a tabela e deixa transparentes os pixels inválidos.
+    """
+    escala = 255.0 / (vmax - vmin) if vmax > vmin else 0.0
+    posicao = valores.astype(np.float32)
+    posicao -= vmin
+    posicao *= escala
+    posicao[~validos] = 0
+    np.clip(posicao, 0, 255, out=posicao)
+    rgba = tabela[posicao.astype(np.uint8)]
+    rgba[~validos] = (255, 255, 255, 0)
+    return rgba
+
+
+@lru_cache(maxsize=None)
+def _fonte(tamanho):
+    caminho = os.path.join(matplotlib.get_data_path(), 'fonts', 'ttf', 'DejaVuSans.ttf')
+    return ImageFont.truetype(caminho, tamanho)
+
+
+@lru_cache(maxsize=32)
+def _gradiente(nome_cmap, altura):
+    """Barra de cores pré-renderizada (maior valor no topo) para uma paleta e altura."""
+    tabela = _cache_tabelas[nome_cmap]
+    linhas = np.linspace(255, 0, altura).round().astype(np.uint8)
+    return np.repeat(tabela[linhas][:, None, :], LARGURA_BARRA, axis=1)
+
+
+def _titulo(caminho_imagem, indice):
+    """Título a partir do nome do arquivo (ex.: NDVI Seco 2010 (Area1))."""
+    campos = interpretar_nome(caminho_imagem)
+    if campos is None:
+        mudanca = interpretar_mudanca(caminho_imagem)
+        if mudanca is not None:
+            return titulo_mudanca(mudanca)
+        return os.path.splitext(os.path.basename(caminho_imagem))[0]
+    return f"{campos['indice']} {campos['periodo']} {campos['ano']} ({campos['area']})"
+
+
+def montar_quicklook(rgba, titulo, subtitulo, nome_cmap, vmin, vmax, rotulo):
+    """Compõe mapa, faixa de título e barra de cores em uma imagem PIL RGBA."""
+    altura_mapa, largura_mapa = rgba.shape[:2]
+    altura_titulo = 2 * TAMANHO_FONTE + 3 * MARGEM
+    altura = altura_titulo + altura_mapa + MARGEM
+    largura = MARGEM + largura_mapa + LARGURA_COLUNA_BARRA
+
+    canvas = np.full((altura, largura, 4), 255, dtype=np.uint8)
+    canvas[altura_titulo:altura_titulo + altura_mapa, MARGEM:MARGEM + largura_mapa] = rgba
+
+    altura_barra = max(2, int(altura_mapa * 0.7))
+    topo_barra = altura_titulo + (altura_mapa - altura_barra) // 2
+    x_barra = MARGEM + largura_mapa + MARGEM
+    canvas[topo_barra:topo_barra + altura_barra, x_barra:x_barra + LARGURA_BARRA] = \
+        _gradiente(nome_cmap, altura_barra)
+
+    imagem = Image.fromarray(canvas, 'RGBA')
+    desenho = ImageDraw.Draw(imagem)
+    fonte = _fonte(TAMANHO_FONTE)
+    fonte_menor = _fonte(TAMANHO_FONTE - 4)
+    desenho.text((MARGEM, MARGEM), titulo, fill='black', font=fonte)
+    desenho.text((MARGEM, 2 * MARGEM + TAMANHO_FONTE), subtitulo, fill='black', font=fonte_menor)
+    desenho.text((x_barra, topo_barra - TAMANHO_FONTE - 2), rotulo, fill='black', font=fonte_menor)
+    for i in range(N_MARCAS):
+        fracao = i / (N_MARCAS - 1)
+        y = topo_barra + int(round(fracao * (altura_barra - 1)))
+        valor = vmax - fracao * (vmax - vmin)
+        desenho.line([(x_barra + LARGURA_BARRA, y), (x_barra + LARGURA_BARRA + 4, y)], fill='black')
+        desenho.text((x_barra + LARGURA_BARRA + 6, y - (TAMANHO_FONTE - 4) // 2), f"{valor:.2f}",
+                     fill='black', font=fonte_menor)
+    return imagem
+
+
+def gerar_quicklook(caminho_imagem, pasta_saida, indice, cmap=None, pmin=2, pmax=98,
+                    largura_max=1000, reamostragem='average', estatisticas=None, pasta_mascaras=None):
+    """
+    Gera o quicklook PNG de um GeoTIFF do `indice` ('NDVI', 'EVI', ...).
+
+    A banda é lida reduzida para caber em `largura_max` pixels; as cores
+    vão de p`pmin` a p`pmax` (dentro da faixa física do índice) e o título
+    traz min/max/média da resolução total. NDVI inteiro é tratado como
+    escalado por 10.000. Com `pasta_mascaras`, usa as máscaras de validade
+    em cache de ``tese_g.mascaras``. Retorna o nome do PNG gerado.
+    """
+    indice = indice.upper()
+    limites = LIMITES_VALIDOS[indice]
+    paleta = obter_paleta(cmap if cmap is not None else PALETAS[indice])
+    tabela = tabela_cores(paleta)
+
+    with abrir_raster(caminho_imagem) as src:
+        mascara = mascara_do_mapa(caminho_imagem, src, limites, pasta_mascaras)
+        est = estatisticas
+        if est is None or not all(p in est['percentis'] for p in (pmin, pmax)):
+            est = estatisticas_raster(src, limites=limites, percentis=(pmin, pmax), mascara=mascara)
+        etapa('estatisticas')
+        if est['n_validos'] == 0:
+            raise AvisoMapa(f"Arquivo sem dados válidos: {os.path.basename(caminho_imagem)}")
+
+        banda = ler_banda(src, (largura_max, largura_max), 1, reamostragem)
+        etapa('leitura')
+        if mascara is not None and mascara.cheia:
+            validos = np.ones(banda.shape, dtype=bool)
+        elif mascara is not None and banda.shape == mascara.forma:
+            validos = mascara.completa()
+        else:
+            validos = mascara_validos(banda, src.nodata, limites)
+        etapa('mascara')
+        escala = 0.0001 if indice == 'NDVI' and np.issubdtype(banda.dtype, np.integer) else 1.0
+
+    vmin = est['percentis'][pmin]
+    vmax = est['percentis'][pmax]
+    if limites is not None:
+        vmin = max(limites[0], vmin)
+        vmax = min(limites[1], vmax)
+    if indice in PRODUTOS_MUDANCA:
+        # Paleta divergente: escala simétrica com o zero (sem mudança) no centro
+        vmax = max(abs(vmin), abs(vmax)) or 1.0
+        vmin = -vmax
+
+    rgba = colorir(banda, validos, vmin, vmax, tabela)
+    etapa('colorir')
+    subtitulo = (f"Min: {round(est['min'] * escala, 2)} | Max: {round(est['max'] * escala, 2)}"
+                 f" | Mean: {round(est['media'] * escala, 2)}")
+    imagem = montar_quicklook(rgba, _titulo(caminho_imagem, indice), subtitulo, paleta.name,
+                              vmin * escala, vmax * escala, indice)
+    etapa('montagem')
+
+    nome_saida = os.path.splitext(os.path.basename(caminho_imagem))[0] + '.png'
+    with destino_png(os.path.join(pasta_saida, nome_saida)) as destino:
+        imagem.save(destino, format='PNG', compress_level=3)
+    etapa('png')
+    return nome_saida
+
+
+# Mesmas chaves de ``tese_g.mapas.RENDERIZADORES``, para o processamento em lote
+RENDERIZADORES = {indice.lower(): partial(gerar_quicklook, indice=indice) for indice in PALETAS}
@@ -0,0 +1,186 @@
+"""
+Cálculo local do VCI a partir do acervo de NDVI.
+
+VCI = 100 * (NDVI - NDVI_min) / (NDVI_max - NDVI_min), com mínimo e máximo
+de cada pixel tomados em todo o histórico de NDVI da mesma área e período
+(Seco/Umido). As imagens da série são lidas janela a janela (só a pilha de
+uma janela fica em memória) e os VCI saem como
+``VCI_<Periodo>_<AreaN>_<ANO>.tif``, prontos para ``gerar_mapa_vci``.
+
+O mínimo e o máximo históricos ficam gravados em ``historico/`` na pasta de
+saída, com os anos já incluídos e o tamanho/data do NDVI de cada um (como
+no manifesto dos mapas). Quando chega um ano novo, só as imagens novas são
+lidas: o histórico é atualizado com elas e só os VCI desses anos são
+gravados (use ``recalcular=True`` para refazer a série inteira contra o
+histórico atualizado). Um NDVI reexportado de um ano já incluído refaz a
+série inteira, já que o mínimo e o máximo antigos não podem ser desfeitos;
+um VCI apagado é regravado contra o histórico atual.
+"""
+
+import json
+import os
+
+import numpy as np
+import rasterio
+
+from .cog import perfil_saida
+from .cubo import agrupar_series, nodata_padrao
+from .estatisticas import MAX_PIXELS_JANELA, janelas_blocos, mascara_validos
+from .manifesto import assinatura_entrada
+from .nomes import montar_nome
+
+NODATA_VCI = -9999.0
+PASTA_HISTORICO = 'historico'
+
+
+def _caminhos_historico(pasta_saida, periodo, area):
+    pasta = os.path.join(pasta_saida, PASTA_HISTORICO)
+    base = f'{periodo}_{area}'
+    return {
+        'min': os.path.join(pasta, f'NDVI_min_{base}.tif'),
+        'max': os.path.join(pasta, f'NDVI_max_{base}.tif'),
+        'anos': os.path.join(pasta, f'NDVI_anos_{base}.json'),
+    }
+
+
+def _carregar_anos(caminhos):
+    """
+    Anos já incluídos no histórico e a assinatura do NDVI de cada um
+    ({ano: assinatura}; None nos históricos gravados antes das assinaturas).
+    Vazio se o histórico ainda não existir.
+    """
+    if not all(os.path.exists(c) for c in caminhos.values()):
+        return {}
+    with open(caminhos['anos'], encoding='utf-8') as f:
+        dados = json.load(f)
+    entradas = dados.get('entradas', {})
+    return {ano: entradas.get(str(ano)) for ano in dados['anos']}
+
+
+def _verificar_grade(src, ref):
+    """Levanta ValueError se `src` não tem o tamanho e a transformação de `ref`."""
+    if (src.height, src.width) != (ref.height, ref.width) or src.transform != ref.transform:
+        raise ValueError(f"Grade diferente do restante da série: {os.path.basename(src.name)}")
+
+
+def _ler_float(src, janela):
+    """Janela como float32, com NaN nos pixels inválidos."""
+    bloco = src.read(1, window=janela)
+    validos = mascara_validos(bloco, src.nodata)
+    bloco = bloco.astype(np.float32)
+    bloco[~validos] = np.nan
+    return bloco
+
+
+def _gravar_historico(dst, janela, valores):
+    """Grava mínimo/máximo no tipo do NDVI, com o nodata no lugar de NaN."""
+    vazio = np.isnan(valores)
+    valores = np.where(vazio, 0, valores)
+    if np.issubdtype(np.dtype(dst.dtypes[0]), np.integer):
+        valores = np.rint(valores)
+    valores = valores.astype(dst.dtypes[0])
+    valores[vazio] = dst.nodata
+    dst.write(valores, 1, window=janela)
+
+
+def _vci(ndvi, minimo, amplitude):
+    """VCI da janela; nodata onde não há NDVI ou o histórico não varia."""
+    vci = np.full(ndvi.shape, NODATA_VCI, dtype=np.float32)
+    calculavel = ~np.isnan(ndvi) & (amplitude > 0)
+    vci[calculavel] = 100 * (ndvi[calculavel] - minimo[calculavel]) / amplitude[calculavel]
+    return vci
+
+
+def atualizar_vci(serie, pasta_saida, recalcular=False):
+    """
+    Atualiza o histórico e grava os VCI de uma série NDVI de uma área e um
+    período [(campos, caminho), ...]. Sem `recalcular`, só são lidos os anos
+    que ainda não estão no histórico e os que perderam o VCI gravado; um
+    NDVI de ano já incluído que mudou (tamanho/data) refaz a série inteira.
+    Retorna os caminhos dos VCI gravados.
+    """
+    periodo, area = serie[0][0]['periodo'], serie[0][0]['area']
+    caminhos = _caminhos_historico(pasta_saida, periodo, area)
+    entradas = {campos['ano']: assinatura_entrada(caminho) for campos, caminho in serie}
+    anos_historico = {} if recalcular else _carregar_anos(caminhos)
+    if any(ano in entradas and assinatura not in (None, entradas[ano])
+           for ano, assinatura in anos_historico.items()):
+        anos_historico = {}
+
+    def _saida(campos):
+        return os.path.join(pasta_saida, montar_nome('VCI', campos['periodo'], campos['area'], campos['ano']))
+
+    # Anos já no histórico entram de novo só para regravar o VCI: o mínimo e o máximo não mudam
+    novos = [(campos, caminho) for campos, caminho in serie
+             if campos['ano'] not in anos_historico or not os.path.exists(_saida(campos))]
+    if not novos:
+        return []
+
+    os.makedirs(os.path.dirname(caminhos['min']), exist_ok=True)
+    fontes = [rasterio.open(caminho) for _, caminho in novos]
+    try:
+        ref = fontes[0]
+        for src in fontes[1:]:
+            _verificar_grade(src, ref)
+        if anos_historico:
+            # O histórico é aberto em 'r+' com as janelas das imagens novas
+            with rasterio.open(caminhos['min']) as historico:
+                _verificar_grade(ref, historico)
+
+        dtype = ref.dtypes[0]
+        perfil_historico = {} if anos_historico else \
+            perfil_saida(ref, dtype, nodata_padrao(np.dtype(dtype), ref.nodata))
+        modo = 'r+' if anos_historico else 'w'
+        saidas = [_saida(campos) for campos, _ in novos]
+        perfil_vci = perfil_saida(ref, 'float32', NODATA_VCI)
+
+        with rasterio.open(caminhos['min'], modo, **perfil_historico) as dst_min, \
+                rasterio.open(caminhos['max'], modo, **perfil_historico) as dst_max:
+            destinos = [rasterio.open(saida, 'w', **perfil_vci) for saida in saidas]
+            try:
+                # A pilha de uma janela tem um plano por ano novo
+                max_pixels = max(1, MAX_PIXELS_JANELA // len(fontes))
+                for janela in janelas_blocos(ref, max_pixels=max_pixels):
+                    pilha = np.stack([_ler_float(src, janela) for src in fontes])
+                    minimo = np.fmin.reduce(pilha, axis=0)
+                    maximo = np.fmax.reduce(pilha, axis=0)
+                    if anos_historico:
+                        minimo = np.fmin(minimo, _ler_float(dst_min, janela))
+                        maximo = np.fmax(maximo, _ler_float(dst_max, janela))
+                    _gravar_historico(dst_min, janela, minimo)
+                    _gravar_historico(dst_max, janela, maximo)
+
+                    amplitude = maximo - minimo
+                    for ndvi, dst in zip(pilha, destinos):
+                        dst.write(_vci(ndvi, minimo, amplitude), 1, window=janela)
+            finally:
+                for dst in destinos:
+                    dst.close()
+    finally:
+        for src in fontes:
+            src.close()
+
+    anos = sorted(set(anos_historico) | {campos['ano'] for campos, _ in novos})
+    registradas = {str(ano): entradas.get(ano, anos_historico.get(ano)) for ano in anos}
+    with open(caminhos['anos'], 'w', encoding='utf-8') as f:
+        json.dump({'anos': anos, 'entradas': registradas}, f)
+    return saidas
+
+
+def calcular_vci(pasta_ndvi, pasta_saida, recalcular=False):
+    """
+    Calcula o VCI de todas as séries NDVI (por área e período) de
+    `pasta_ndvi`, gravando em `pasta_saida`. Retorna os caminhos gravados.
+    """
+    os.makedirs(pasta_saida, exist_ok=True)
+    series = {}
+    for (indice, area), serie in agrupar_series(pasta_ndvi).items():
+        if indice != 'NDVI':
+            continue
+        for campos, caminho in serie:
+            series.setdefault((area, campos['periodo']), []).append((campos, caminho))
+
+    gravados = []
+    for chave in sorted(series):
+        gravados.extend(atualizar_vci(series[chave], pasta_saida, recalcular))
+    return gravados
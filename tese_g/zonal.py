@@ -0,0 +1,215 @@
+"""
+Estatísticas zonais por polígono (fazendas, municípios, talhões).
+
+A camada de polígonos é rasterizada uma única vez por grade (CRS,
+transformação e tamanho) em uma matriz de IDs de zona (0 = fora de todos
+os polígonos), guardada em memória e, opcionalmente, em ``.npy`` numa pasta
+de cache. Cada raster é então lido bloco a bloco uma só vez e as
+estatísticas de todas as zonas saem de reduções com ``np.bincount``, em vez
+de uma máscara por polígono. Onde polígonos se sobrepõem, o pixel fica com
+o último da camada.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+import rasterio
+
+from .estatisticas import LIMITES_VALIDOS, janelas_blocos, mascara_validos
+from .mascaras import mascara_raster
+from .nomes import interpretar_nome
+
+# Classes de VCI (limites em %) usadas na legenda dos mapas
+CLASSES_VCI = {'vci_baixo': (None, 40), 'vci_medio': (40, 80), 'vci_alto': (80, None)}
+
+RAIO_TERRA = 6371008.8
+
+_cache_zonas = {}
+
+
+def carregar_poligonos(poligonos):
+    """GeoDataFrame a partir de um caminho (shapefile, GeoPackage, GeoJSON...) ou do próprio GeoDataFrame."""
+    import geopandas as gpd
+
+    if isinstance(poligonos, gpd.GeoDataFrame):
+        return poligonos
+    return gpd.read_file(poligonos)
+
+
+def _chave_grade(src, assinatura_camada):
+    """Chave do cache de zonas: grade do raster + assinatura da camada."""
+    h = hashlib.sha256()
+    h.update(assinatura_camada.encode())
+    h.update((src.crs.to_wkt() if src.crs else '').encode())
+    h.update(repr((tuple(src.transform)[:6], src.width, src.height)).encode())
+    return h.hexdigest()[:16]
+
+
+def assinatura_camada(camada, campo_id=None):
+    """Assinatura da camada de polígonos (geometrias e campo de ID)."""
+    h = hashlib.sha256()
+    h.update(str(campo_id).encode())
+    h.update((camada.crs.to_wkt() if camada.crs else '').encode())
+    for geometria in camada.geometry:
+        h.update(geometria.wkb if geometria is not None else b'')
+    return h.hexdigest()[:16]
+
+
+def zonas_da_grade(src, camada, assinatura, pasta_cache=None):
+    """
+    Matriz (altura, largura) com o ID de zona de cada pixel na grade de
+    `src`: 1..N na ordem das linhas da camada, 0 fora dos polígonos.
+    """
+    from rasterio.features import rasterize
+
+    chave = _chave_grade(src, assinatura)
+    if chave in _cache_zonas:
+        return _cache_zonas[chave]
+    caminho_cache = os.path.join(pasta_cache, f'zonas_{chave}.npy') if pasta_cache else None
+    if caminho_cache and os.path.exists(caminho_cache):
+        _cache_zonas[chave] = np.load(caminho_cache, mmap_mode='r')
+        return _cache_zonas[chave]
+
+    if src.crs is not None and camada.crs is not None and camada.crs != src.crs:
+        camada = camada.to_crs(src.crs)
+    formas = [
+        (geometria, i + 1) for i, geometria in enumerate(camada.geometry)
+        if geometria is not None and not geometria.is_empty
+    ]
+    dtype = 'uint16' if len(camada) < np.iinfo(np.uint16).max else 'int32'
+    if formas:
+        zonas = rasterize(formas, out_shape=(src.height, src.width), transform=src.transform,
+                          fill=0, dtype=dtype)
+    else:
+        zonas = np.zeros((src.height, src.width), dtype=dtype)
+
+    if caminho_cache:
+        os.makedirs(pasta_cache, exist_ok=True)
+        np.save(caminho_cache, zonas)
+    _cache_zonas[chave] = zonas
+    return zonas
+
+
+def area_pixels_ha(src, linha_inicial, n_linhas):
+    """
+    Área (ha) de um pixel em cada linha da janela: constante em CRS
+    projetado; em graus, calculada na esfera para a latitude da linha.
+    """
+    a, e = src.transform.a, src.transform.e
+    if src.crs is None or not src.crs.is_geographic:
+        return np.full(n_linhas, abs(a * e) / 1e4)
+    linhas = np.arange(linha_inicial, linha_inicial + n_linhas + 1)
+    latitudes = np.radians(src.transform.f + linhas * e)
+    faixa = np.abs(np.diff(np.sin(latitudes)))
+    return RAIO_TERRA ** 2 * np.radians(abs(a)) * faixa / 1e4
+
+
+def estatisticas_zonais(caminho_raster, camada, assinatura=None, campo_id=None, pasta_cache=None,
+                        pasta_mascaras=None):
+    """
+    Estatísticas de todas as zonas em um raster, numa única leitura bloco a
+    bloco: lista de dicionários com 'zona' (valor de `campo_id` ou índice
+    da linha), 'n_validos', 'media', 'desvio', 'min' e 'max'. Para VCI,
+    também as áreas (ha) das classes <40, 40-80 e >80. NDVI inteiro é
+    convertido pela escala de 10.000. Com `pasta_mascaras`, a máscara de
+    validade em cache (``tese_g.mascaras``) pula as janelas sem pixel válido
+    sem lê-las e dispensa as comparações nas janelas cheias.
+    """
+    if assinatura is None:
+        assinatura = assinatura_camada(camada, campo_id)
+    campos = interpretar_nome(caminho_raster)
+    indice = campos['indice'] if campos else None
+    limites = LIMITES_VALIDOS.get(indice)
+    n_zonas = len(camada) + 1
+
+    contagem = np.zeros(n_zonas, dtype=np.int64)
+    soma = np.zeros(n_zonas)
+    soma_quadrados = np.zeros(n_zonas)
+    minimo = np.full(n_zonas, np.inf)
+    maximo = np.full(n_zonas, -np.inf)
+    areas_classes = np.zeros(n_zonas * len(CLASSES_VCI))
+
+    with rasterio.open(caminho_raster) as src:
+        zonas = zonas_da_grade(src, camada, assinatura, pasta_cache)
+        escala = 0.0001 if indice == 'NDVI' and np.issubdtype(np.dtype(src.dtypes[0]), np.integer) else 1.0
+        if pasta_mascaras is None:
+            blocos = ((None, janela, None) for janela in janelas_blocos(src))
+        else:
+            mascara = mascara_raster(caminho_raster, limites, pasta_mascaras, src=src)
+            blocos = ((i, janela, estado) for i, (janela, estado) in enumerate(mascara.blocos())
+                      if estado != 'vazio')
+        for i, janela, estado in blocos:
+            linhas, colunas = janela.toslices()
+            zona = zonas[linhas, colunas]
+            if not zona.any():
+                continue
+            bloco = src.read(1, window=janela)
+            if estado is None:
+                validos = mascara_validos(bloco, src.nodata, limites)
+                validos &= zona > 0
+            elif estado == 'parcial':
+                validos = mascara.bloco(i) & (zona > 0)
+            else:
+                validos = zona > 0
+            z = zona[validos].astype(np.intp)
+            v = bloco[validos].astype(np.float64)
+
+            contagem += np.bincount(z, minlength=n_zonas)
+            soma += np.bincount(z, weights=v, minlength=n_zonas)
+            soma_quadrados += np.bincount(z, weights=v * v, minlength=n_zonas)
+            np.minimum.at(minimo, z, v)
+            np.maximum.at(maximo, z, v)
+
+            if indice == 'VCI':
+                area = area_pixels_ha(src, janela.row_off, janela.height)
+                area = np.broadcast_to(area[:, None], zona.shape)[validos]
+                classe = np.digitize(v, [40, 80])
+                areas_classes += np.bincount(z * len(CLASSES_VCI) + classe, weights=area,
+                                             minlength=areas_classes.size)
+
+    ids = camada[campo_id].tolist() if campo_id else list(range(len(camada)))
+    areas_classes = areas_classes.reshape(n_zonas, len(CLASSES_VCI))
+    linhas_saida = []
+    for i, id_zona in enumerate(ids, start=1):
+        n = int(contagem[i])
+        linha = {'zona': id_zona, 'n_validos': n, 'media': None, 'desvio': None, 'min': None, 'max': None}
+        if n:
+            media = soma[i] / n
+            variancia = max(0.0, soma_quadrados[i] / n - media ** 2)
+            linha.update(media=media * escala, desvio=np.sqrt(variancia) * escala,
+                         min=minimo[i] * escala, max=maximo[i] * escala)
+        if indice == 'VCI':
+            for c, nome in enumerate(CLASSES_VCI):
+                linha[f'area_{nome}_ha'] = float(areas_classes[i, c])
+        linhas_saida.append(linha)
+    return linhas_saida
+
+
+def zonal_lote(pastas, poligonos, campo_id=None, pasta_cache=None, pasta_mascaras=None):
+    """
+    Estatísticas zonais de todos os GeoTIFFs das pastas (uma pasta ou uma
+    lista), em uma tabela longa (pandas DataFrame) com índice, período,
+    área, ano e arquivo de cada linha. A rasterização dos polígonos é feita
+    uma vez por grade e reaproveitada entre arquivos e execuções.
+    """
+    import pandas as pd
+    from .lote import listar_tifs
+
+    if isinstance(pastas, str):
+        pastas = [pastas]
+    camada = carregar_poligonos(poligonos)
+    assinatura = assinatura_camada(camada, campo_id)
+
+    registros = []
+    for pasta in pastas:
+        for caminho in listar_tifs(pasta):
+            campos = interpretar_nome(caminho) or {}
+            base = {
+                'indice': campos.get('indice'), 'periodo': campos.get('periodo'),
+                'area': campos.get('area'), 'ano': campos.get('ano'),
+                'arquivo': os.path.basename(caminho),
+            }
+            for linha in estatisticas_zonais(caminho, camada, assinatura, campo_id, pasta_cache, pasta_mascaras):
+                registros.append({**base, **linha})
+    return pd.DataFrame(registros)
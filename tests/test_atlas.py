@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+
+from tese_g.atlas import _escala_serie
+from tese_g.histogramas import escalas_series
+
+VALORES = np.linspace(0.1, 0.8, 400, dtype=np.float32).reshape(20, 20)
+
+
+def _gravar(caminho, dados, nodata):
+    with rasterio.open(caminho, 'w', driver='GTiff', width=20, height=20, count=1, dtype=dados.dtype.name,
+                       nodata=nodata, crs='EPSG:4326', transform=from_origin(-50, -10, 0.01, 0.01)) as dst:
+        dst.write(dados, 1)
+    return str(caminho)
+
+
+@pytest.fixture
+def serie_mista(tmp_path):
+    inteiro = _gravar(tmp_path / 'NDVI_Seco_Area1_2010.tif', np.rint(VALORES * 10000).astype(np.int16), -32768)
+    real = _gravar(tmp_path / 'NDVI_Seco_Area1_2011.tif', VALORES, np.nan)
+    return [inteiro, real]
+
+
+def test_escala_do_atlas_com_int16_e_float32(tmp_path, serie_mista):
+    vmin, vmax, fator, conversoes = _escala_serie(serie_mista, 'NDVI', str(tmp_path / 'esbocos'), 2, 98)
+    esperado = np.percentile(VALORES, [2, 98])
+    assert vmin * fator == pytest.approx(esperado[0], abs=1e-3)
+    assert vmax * fator == pytest.approx(esperado[1], abs=1e-3)
+    assert conversoes[serie_mista[0]] * 10000 * fator == pytest.approx(1.0)
+    assert conversoes[serie_mista[1]] * fator == pytest.approx(1.0)
+
+
+def test_escala_comum_nas_unidades_de_cada_arquivo(tmp_path, serie_mista):
+    escalas = escalas_series(serie_mista, str(tmp_path / 'esbocos'))
+    inteiro, real = (escalas[caminho]['percentis'] for caminho in serie_mista)
+    assert inteiro[98] == pytest.approx(real[98] * 10000, rel=1e-6)
+    assert real[98] == pytest.approx(np.percentile(VALORES, 98), abs=1e-3)
@@ -0,0 +1,63 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+
+from tese_g.cubo import agrupar_series
+from tese_g.filtros import filtrar_serie
+
+SECO, UMIDO = 0.35, 0.70
+ANOS = range(2010, 2018)
+
+
+def _gravar(pasta, periodo, ano, valor):
+    caminho = pasta / f"NDVI_{periodo}_Area1_{ano}.tif"
+    dados = np.full((4, 4), -32768 if valor is None else int(round(valor * 10000)), dtype=np.int16)
+    with rasterio.open(caminho, 'w', driver='GTiff', width=4, height=4, count=1, dtype='int16',
+                       nodata=-32768, crs='EPSG:4326', transform=from_origin(-50, -10, 0.01, 0.01)) as dst:
+        dst.write(dados, 1)
+    return caminho
+
+
+def _serie(pasta, valores=None):
+    valores = valores or {}
+    for ano in ANOS:
+        for periodo, base in (('Seco', SECO), ('Umido', UMIDO)):
+            _gravar(pasta, periodo, ano, valores.get((periodo, ano), base))
+    return agrupar_series(pasta)[('NDVI', 'Area1')]
+
+
+def _ler(caminhos):
+    return {c.name: rasterio.open(c).read(1)[0, 0] / 10000 for c in map(Path, caminhos)}
+
+
+@pytest.mark.parametrize('preenchimento', ['linear', 'harmonico'])
+def test_oscilacao_sazonal_preservada(tmp_path, preenchimento):
+    entrada, saida = tmp_path / 'in', tmp_path / 'out'
+    entrada.mkdir()
+    serie = _serie(entrada)
+    valores = _ler(filtrar_serie(serie, saida, preenchimento=preenchimento))
+    for nome, valor in valores.items():
+        esperado = SECO if '_Seco_' in nome else UMIDO
+        assert valor == pytest.approx(esperado, abs=1e-3), nome
+
+
+def test_pico_removido_dentro_do_periodo(tmp_path):
+    entrada, saida = tmp_path / 'in', tmp_path / 'out'
+    entrada.mkdir()
+    serie = _serie(entrada, {('Seco', 2013): 0.90})
+    valores = _ler(filtrar_serie(serie, saida, suavizar=False))
+    assert valores['NDVI_Seco_Area1_2013.tif'] == pytest.approx(SECO, abs=1e-3)
+    assert valores['NDVI_Umido_Area1_2013.tif'] == pytest.approx(UMIDO, abs=1e-3)
+
+
+@pytest.mark.parametrize('preenchimento', ['linear', 'harmonico'])
+def test_lacuna_preenchida_com_a_estacao(tmp_path, preenchimento):
+    entrada, saida = tmp_path / 'in', tmp_path / 'out'
+    entrada.mkdir()
+    serie = _serie(entrada, {('Seco', 2014): None, ('Umido', 2011): None})
+    valores = _ler(filtrar_serie(serie, saida, preenchimento=preenchimento, suavizar=False))
+    assert valores['NDVI_Seco_Area1_2014.tif'] == pytest.approx(SECO, abs=1e-3)
+    assert valores['NDVI_Umido_Area1_2011.tif'] == pytest.approx(UMIDO, abs=1e-3)